@@ -0,0 +1,99 @@
+"""SQLite write-contention benchmark.
+
+Runs many concurrent writer tasks (plus a few readers) against a fresh
+database file with a bare SQLite engine, with the WAL pragmas alone, and
+with the full production profile (WAL pragmas + serialized writer), and
+reports throughput and failed writes for each. Comparing the last two
+isolates what the writer gate itself costs or buys.
+
+    cd backend && python -m benchmarks.sqlite_contention --writers 50
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+import models  # noqa: F401  (registers every table on Base.metadata)
+from database import Base, build_async_engine, build_session_factory
+from models.idea import Idea
+from models.user import User
+
+
+async def run_profile(
+    name: str, db_path: Path, pragmas: bool, serialize: bool, writers: int, writes: int, readers: int
+) -> dict:
+    engine = build_async_engine(f"sqlite+aiosqlite:///{db_path}", sqlite_profile=pragmas)
+    session_factory = build_session_factory(engine, serialize_writes=serialize)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as db:
+        user = User(email="bench@example.com", password_hash="x")
+        db.add(user)
+        await db.commit()
+        user_id = user.id
+
+    committed = failed = reads = 0
+    done = asyncio.Event()
+
+    async def writer(n: int) -> None:
+        nonlocal committed, failed
+        for i in range(writes):
+            async with session_factory() as db:
+                db.add(Idea(user_id=user_id, content=f"writer {n} idea {i}"))
+                try:
+                    await db.commit()
+                    committed += 1
+                except OperationalError:
+                    await db.rollback()
+                    failed += 1
+
+    async def reader() -> None:
+        nonlocal reads
+        while not done.is_set():
+            async with session_factory() as db:
+                await db.scalar(select(func.count(Idea.id)).filter(Idea.user_id == user_id))
+            reads += 1
+
+    reader_tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(n) for n in range(writers)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*reader_tasks)
+    await engine.dispose()
+
+    return {
+        "profile": name,
+        "committed": committed,
+        "failed": failed,
+        "seconds": round(elapsed, 2),
+        "writes_per_sec": round(committed / elapsed, 1),
+        "reads_per_sec": round(reads / elapsed, 1),
+        "ops_per_sec": round((committed + reads) / elapsed, 1),
+    }
+
+
+async def main(writers: int, writes: int, readers: int) -> None:
+    print(f"{writers} writers x {writes} commits, {readers} concurrent readers")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, pragmas, serialize in (("bare", False, False), ("wal", True, False), ("production", True, True)):
+            result = await run_profile(name, Path(tmp) / f"{name}.db", pragmas, serialize, writers, writes, readers)
+            print(
+                f"{result['profile']:>10}: {result['committed']} committed, {result['failed']} failed "
+                f"in {result['seconds']}s -> {result['writes_per_sec']} writes/s, "
+                f"{result['reads_per_sec']} reads/s ({result['ops_per_sec']} ops/s total)"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=50)
+    parser.add_argument("--writes", type=int, default=20, help="commits per writer")
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.writers, args.writes, args.readers))
@@ -1,15 +1,89 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
 
+# Sync URL scheme -> async driver used when ASYNC_DATABASE_URL is not set.
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
 class Settings(BaseSettings):
     database_url: str = "sqlite:///./dreamcatcher.db"
+    # Optional explicit async URL (e.g. postgresql+asyncpg://...). Derived from database_url when empty.
+    async_database_url: Optional[str] = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_echo: bool = False
+    # SQLite production profile: WAL + tuned pragmas and a single serialized writer per process.
+    sqlite_production_profile: bool = True
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
     secret_key: str = "dev-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24 * 7  # 7 days
+    auth_cache_ttl_seconds: float = 30.0  # per-process; bounds staleness across workers
+    auth_cache_max_entries: int = 10000
+    password_hash_workers: int = 4
+    password_hash_queue_limit: int = 32  # calls beyond workers + this limit get 503
+    login_attempts_per_ip: int = 20  # failed attempts
+    login_attempts_per_email: int = 5  # failed attempts
+    login_attempt_window_seconds: int = 60
+    trusted_proxies: str = ""  # comma-separated IPs/CIDRs whose X-Forwarded-For is honored
     # Provide via environment variable (OPENAI_API_KEY). Keep the default empty to avoid committing secrets.
     openai_api_key: str = ""
-    
+    openai_model: str = "gpt-4o-mini"
+    openai_max_concurrency: int = 8  # process-wide cap on in-flight completions
+    openai_timeout_seconds: float = 30.0  # per call, including time spent waiting for a slot
+    openai_max_retries: int = 1
+    ai_cache_ttl_seconds: float = 7 * 24 * 3600.0  # 0 disables caching of AI results
+    ai_cache_memory_entries: int = 1024  # in-process tier, per worker
+    ai_cache_max_rows: int = 50000  # persistent tier, trimmed oldest first
+    ai_cache_prune_interval_seconds: float = 600.0  # 0 disables the background trim
+    ai_job_workers: int = 4  # per process; keep below openai_max_concurrency to leave room for sync calls
+    ai_job_max_pending_per_user: int = 10  # unfinished jobs; more get 429
+    ai_job_sweep_interval_seconds: float = 30.0  # 0 disables requeueing and expiry of AI jobs
+    ai_job_stale_seconds: float = 300.0  # a running job older than this is assumed lost and retried
+    ai_job_max_attempts: int = 3
+    ai_job_retention_hours: float = 24.0
+    research_rollup_interval_seconds: float = 300.0  # 0 disables the background rollup job
+    research_outbox_interval_seconds: float = 2.0  # 0 disables the research extraction worker
+    research_backfill_interval_seconds: float = 5.0  # 0 disables the consent-grant backfill worker
+    research_backfill_batch_size: int = 500
+    research_backfill_batch_delay_seconds: float = 0.2  # pause between batches to leave room for requests
+    research_cube_cache_seconds: float = 60.0
+    research_store_refresh_seconds: float = 60.0  # 0 disables the in-memory research event store
+    # Shared secret for partner exports (X-Research-Export-Token). Empty disables /api/research/export.
+    research_export_token: str = ""
+    research_export_batch_size: int = 5000  # rows per server-side cursor fetch
+    purge_interval_seconds: float = 5.0  # 0 disables background purges of revoked/deleted data
+    purge_chunk_size: int = 1000  # rows deleted per transaction
+    dream_import_max_rows: int = 10000
+    dream_import_chunk_size: int = 500  # dreams per INSERT and transaction
+    sleep_import_max_rows: int = 5000
+    sleep_import_chunk_size: int = 500  # nights per INSERT/UPDATE and transaction
+    account_export_interval_seconds: float = 5.0  # 0 disables background account exports
+    account_export_batch_size: int = 500  # rows fetched per table round trip
+    account_export_dir: str = "./exports"
+    account_export_retention_hours: float = 24.0
+
+    @property
+    def resolved_async_database_url(self) -> str:
+        if self.async_database_url:
+            return self.async_database_url
+        scheme, sep, rest = self.database_url.partition("://")
+        if "+" in scheme:
+            scheme = scheme.split("+", 1)[0]
+        return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,23 +1,171 @@
-from sqlalchemy import create_engine
+import asyncio
+from typing import Optional
+
+from sqlalchemy import Delete, Insert, Update, create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import get_settings
 
 settings = get_settings()
 
+is_sqlite = settings.database_url.startswith("sqlite")
+
+
+def sqlite_pragmas() -> dict[str, object]:
+    return {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "mmap_size": settings.sqlite_mmap_size,
+        "cache_size": -settings.sqlite_cache_size_kib,  # negative = KiB
+        "temp_store": "MEMORY",
+    }
+
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: dict[str, object]) -> None:
+    """Run ``pragmas`` on every new DBAPI connection of ``engine``."""
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+class WriterGate:
+    """Process-wide lock that lets one session write to SQLite at a time.
+
+    SQLite allows a single writer. Without the gate, sessions waiting for it
+    each hold a pooled connection while they sleep in busy_timeout, so under
+    heavy write load readers queue for a connection too. Queueing writers on
+    an asyncio lock keeps them off the pool until it is their turn, and
+    reads, which never take the gate, proceed concurrently under WAL. This
+    trades write throughput for read throughput; it does not reduce failed
+    writes (see benchmarks/sqlite_contention.py).
+    """
+
+    def __init__(self):
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lock = loop, asyncio.Lock()
+        return self._lock
+
+
+writer_gate = WriterGate()
+
+
+class SerializedWriteSession(AsyncSession):
+    """AsyncSession that holds ``writer_gate`` from its first write until the transaction ends."""
+
+    gate: WriterGate = writer_gate
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._holds_writer = False
+
+    async def _acquire_writer(self) -> None:
+        if not self._holds_writer:
+            await self.gate.lock.acquire()
+            self._holds_writer = True
+
+    def _release_writer(self) -> None:
+        if self._holds_writer:
+            self._holds_writer = False
+            self.gate.lock.release()
+
+    def _has_pending_writes(self) -> bool:
+        return bool(self.new or self.dirty or self.deleted)
+
+    async def execute(self, statement, *args, **kwargs):
+        if isinstance(statement, (Insert, Update, Delete)):
+            await self._acquire_writer()
+        return await super().execute(statement, *args, **kwargs)
+
+    async def flush(self, objects=None) -> None:
+        if self._has_pending_writes():
+            await self._acquire_writer()
+        await super().flush(objects)
+
+    async def commit(self) -> None:
+        if self._has_pending_writes():
+            await self._acquire_writer()
+        try:
+            await super().commit()
+        finally:
+            self._release_writer()
+
+    async def rollback(self) -> None:
+        try:
+            await super().rollback()
+        finally:
+            self._release_writer()
+
+    async def close(self) -> None:
+        try:
+            await super().close()
+        finally:
+            self._release_writer()
+
+
+def dialect_insert(db: AsyncSession, model):
+    """``insert`` for the session's dialect, which supports ``on_conflict_do_update``."""
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def build_async_engine(url: str, sqlite_profile: bool = settings.sqlite_production_profile) -> AsyncEngine:
+    if url.startswith("sqlite"):
+        async_engine = create_async_engine(url, echo=settings.db_echo)
+        if sqlite_profile:
+            apply_sqlite_pragmas(async_engine.sync_engine, sqlite_pragmas())
+        return async_engine
+    return create_async_engine(
+        url,
+        echo=settings.db_echo,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=True,
+    )
+
+
+def build_session_factory(bind: AsyncEngine, serialize_writes: bool = False) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind=bind,
+        class_=SerializedWriteSession if serialize_writes else AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+# Sync engine: used for schema management and offline scripts.
 engine = create_engine(
     settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+    connect_args={"check_same_thread": False} if is_sqlite else {}
 )
+if is_sqlite and settings.sqlite_production_profile:
+    apply_sqlite_pragmas(engine, sqlite_pragmas())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: used by every request handler so queries never block the event loop.
+async_engine = build_async_engine(settings.resolved_async_database_url)
+
+AsyncSessionLocal = build_session_factory(
+    async_engine, serialize_writes=is_sqlite and settings.sqlite_production_profile
+)
+
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
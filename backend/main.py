@@ -1,16 +1,59 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
-from database import engine, Base
+from config import get_settings
+from database import AsyncSessionLocal, async_engine
+from migrations import run_migrations
 from models import User, Dream, Goal, Idea, SleepLog, ResearchConsent, DreamResearchEvent, DreamResearchAggregate, SavedFilter
-from routers import auth, dreams, goals, ideas, sleep, ai, research, filters
+from routers import auth, dreams, goals, ideas, sleep, ai, research, filters, search
+from services.ai_cache import ai_result_cache, prune_ai_results
+from services.ai_jobs import ai_jobs, sweep_ai_jobs
+from services.ai_service import ai_service
+from services.pagination import InvalidCursor, NEXT_CURSOR_HEADER
+from services.principal_cache import principal_cache
+from services.password_hasher import password_hasher
+from services.account_export import run_account_exports
+from services.background import run_periodically
+from services.purge import run_purges
+from services.research_backfill import run_backfills
+from services.research_extraction import drain_all
+from services.research_rollup import refresh_rollups
+from services.research_store import research_store
+
+settings = get_settings()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
+    await run_migrations(async_engine)
+    ai_jobs.start()
+    background_jobs = [
+        (drain_all, settings.research_outbox_interval_seconds),
+        (refresh_rollups, settings.research_rollup_interval_seconds),
+        (run_purges, settings.purge_interval_seconds),
+        (run_backfills, settings.research_backfill_interval_seconds),
+        (research_store.refresh, settings.research_store_refresh_seconds),
+        (run_account_exports, settings.account_export_interval_seconds),
+        (prune_ai_results, settings.ai_cache_prune_interval_seconds),
+        (sweep_ai_jobs, settings.ai_job_sweep_interval_seconds),
+    ]
+    tasks = [
+        asyncio.create_task(run_periodically(AsyncSessionLocal, job, interval))
+        for job, interval in background_jobs
+        if interval > 0
+    ]
     yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await ai_jobs.stop()
+    await ai_service.aclose()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -40,9 +83,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    expose_headers=["*", NEXT_CURSOR_HEADER, research.EXPORT_WATERMARK_HEADER],
 )
 
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(exc)})
+
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(dreams.router, prefix="/api/dreams", tags=["Dreams"])
 app.include_router(goals.router, prefix="/api/goals", tags=["Goals"])
@@ -51,6 +99,7 @@ app.include_router(sleep.router, prefix="/api/sleep", tags=["Sleep"])
 app.include_router(ai.router, prefix="/api/ai", tags=["AI"])
 app.include_router(research.router, prefix="/api/research", tags=["Research"])
 app.include_router(filters.router, prefix="/api/filters", tags=["Filters"])
+app.include_router(search.router, prefix="/api/search", tags=["Search"])
 
 
 @app.get("/")
@@ -60,4 +109,12 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "service": "dreamcatcher"}
+    return {
+        "status": "healthy",
+        "service": "dreamcatcher",
+        "caches": {"principal": principal_cache.stats(), "ai_results": ai_result_cache.stats()},
+        "password_hasher": password_hasher.stats(),
+        "research_store": research_store.stats(),
+        "ai": ai_service.stats(),
+        "ai_jobs": ai_jobs.stats(),
+    }
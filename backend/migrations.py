@@ -0,0 +1,185 @@
+"""Versioned schema upgrades applied at startup.
+
+``Base.metadata.create_all`` only creates missing tables; it never changes a
+table that already exists. Anything that has to reach existing databases
+(new indexes, new columns) is added here as a numbered migration. Applied
+versions are recorded in ``schema_version`` so each runs exactly once.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, func, insert, inspect, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import models  # noqa: F401  (registers every table on Base.metadata)
+from database import Base
+from models.dream import Dream
+from models.dream_label import DreamLabel, LABEL_FIELDS, label_rows
+from models.search_index import create_all_search_indexes
+from models.sleep_log import SleepLog
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+schema_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+# Unique indexes that existing rows may violate. Each is created by its own
+# migration once the duplicates are gone.
+DEDUPED_INDEXES = {"ux_sleep_logs_user_id_sleep_time"}
+
+
+def _ensure_declared_indexes(conn: Connection) -> None:
+    """Create every index declared on the models that the database lacks.
+
+    Indexes on columns the table does not have yet are skipped: the models
+    are always the latest version, so an early migration can see indexes
+    whose columns a later migration adds. That migration creates them, as
+    does the migration for each of ``DEDUPED_INDEXES``.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if index.name in DEDUPED_INDEXES:
+                continue
+            if all(column.name in existing for column in index.columns):
+                index.create(conn, checkfirst=True)
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    """Add model columns that existing tables lack (nullable columns only)."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} automatically")
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def _add_columns_and_indexes(conn: Connection) -> None:
+    _add_missing_columns(conn)
+    _ensure_declared_indexes(conn)
+
+
+def _backfill_dream_labels(conn: Connection) -> None:
+    """Populate dream_labels from the JSON list columns of existing dreams."""
+    conn.execute(delete(DreamLabel.__table__))
+    columns = [Dream.id, Dream.user_id] + [getattr(Dream, f) for f in LABEL_FIELDS]
+    result = conn.execution_options(yield_per=BACKFILL_BATCH_SIZE).execute(select(*columns))
+    for partition in result.partitions():
+        rows = []
+        for dream in partition:
+            rows.extend(label_rows(dream.id, dream.user_id, dream._mapping))
+        if rows:
+            conn.execute(insert(DreamLabel.__table__), rows)
+
+
+def _merge_sleep_night(conn: Connection, night: list) -> None:
+    """Fold the older rows of one night into the newest, then delete them.
+
+    Fields the newest row lacks are taken from the older rows, newest first,
+    and distinct notes are all kept, joined newest first.
+    """
+    table = SleepLog.__table__
+    keeper, *older = night
+    values = {}
+    for column in table.columns:
+        if column.name in ("id", "user_id", "sleep_time", "created_at", "notes") or keeper[column.name] is not None:
+            continue
+        values[column.name] = next((row[column.name] for row in older if row[column.name] is not None), None)
+    notes = list(dict.fromkeys(row["notes"] for row in night if row["notes"]))
+    if notes:
+        values["notes"] = "\n\n".join(notes)
+    conn.execute(update(table).where(table.c.id == keeper["id"]).values(**values))
+    conn.execute(delete(table).where(table.c.id.in_([row["id"] for row in older])))
+
+
+def _unique_sleep_nights(conn: Connection) -> None:
+    """Merge a user's nights with the same sleep_time into one row, then make that pair unique."""
+    table = SleepLog.__table__
+    duplicated = (
+        select(table.c.user_id, table.c.sleep_time)
+        .group_by(table.c.user_id, table.c.sleep_time)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    rows = conn.execute(
+        select(table)
+        .join(duplicated, (table.c.user_id == duplicated.c.user_id) & (table.c.sleep_time == duplicated.c.sleep_time))
+        .order_by(table.c.user_id, table.c.sleep_time, table.c.id.desc())
+    ).mappings().all()
+    nights = defaultdict(list)
+    for row in rows:
+        nights[(row["user_id"], row["sleep_time"])].append(row)
+    for night in nights.values():
+        _merge_sleep_night(conn, night)
+    if nights:
+        logger.warning(
+            "Merged %d duplicate sleep logs into %d nights before making sleep_time unique per user",
+            len(rows) - len(nights), len(nights),
+        )
+
+    conn.execute(text("DROP INDEX IF EXISTS ix_sleep_logs_user_id_sleep_time"))
+    for index in SleepLog.__table__.indexes:
+        if index.name == "ux_sleep_logs_user_id_sleep_time":
+            index.create(conn, checkfirst=True)
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Composite indexes for per-user, date-ordered queries", _ensure_declared_indexes),
+    (2, "Full-text search index for dreams, goals and ideas", create_all_search_indexes),
+    (3, "Normalized dream label table", _backfill_dream_labels),
+    (4, "Research rollup columns and indexes", _add_columns_and_indexes),
+    (5, "Research event source reference", _add_columns_and_indexes),
+    (6, "Consent purge status and account deletion marker", _add_columns_and_indexes),
+    (7, "Research event deletion counter", _add_columns_and_indexes),
+    (8, "Unique sleep night per user", _unique_sleep_nights),
+]
+
+
+def current_version(conn: Connection) -> int:
+    return conn.scalar(select(func.max(schema_version.c.version))) or 0
+
+
+def upgrade(conn: Connection) -> int:
+    """Create missing tables, then apply pending migrations in order."""
+    schema_metadata.create_all(conn)
+    Base.metadata.create_all(conn)
+
+    version = current_version(conn)
+    for target, description, migrate in MIGRATIONS:
+        if target <= version:
+            continue
+        logger.info("Applying schema migration %s: %s", target, description)
+        migrate(conn)
+        conn.execute(
+            insert(schema_version).values(
+                version=target,
+                description=description,
+                applied_at=datetime.now(timezone.utc),
+            )
+        )
+        version = target
+    return version
+
+
+async def run_migrations(engine: AsyncEngine) -> int:
+    async with engine.begin() as conn:
+        return await conn.run_sync(upgrade)
@@ -7,9 +7,18 @@ from .research_consent import ResearchConsent
 from .dream_research_event import DreamResearchEvent
 from .dream_research_aggregate import DreamResearchAggregate
 from .saved_filter import SavedFilter
+from .dream_label import DreamLabel
+from .research_rollup import ResearchRollupState, ResearchRollupDirtyDay
+from .research_outbox import ResearchOutbox
+from .research_backfill import ResearchBackfill
+from .account_export import AccountExport
+from .ai_result import AIResult
+from .ai_job import AIJob
+from . import search_index  # noqa: F401  (attaches FTS DDL to the tables above)
 
 __all__ = [
     "User", "Dream", "Goal", "Idea", "SleepLog",
     "ResearchConsent", "DreamResearchEvent", "DreamResearchAggregate",
-    "SavedFilter",
+    "SavedFilter", "DreamLabel", "ResearchRollupState", "ResearchRollupDirtyDay",
+    "ResearchOutbox", "ResearchBackfill", "AccountExport", "AIResult", "AIJob",
 ]
@@ -0,0 +1,27 @@
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from database import Base
+
+
+class AccountExport(Base):
+    """A background export of one user's data, written to a file for download.
+
+    ``path`` is set once the artifact is complete. Artifacts expire after
+    ``account_export_retention_hours`` and are deleted with the account.
+    """
+
+    __tablename__ = "account_exports"
+    __table_args__ = (
+        Index("ix_account_exports_user_id", "user_id"),
+        Index("ix_account_exports_status", "status"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    format = Column(String(10), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending/running/complete/failed/expired
+    path = Column(String(500), nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+    error = Column(String(500), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
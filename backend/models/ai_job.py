@@ -0,0 +1,31 @@
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String
+from sqlalchemy.sql import func
+from database import Base
+
+
+class AIJob(Base):
+    """A queued AI call whose result the client polls for.
+
+    ``params`` holds the kind's inputs (a dream id, a day range). ``result``
+    is set once the job completes; interpretations are also saved on the
+    dream. Lower ``priority`` values run first.
+    """
+
+    __tablename__ = "ai_jobs"
+    __table_args__ = (
+        Index("ix_ai_jobs_user_id", "user_id"),
+        Index("ix_ai_jobs_status", "status"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    kind = Column(String(20), nullable=False)  # interpret/patterns
+    params = Column(JSON, nullable=False)
+    priority = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default="pending")  # pending/running/complete/failed
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSON, nullable=True)
+    error = Column(String(500), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,24 @@
+from sqlalchemy import JSON, Column, DateTime, Index, String
+from database import Base
+
+
+class AIResult(Base):
+    """A cached AI completion, keyed by a hash of everything that shaped it.
+
+    ``key`` covers the method, its prompt version, the model and the
+    normalized inputs, so a row is only ever served for an identical request.
+    Rows expire after ``ai_cache_ttl_seconds`` and the table is trimmed to
+    ``ai_cache_max_rows``, oldest first.
+    """
+
+    __tablename__ = "ai_results"
+    __table_args__ = (
+        Index("ix_ai_results_created_at", "created_at"),
+        Index("ix_ai_results_expires_at", "expires_at"),
+    )
+
+    key = Column(String(64), primary_key=True)  # sha256 hex
+    method = Column(String(50), nullable=False)
+    value = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,77 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, UniqueConstraint, delete, event, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import attributes
+from database import Base
+from .dream import Dream
+
+# Dream JSON list column -> label kind stored in dream_labels.
+LABEL_FIELDS = {
+    "tags": "tag",
+    "emotions": "emotion",
+    "characters": "character",
+    "locations": "location",
+}
+
+
+class DreamLabel(Base):
+    """One tag/emotion/character/location value of a dream.
+
+    Mirrors the dream's JSON list columns so filters and the per-user
+    vocabulary can use indexed exact lookups instead of scanning JSON text.
+    """
+
+    __tablename__ = "dream_labels"
+    __table_args__ = (
+        UniqueConstraint("dream_id", "kind", "value", name="uq_dream_labels_dream_kind_value"),
+        Index("ix_dream_labels_user_kind_value", "user_id", "kind", "value"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    dream_id = Column(Integer, ForeignKey("dreams.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(20), nullable=False)
+    value = Column(String(255), nullable=False)
+
+
+def label_rows(dream_id: int, user_id: int, values: dict) -> list[dict]:
+    """dream_labels rows for a dream, given a mapping of its list fields.
+
+    Values are truncated to the column length before deduplication, so two
+    long values sharing a prefix yield one row rather than a unique-constraint
+    violation.
+    """
+    rows = []
+    for field, kind in LABEL_FIELDS.items():
+        seen = set()
+        for value in values.get(field) or []:
+            if not isinstance(value, str) or not value:
+                continue
+            value = value[:255]
+            if value in seen:
+                continue
+            seen.add(value)
+            rows.append({"dream_id": dream_id, "user_id": user_id, "kind": kind, "value": value})
+    return rows
+
+
+def _replace_labels(connection: Connection, dream: Dream) -> None:
+    connection.execute(delete(DreamLabel.__table__).where(DreamLabel.dream_id == dream.id))
+    rows = label_rows(dream.id, dream.user_id, {f: getattr(dream, f) for f in LABEL_FIELDS})
+    if rows:
+        connection.execute(insert(DreamLabel.__table__), rows)
+
+
+@event.listens_for(Dream, "after_insert")
+def _labels_after_insert(mapper, connection, dream):
+    _replace_labels(connection, dream)
+
+
+@event.listens_for(Dream, "after_update")
+def _labels_after_update(mapper, connection, dream):
+    if any(attributes.get_history(dream, f).has_changes() for f in LABEL_FIELDS):
+        _replace_labels(connection, dream)
+
+
+@event.listens_for(Dream, "after_delete")
+def _labels_after_delete(mapper, connection, dream):
+    connection.execute(delete(DreamLabel.__table__).where(DreamLabel.dream_id == dream.id))
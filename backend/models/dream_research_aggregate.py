@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Date, Float, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Date, Float, JSON, DateTime, Index
 from sqlalchemy.sql import func
 from database import Base
 
 
 class DreamResearchAggregate(Base):
     __tablename__ = "dream_research_aggregates"
+    __table_args__ = (
+        Index("ux_dream_research_aggregates_period", "period_type", "period_start", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     period_type = Column(String(20), nullable=False)
@@ -16,4 +19,6 @@ class DreamResearchAggregate(Base):
     lucid_rate = Column(Float, nullable=True)
     avg_mood = Column(Float, nullable=True)
     avg_sleep_quality = Column(Float, nullable=True)
+    # Per group_by dimension: {"groups": {key: {count, mood_sum, mood_n, vividness_sum, vividness_n}}, "suppressed": n}
+    group_stats = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -7,11 +7,18 @@ from database import Base
 
 class DreamResearchEvent(Base):
     __tablename__ = "dream_research_events"
+    __table_args__ = (
+        Index("ix_dream_research_events_consent_id", "consent_id"),
+        Index("ix_dream_research_events_created_at", "created_at"),
+        Index("ix_dream_research_events_dream_ref", "dream_ref"),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     consent_id = Column(
         Integer, ForeignKey("research_consent.id", ondelete="CASCADE"), nullable=False
     )
+    # Keyed hash of the source dream id, used only to replace the event when the dream is edited.
+    dream_ref = Column(String(64), nullable=True)
     emotion = Column(String(50), nullable=True)
     theme = Column(String(100), nullable=True)
     is_lucid = Column(Boolean, default=False, nullable=False)
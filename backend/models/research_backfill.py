@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from database import Base
+
+
+class ResearchBackfill(Base):
+    """A resumable run extracting research events from existing dreams.
+
+    ``user_id`` scopes the run to one user (after a consent grant); NULL
+    re-extracts every consenting user's dreams. ``last_dream_id`` is the
+    resume point: dreams are processed in id order and progress is
+    committed with each batch.
+    """
+
+    __tablename__ = "research_backfills"
+    __table_args__ = (
+        Index("ix_research_backfills_status", "status"),
+        Index("ix_research_backfills_user_id", "user_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=True)
+    status = Column(String(20), nullable=False, default="pending")  # pending/running/complete/cancelled
+    last_dream_id = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)
+    events_written = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -6,6 +6,9 @@ from database import Base
 
 class ResearchConsent(Base):
     __tablename__ = "research_consent"
+    __table_args__ = (
+        Index("ix_research_consent_purge_status", "purge_status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
@@ -14,6 +17,8 @@ class ResearchConsent(Base):
     consented_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     revoked_at = Column(DateTime(timezone=True), nullable=True)
     ip_hash = Column(String(64), nullable=True)
+    # pending while a revocation's research events are being deleted, then complete.
+    purge_status = Column(String(20), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
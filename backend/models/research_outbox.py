@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, DateTime, event, insert
+from sqlalchemy.orm import attributes
+from sqlalchemy.sql import func
+from database import Base
+from .dream import Dream
+
+# Dream columns that feed a research event; other edits do not re-extract.
+RESEARCH_FIELDS = (
+    "emotions", "tags", "lucidity_level", "dream_date", "mood",
+    "dream_type", "vividness", "is_recurring",
+)
+
+
+class ResearchOutbox(Base):
+    """A dream whose research event must be (re-)extracted.
+
+    Written in the same transaction as the dream itself and drained by the
+    research outbox worker, so the request path never waits on extraction
+    and a crash cannot lose an event between the two writes.
+    """
+
+    __tablename__ = "research_outbox"
+
+    id = Column(Integer, primary_key=True)
+    dream_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+def _enqueue(connection, dream: Dream) -> None:
+    connection.execute(insert(ResearchOutbox.__table__).values(dream_id=dream.id, user_id=dream.user_id))
+
+
+@event.listens_for(Dream, "after_insert")
+def _outbox_after_insert(mapper, connection, dream):
+    _enqueue(connection, dream)
+
+
+@event.listens_for(Dream, "after_update")
+def _outbox_after_update(mapper, connection, dream):
+    if any(attributes.get_history(dream, f).has_changes() for f in RESEARCH_FIELDS):
+        _enqueue(connection, dream)
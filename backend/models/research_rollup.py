@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, Date, DateTime, Index
+from database import Base
+
+
+class ResearchRollupState(Base):
+    """Single-row bookkeeping for the research rollup job."""
+
+    __tablename__ = "research_rollup_state"
+
+    id = Column(Integer, primary_key=True)
+    # created_at of the newest research event already folded into rollups.
+    watermark = Column(DateTime(timezone=True), nullable=True)
+    # Bumped in the transaction of every research event deletion, so readers
+    # that only append new events can tell their copy is stale.
+    deletions = Column(Integer, nullable=True)
+
+
+class ResearchRollupDirtyDay(Base):
+    """A day whose rollups must be recomputed because events were removed.
+
+    Additions are found through the watermark; deletions leave nothing
+    behind to scan, so the deleting code records the affected days here.
+    Duplicates are allowed and collapsed by the job.
+    """
+
+    __tablename__ = "research_rollup_dirty_days"
+    __table_args__ = (
+        Index("ix_research_rollup_dirty_days_day", "day"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
@@ -0,0 +1,82 @@
+"""SQLite FTS5 full-text index over dreams, goals and ideas.
+
+Each entity gets an external-content FTS5 table keyed by the entity's id
+(the FTS rowid), so indexed text is not stored twice. Triggers on the base
+tables keep the index in step with every write path, including bulk
+statements that bypass the ORM. The DDL is attached to the base tables'
+create/drop events and is also run by the startup migration for databases
+created before the index existed.
+"""
+from dataclasses import dataclass
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+
+from .dream import Dream
+from .goal import Goal
+from .idea import Idea
+
+
+@dataclass(frozen=True)
+class SearchIndexSpec:
+    entity_type: str
+    table: str
+    fts_table: str
+    title_column: str
+    columns: tuple[str, ...]
+
+
+SEARCH_INDEXES = {
+    "dream": SearchIndexSpec("dream", "dreams", "dreams_fts", "title", ("title", "content")),
+    "goal": SearchIndexSpec("goal", "goals", "goals_fts", "title", ("title", "description")),
+    "idea": SearchIndexSpec("idea", "ideas", "ideas_fts", "content", ("content",)),
+}
+
+
+def _ddl(spec: SearchIndexSpec) -> list[str]:
+    cols = ", ".join(spec.columns)
+    new_vals = ", ".join(f"new.{c}" for c in spec.columns)
+    old_vals = ", ".join(f"old.{c}" for c in spec.columns)
+    fts = spec.fts_table
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{spec.table}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {spec.table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {spec.table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {spec.table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals}); END",
+    ]
+
+
+def create_search_index(conn: Connection, spec: SearchIndexSpec, rebuild: bool = False) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in _ddl(spec):
+        conn.execute(text(statement))
+    if rebuild:
+        conn.execute(text(f"INSERT INTO {spec.fts_table}({spec.fts_table}) VALUES ('rebuild')"))
+
+
+def drop_search_index(conn: Connection, spec: SearchIndexSpec) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    conn.execute(text(f"DROP TABLE IF EXISTS {spec.fts_table}"))
+
+
+def create_all_search_indexes(conn: Connection) -> None:
+    """Migration step: build missing indexes and backfill them from existing rows."""
+    for spec in SEARCH_INDEXES.values():
+        create_search_index(conn, spec, rebuild=True)
+
+
+def _attach(model, spec: SearchIndexSpec) -> None:
+    event.listen(model.__table__, "after_create", lambda target, conn, **kw: create_search_index(conn, spec))
+    event.listen(model.__table__, "before_drop", lambda target, conn, **kw: drop_search_index(conn, spec))
+
+
+_attach(Dream, SEARCH_INDEXES["dream"])
+_attach(Goal, SEARCH_INDEXES["goal"])
+_attach(Idea, SEARCH_INDEXES["idea"])
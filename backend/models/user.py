@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -6,6 +6,9 @@ from database import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_deleted_at", "deleted_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -25,6 +28,8 @@ class User(Base):
     age_bracket = Column(String(10), nullable=True)
     gender_category = Column(String(20), nullable=True)
     region = Column(String(50), nullable=True)
+    # Set when the account is deleted; the row and its data are purged in the background.
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     
     dreams = relationship("Dream", back_populates="user", cascade="all, delete-orphan")
     goals = relationship("Goal", back_populates="user", cascade="all, delete-orphan")
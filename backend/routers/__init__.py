@@ -1,3 +1,3 @@
-from . import auth, dreams, goals, ideas, sleep, ai, research, filters
+from . import auth, dreams, goals, ideas, sleep, ai, research, filters, search
 
-__all__ = ["auth", "dreams", "goals", "ideas", "sleep", "ai", "research", "filters"]
+__all__ = ["auth", "dreams", "goals", "ideas", "sleep", "ai", "research", "filters", "search"]
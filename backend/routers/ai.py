@@ -1,20 +1,25 @@
-from datetime import datetime, timedelta
-from typing import Annotated, Optional
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Annotated, Any, Literal, Optional
+from pydantic import BaseModel, Field
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import get_settings
 from database import get_db
+from models.ai_job import AIJob
 from models.user import User
 from models.dream import Dream
 from models.goal import Goal
 from models.idea import Idea
 from models.sleep_log import SleepLog
 from routers.auth import get_current_user
+from services.ai_jobs import JOB_PRIORITIES, UNFINISHED, ai_jobs, recent_dreams_for_patterns
 from services.ai_service import ai_service
 
 router = APIRouter()
+settings = get_settings()
 
 
 class InsightsResponse(BaseModel):
@@ -83,6 +88,27 @@ class GoalAlignmentResponse(BaseModel):
     relevant_themes: list[str] = []
 
 
+class AIJobRequest(BaseModel):
+    kind: Literal["interpret", "patterns"]
+    dream_id: Optional[int] = None  # required for interpret
+    days: int = Field(30, ge=1, le=3650)  # patterns only
+
+
+class AIJobStatus(BaseModel):
+    id: int
+    kind: str
+    status: str
+    params: dict[str, Any]
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 @router.get("/status")
 async def get_ai_status():
     return {
@@ -94,11 +120,11 @@ async def get_ai_status():
 @router.get("/insights", response_model=InsightsResponse)
 async def get_insights(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    dreams = db.query(Dream).filter(Dream.user_id == current_user.id).order_by(Dream.dream_date.desc()).limit(10).all()
-    goals = db.query(Goal).filter(Goal.user_id == current_user.id).all()
-    sleep_logs = db.query(SleepLog).filter(SleepLog.user_id == current_user.id).order_by(SleepLog.sleep_time.desc()).limit(14).all()
+    dreams = (await db.scalars(select(Dream).filter(Dream.user_id == current_user.id).order_by(Dream.dream_date.desc()).limit(10))).all()
+    goals = (await db.scalars(select(Goal).filter(Goal.user_id == current_user.id))).all()
+    sleep_logs = (await db.scalars(select(SleepLog).filter(SleepLog.user_id == current_user.id).order_by(SleepLog.sleep_time.desc()).limit(14))).all()
     
     dream_insights = None
     if dreams:
@@ -169,43 +195,83 @@ async def auto_tag_dream(
 @router.get("/patterns", response_model=PatternAnalysisResponse)
 async def get_dream_patterns(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     days: int = 30,
 ):
-    since = datetime.utcnow() - timedelta(days=days)
-    dreams = (
-        db.query(Dream)
-        .filter(Dream.user_id == current_user.id, Dream.dream_date >= since.date())
-        .order_by(Dream.dream_date.desc())
-        .all()
+    dream_dicts = await recent_dreams_for_patterns(db, current_user.id, days)
+    result = await ai_service.analyze_dream_patterns(dream_dicts)
+    return PatternAnalysisResponse(**result)
+
+
+@router.post("/jobs", response_model=AIJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_ai_job(
+    request: AIJobRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue an interpretation or pattern analysis; an unfinished identical job is returned instead."""
+    if request.kind == "interpret":
+        if request.dream_id is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="dream_id is required")
+        dream_id = await db.scalar(select(Dream.id).filter(
+            Dream.id == request.dream_id,
+            Dream.user_id == current_user.id
+        ))
+        if dream_id is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dream not found")
+        params = {"dream_id": dream_id}
+    else:
+        params = {"days": request.days}
+
+    unfinished = (await db.scalars(
+        select(AIJob).filter(AIJob.user_id == current_user.id, AIJob.status.in_(UNFINISHED))
+    )).all()
+    for job in unfinished:
+        if job.kind == request.kind and job.params == params:
+            return job
+    if len(unfinished) >= settings.ai_job_max_pending_per_user:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"At most {settings.ai_job_max_pending_per_user} unfinished AI jobs",
+        )
+
+    job = AIJob(
+        user_id=current_user.id,
+        kind=request.kind,
+        params=params,
+        priority=JOB_PRIORITIES[request.kind],
+        status="pending",
     )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    ai_jobs.enqueue(job.id, job.priority)
+    return job
 
-    dream_dicts = [
-        {
-            "content": d.content,
-            "emotions": d.emotions or [],
-            "tags": d.tags or [],
-            "dream_type": d.dream_type or "normal",
-            "mood": d.mood,
-        }
-        for d in dreams
-    ]
 
-    result = await ai_service.analyze_dream_patterns(dream_dicts)
-    return PatternAnalysisResponse(**result)
+@router.get("/jobs/{job_id}", response_model=AIJobStatus)
+async def get_ai_job(
+    job_id: int,
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_db),
+):
+    job = await db.scalar(select(AIJob).filter(AIJob.id == job_id, AIJob.user_id == current_user.id))
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
 
 
 @router.post("/dream-to-ideas", response_model=DreamIdeasResponse)
 async def dream_to_ideas(
     request: dict,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     dream_id = request.get("dream_id")
     if not dream_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="dream_id is required")
 
-    dream = db.query(Dream).filter(Dream.id == dream_id, Dream.user_id == current_user.id).first()
+    dream = await db.scalar(select(Dream).filter(Dream.id == dream_id, Dream.user_id == current_user.id))
     if not dream:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dream not found")
 
@@ -220,9 +286,9 @@ async def dream_to_ideas(
 async def explore_dream(
     request: ExploreRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    dream = db.query(Dream).filter(Dream.id == request.dream_id, Dream.user_id == current_user.id).first()
+    dream = await db.scalar(select(Dream).filter(Dream.id == request.dream_id, Dream.user_id == current_user.id))
     if not dream:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dream not found")
 
@@ -237,19 +303,18 @@ async def explore_dream(
 async def goal_alignment(
     request: GoalAlignmentRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    goal = db.query(Goal).filter(Goal.id == request.goal_id, Goal.user_id == current_user.id).first()
+    goal = await db.scalar(select(Goal).filter(Goal.id == request.goal_id, Goal.user_id == current_user.id))
     if not goal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
 
-    dreams = (
-        db.query(Dream)
+    dreams = (await db.scalars(
+        select(Dream)
         .filter(Dream.user_id == current_user.id)
         .order_by(Dream.dream_date.desc())
         .limit(20)
-        .all()
-    )
+    )).all()
 
     dreams_summary = "\n".join([
         f"- {d.title}: {d.content[:150]}... (emotions: {', '.join(d.emotions or [])}, tags: {', '.join(d.tags or [])})"
@@ -1,41 +1,110 @@
+import ipaddress
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import get_settings
 from database import get_db
 from models.user import User
+from models.research_consent import ResearchConsent
+from models.account_export import AccountExport
 from schemas.user import (
     UserCreate, UserResponse, UserLogin, UserUpdate,
-    PasswordChange, UserExport, Token, TokenData,
+    PasswordChange, UserExport, AccountExportStatus, Token, TokenData,
 )
-from schemas.dream import DreamResponse
-from schemas.goal import GoalResponse
-from schemas.idea import IdeaResponse
-from schemas.sleep_log import SleepLogResponse
+from services.account_export import ACCOUNT_EXPORT_FORMATS, export_filename, stream_account_export
+from services.principal_cache import principal_cache
+from services.password_hasher import HashingPoolSaturated, password_hasher
+from services.rate_limit import AttemptThrottle
+from services.research_rollup import mark_consent_days_dirty
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=12, deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+ip_throttle = AttemptThrottle(settings.login_attempts_per_ip, settings.login_attempt_window_seconds)
+email_throttle = AttemptThrottle(settings.login_attempts_per_email, settings.login_attempt_window_seconds)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
 
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except HashingPoolSaturated:
+        raise _busy_exception()
+
+
+async def get_password_hash(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except HashingPoolSaturated:
+        raise _busy_exception()
+
+
+def _busy_exception() -> HTTPException:
+    logger.warning("Password hashing pool saturated, rejecting request")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is temporarily busy. Please try again shortly.",
+        headers={"Retry-After": "1"},
+    )
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+
+def _parse_networks(value: str) -> tuple:
+    networks = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if entry:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+    return tuple(networks)
+
+
+trusted_proxies = _parse_networks(settings.trusted_proxies)
+
+
+def _is_trusted(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies)
+
+
+def _client_ip(request: Request) -> str:
+    """Address of the caller, looking through trusted reverse proxies.
+
+    X-Forwarded-For is only read when the peer is a trusted proxy. The header
+    is walked right to left, skipping further trusted hops, so a client cannot
+    choose its own throttle key by prepending addresses.
+    """
+    host = request.client.host if request.client else "unknown"
+    if not _is_trusted(host):
+        return host
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(forwarded):
+        if not _is_trusted(hop):
+            return hop
+    return forwarded[0] if forwarded else host
+
+
+def _enforce_throttle(throttle: AttemptThrottle, key: str) -> None:
+    retry_after = throttle.retry_after(key)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts. Please try again later.",
+            headers={"Retry-After": str(retry_after)},
+        )
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -47,61 +116,76 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        user_id_str = payload.get("sub")
-        if user_id_str is None:
+    user_id = principal_cache.get_user_id(token)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+            user_id_str = payload.get("sub")
+            if user_id_str is None:
+                raise credentials_exception
+            token_data = TokenData(user_id=int(user_id_str))
+        except JWTError:
             raise credentials_exception
-        token_data = TokenData(user_id=int(user_id_str))
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+        user_id = token_data.user_id
+        principal_cache.set_token(token, user_id, payload.get("exp"))
+
+    cached_user = principal_cache.get_user(user_id)
+    if cached_user is not None:
+        # Attach the snapshot to this request's session without a SELECT.
+        db.add(cached_user)
+        return cached_user
+
+    user = await db.scalar(select(User).filter(User.id == user_id, User.deleted_at.is_(None)))
     if user is None:
         raise credentials_exception
+    principal_cache.set_user(user)
     return user
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, request: Request, db: AsyncSession = Depends(get_db)):
     normalized_email = user_data.email.lower().strip()
+    client_ip = _client_ip(request)
+    _enforce_throttle(ip_throttle, client_ip)
     
-    existing_user = db.query(User).filter(User.email == normalized_email).first()
+    existing_user = await db.scalar(select(User).filter(User.email == normalized_email))
     if existing_user:
+        ip_throttle.record(client_ip)
         logger.info(f"Registration attempt with existing email: {normalized_email}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
+    hashed_password = await get_password_hash(user_data.password)
     try:
-        hashed_password = get_password_hash(user_data.password)
         new_user = User(
             email=normalized_email,
             password_hash=hashed_password,
             name=user_data.name
         )
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         logger.info(f"User registered successfully: {normalized_email}")
         return new_user
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
+        ip_throttle.record(client_ip)
         logger.warning(f"Race condition: duplicate email during registration: {normalized_email}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Registration failed for {normalized_email}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -112,36 +196,53 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 @router.post("/login", response_model=Token)
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
     normalized_email = form_data.username.lower().strip()
-    user = db.query(User).filter(User.email == normalized_email).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+    client_ip = _client_ip(request)
+    _enforce_throttle(ip_throttle, client_ip)
+    _enforce_throttle(email_throttle, normalized_email)
+
+    user = await db.scalar(select(User).filter(User.email == normalized_email))
+    if not user or not await verify_password(form_data.password, user.password_hash):
+        ip_throttle.record(client_ip)
+        email_throttle.record(normalized_email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    email_throttle.reset(normalized_email)
     user.last_login_at = datetime.now(timezone.utc)
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate_user(user.id)
     
     access_token = create_access_token(data={"sub": str(user.id)})
     return Token(access_token=access_token)
 
 
 @router.post("/login/json", response_model=Token)
-async def login_json(login_data: UserLogin, db: Session = Depends(get_db)):
+async def login_json(login_data: UserLogin, request: Request, db: AsyncSession = Depends(get_db)):
     normalized_email = login_data.email.lower().strip()
-    user = db.query(User).filter(User.email == normalized_email).first()
-    if not user or not verify_password(login_data.password, user.password_hash):
+    client_ip = _client_ip(request)
+    _enforce_throttle(ip_throttle, client_ip)
+    _enforce_throttle(email_throttle, normalized_email)
+
+    user = await db.scalar(select(User).filter(User.email == normalized_email))
+    if not user or not await verify_password(login_data.password, user.password_hash):
+        ip_throttle.record(client_ip)
+        email_throttle.record(normalized_email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
         )
     
+    email_throttle.reset(normalized_email)
     user.last_login_at = datetime.now(timezone.utc)
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate_user(user.id)
     
     access_token = create_access_token(data={"sub": str(user.id)})
     return Token(access_token=access_token)
@@ -156,13 +257,14 @@ async def get_me(current_user: Annotated[User, Depends(get_current_user)]):
 async def update_me(
     updates: UserUpdate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     update_data = updates.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(current_user, field, value)
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    principal_cache.invalidate_user(current_user.id)
+    await db.refresh(current_user)
     return current_user
 
 
@@ -170,22 +272,25 @@ async def update_me(
 async def change_password(
     password_data: PasswordChange,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    if not verify_password(password_data.current_password, current_user.password_hash):
+    _enforce_throttle(email_throttle, current_user.email)
+    if not await verify_password(password_data.current_password, current_user.password_hash):
+        email_throttle.record(current_user.email)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect",
         )
-    current_user.password_hash = get_password_hash(password_data.new_password)
-    db.commit()
+    current_user.password_hash = await get_password_hash(password_data.new_password)
+    await db.commit()
+    principal_cache.invalidate_user(current_user.id)
     return {"message": "Password updated successfully"}
 
 
 @router.delete("/me")
 async def delete_account(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     password: str = None,
 ):
     if not password:
@@ -193,24 +298,104 @@ async def delete_account(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password confirmation required",
         )
-    if not verify_password(password, current_user.password_hash):
+    _enforce_throttle(email_throttle, current_user.email)
+    if not await verify_password(password, current_user.password_hash):
+        email_throttle.record(current_user.email)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password is incorrect",
         )
-    db.delete(current_user)
-    db.commit()
+    # Mark the account deleted and release its email right away; the rows
+    # themselves are removed in chunks by the background purge.
+    user_id = current_user.id
+    now = datetime.now(timezone.utc)
+    consent = await db.scalar(select(ResearchConsent).filter(ResearchConsent.user_id == user_id))
+    if consent is not None and consent.status == "active":
+        consent.status = "revoked"
+        consent.revoked_at = now
+        await mark_consent_days_dirty(db, consent.id)
+    current_user.deleted_at = now
+    current_user.email = f"deleted-{user_id}@deleted.invalid"
+    await db.commit()
+    principal_cache.invalidate_user(user_id)
+    principal_cache.invalidate_tokens(user_id)
     return {"message": "Account deleted successfully"}
 
 
+def _validate_export_format(format: str) -> str:
+    if format not in ACCOUNT_EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid format. Must be one of: {', '.join(ACCOUNT_EXPORT_FORMATS)}",
+        )
+    return format
+
+
 @router.get("/export", response_model=UserExport)
 async def export_data(
     current_user: Annotated[User, Depends(get_current_user)],
+    format: str = Query("json", description="json, ndjson or zip"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream the user's data; ``json`` keeps the ``UserExport`` document shape."""
+    _validate_export_format(format)
+    return StreamingResponse(
+        stream_account_export(db, current_user, format),
+        media_type=ACCOUNT_EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="dreamcatcher-export.{format}"'},
+    )
+
+
+@router.post("/export/jobs", response_model=AccountExportStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_export_job(
+    current_user: Annotated[User, Depends(get_current_user)],
+    format: str = Query("zip", description="json, ndjson or zip"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue a background export; an unfinished one for the same format is returned instead."""
+    _validate_export_format(format)
+    export = await db.scalar(
+        select(AccountExport).filter(
+            AccountExport.user_id == current_user.id,
+            AccountExport.format == format,
+            AccountExport.status.in_(("pending", "running")),
+        )
+    )
+    if export is None:
+        export = AccountExport(user_id=current_user.id, format=format, status="pending")
+        db.add(export)
+        await db.commit()
+        await db.refresh(export)
+    return export
+
+
+async def _get_export(export_id: int, user: User, db: AsyncSession) -> AccountExport:
+    export = await db.scalar(
+        select(AccountExport).filter(AccountExport.id == export_id, AccountExport.user_id == user.id)
+    )
+    if export is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export not found")
+    return export
+
+
+@router.get("/export/jobs/{export_id}", response_model=AccountExportStatus)
+async def get_export_job(
+    export_id: int,
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_db),
+):
+    return await _get_export(export_id, current_user, db)
+
+
+@router.get("/export/jobs/{export_id}/download")
+async def download_export(
+    export_id: int,
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_db),
 ):
-    return UserExport(
-        user=UserResponse.model_validate(current_user),
-        dreams=[DreamResponse.model_validate(d) for d in current_user.dreams],
-        goals=[GoalResponse.model_validate(g) for g in current_user.goals],
-        ideas=[IdeaResponse.model_validate(i) for i in current_user.ideas],
-        sleep_logs=[SleepLogResponse.model_validate(s) for s in current_user.sleep_logs],
+    export = await _get_export(export_id, current_user, db)
+    if export.status != "complete" or not export.path:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Export is {export.status}")
+    return FileResponse(
+        export.path, media_type=ACCOUNT_EXPORT_FORMATS[export.format], filename=export_filename(export)
     )
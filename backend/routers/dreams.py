@@ -2,19 +2,22 @@ import logging
 from datetime import datetime
 from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import cast, String
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 
 from database import get_db
 from models.user import User
 from models.dream import Dream
 from models.goal import Goal
-from models.research_consent import ResearchConsent
-from schemas.dream import DreamCreate, DreamUpdate, DreamResponse
+from models.dream_label import DreamLabel
+from schemas.dream import DreamCreate, DreamUpdate, DreamResponse, DreamImportResult
 from routers.auth import get_current_user
 from services.ai_service import ai_service
-from services.research_extraction import extract_research_event
+from services.bulk_import import ImportFormatError, detect_format
+from services.dream_import import import_dreams
+from services.pagination import keyset_page
+from services.search import text_filter
 
 logger = logging.getLogger(__name__)
 
@@ -25,13 +28,13 @@ router = APIRouter()
 async def create_dream(
     dream_data: DreamCreate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if dream_data.goal_id is not None:
-        goal = db.query(Goal).filter(
+        goal = await db.scalar(select(Goal).filter(
             Goal.id == dream_data.goal_id,
             Goal.user_id == current_user.id
-        ).first()
+        ))
         if not goal:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -55,79 +58,81 @@ async def create_dream(
         dream_type=dream_data.dream_type,
         goal_id=dream_data.goal_id,
     )
+    # Research extraction is queued in this transaction by the outbox mapper
+    # hooks (models/research_outbox.py) and performed by a background worker.
     db.add(dream)
-    db.commit()
-    db.refresh(dream)
+    await db.commit()
+    await db.refresh(dream)
+    return dream
 
-    try:
-        consent = (
-            db.query(ResearchConsent)
-            .filter(
-                ResearchConsent.user_id == current_user.id,
-                ResearchConsent.status == "active",
-            )
-            .first()
-        )
-        if consent:
-            extract_research_event(dream, current_user, consent, db)
-    except Exception:
-        logger.exception("Research extraction failed for dream %s", dream.id)
 
-    return dream
+@router.post("/import", response_model=DreamImportResult)
+async def import_dream_batch(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    format: Optional[str] = Query(None, description="json, ndjson or csv; defaults from Content-Type"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Import many dreams at once; invalid rows are reported and skipped."""
+    try:
+        fmt = detect_format(request.headers.get("content-type"), format)
+        return await import_dreams(db, current_user.id, await request.body(), fmt)
+    except ImportFormatError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
 
 @router.get("/tags")
 async def get_tags(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    dreams = db.query(Dream).filter(Dream.user_id == current_user.id).all()
-
-    all_tags: set[str] = set()
-    all_emotions: set[str] = set()
-    all_characters: set[str] = set()
-    all_locations: set[str] = set()
-
-    for dream in dreams:
-        if dream.tags:
-            all_tags.update(dream.tags)
-        if dream.emotions:
-            all_emotions.update(dream.emotions)
-        if dream.characters:
-            all_characters.update(dream.characters)
-        if dream.locations:
-            all_locations.update(dream.locations)
+    rows = await db.execute(
+        select(DreamLabel.kind, DreamLabel.value)
+        .filter(DreamLabel.user_id == current_user.id)
+        .distinct()
+        .order_by(DreamLabel.kind, DreamLabel.value)
+    )
+
+    vocabulary: dict[str, list[str]] = {"tag": [], "emotion": [], "character": [], "location": []}
+    for kind, value in rows:
+        vocabulary[kind].append(value)
 
     return {
-        "tags": sorted(all_tags),
-        "emotions": sorted(all_emotions),
-        "characters": sorted(all_characters),
-        "locations": sorted(all_locations),
+        "tags": vocabulary["tag"],
+        "emotions": vocabulary["emotion"],
+        "characters": vocabulary["character"],
+        "locations": vocabulary["location"],
     }
 
 
 @router.get("/recurring", response_model=List[DreamResponse])
 async def get_recurring_dreams(
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
 ):
-    dreams = (
-        db.query(Dream)
-        .filter(Dream.user_id == current_user.id, Dream.is_recurring == True)
-        .order_by(Dream.dream_date.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    return await keyset_page(
+        db,
+        select(Dream).filter(Dream.user_id == current_user.id, Dream.is_recurring == True),
+        id_col=Dream.id,
+        sort_col=Dream.dream_date,
+        sort_by="date",
+        sort_order="desc",
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+        response=response,
     )
-    return dreams
 
 
 @router.get("/", response_model=List[DreamResponse])
 async def get_dreams(
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     mood: Optional[int] = Query(None, ge=1, le=5),
@@ -138,8 +143,9 @@ async def get_dreams(
     q: Optional[str] = Query(None),
     sort_by: Optional[str] = Query(None, pattern="^(date|mood|vividness)$"),
     sort_order: Optional[str] = Query(None, pattern="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None),
 ):
-    query = db.query(Dream).filter(Dream.user_id == current_user.id)
+    query = select(Dream).filter(Dream.user_id == current_user.id)
     
     if mood is not None:
         query = query.filter(Dream.mood == mood)
@@ -150,31 +156,45 @@ async def get_dreams(
     if date_to is not None:
         query = query.filter(Dream.dream_date <= date_to)
     if tag is not None:
-        query = query.filter(cast(Dream.tags, String).contains(tag))
-    if q is not None:
-        search_term = f"%{q}%"
         query = query.filter(
-            (Dream.title.like(search_term)) | (Dream.content.like(search_term))
+            Dream.id.in_(
+                select(DreamLabel.dream_id).filter(
+                    DreamLabel.user_id == current_user.id,
+                    DreamLabel.kind == "tag",
+                    DreamLabel.value == tag,
+                )
+            )
         )
+    if q is not None:
+        query = query.filter(text_filter(db, "dream", q))
 
     sort_col_map = {"date": Dream.dream_date, "mood": Dream.mood, "vividness": Dream.vividness}
-    sort_col = sort_col_map.get(sort_by or "date", Dream.dream_date)
-    order = sort_col.asc() if sort_order == "asc" else sort_col.desc()
+    sort_by = sort_by or "date"
 
-    dreams = query.order_by(order).offset(skip).limit(limit).all()
-    return dreams
+    return await keyset_page(
+        db,
+        query,
+        id_col=Dream.id,
+        sort_col=sort_col_map[sort_by],
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+        response=response,
+    )
 
 
 @router.get("/{dream_id}", response_model=DreamResponse)
 async def get_dream(
     dream_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    dream = db.query(Dream).filter(
+    dream = await db.scalar(select(Dream).filter(
         Dream.id == dream_id,
         Dream.user_id == current_user.id
-    ).first()
+    ))
     
     if not dream:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dream not found")
@@ -187,12 +207,12 @@ async def update_dream(
     dream_id: int,
     dream_data: DreamUpdate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    dream = db.query(Dream).filter(
+    dream = await db.scalar(select(Dream).filter(
         Dream.id == dream_id,
         Dream.user_id == current_user.id
-    ).first()
+    ))
     
     if not dream:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dream not found")
@@ -201,8 +221,8 @@ async def update_dream(
     for key, value in update_data.items():
         setattr(dream, key, value)
     
-    db.commit()
-    db.refresh(dream)
+    await db.commit()
+    await db.refresh(dream)
     return dream
 
 
@@ -210,18 +230,18 @@ async def update_dream(
 async def delete_dream(
     dream_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    dream = db.query(Dream).filter(
+    dream = await db.scalar(select(Dream).filter(
         Dream.id == dream_id,
         Dream.user_id == current_user.id
-    ).first()
+    ))
     
     if not dream:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dream not found")
     
-    db.delete(dream)
-    db.commit()
+    await db.delete(dream)
+    await db.commit()
     return None
 
 
@@ -229,12 +249,12 @@ async def delete_dream(
 async def interpret_dream(
     dream_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    dream = db.query(Dream).filter(
+    dream = await db.scalar(select(Dream).filter(
         Dream.id == dream_id,
         Dream.user_id == current_user.id
-    ).first()
+    ))
     
     if not dream:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dream not found")
@@ -246,6 +266,6 @@ async def interpret_dream(
     )
     
     dream.ai_interpretation = interpretation
-    db.commit()
-    db.refresh(dream)
+    await db.commit()
+    await db.refresh(dream)
     return dream
@@ -1,7 +1,8 @@
 from typing import Annotated, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import get_db
 from models.user import User
@@ -16,7 +17,7 @@ router = APIRouter()
 async def create_saved_filter(
     filter_data: SavedFilterCreate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     saved_filter = SavedFilter(
         user_id=current_user.id,
@@ -25,38 +26,38 @@ async def create_saved_filter(
         filter_config=filter_data.filter_config,
     )
     db.add(saved_filter)
-    db.commit()
-    db.refresh(saved_filter)
+    await db.commit()
+    await db.refresh(saved_filter)
     return saved_filter
 
 
 @router.get("/", response_model=List[SavedFilterResponse])
 async def get_saved_filters(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     entity_type: Optional[str] = Query(None),
 ):
-    query = db.query(SavedFilter).filter(SavedFilter.user_id == current_user.id)
+    query = select(SavedFilter).filter(SavedFilter.user_id == current_user.id)
     if entity_type:
         query = query.filter(SavedFilter.entity_type == entity_type)
-    return query.order_by(SavedFilter.created_at.desc()).all()
+    return (await db.scalars(query.order_by(SavedFilter.created_at.desc()))).all()
 
 
 @router.delete("/{filter_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_saved_filter(
     filter_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    saved_filter = db.query(SavedFilter).filter(
+    saved_filter = await db.scalar(select(SavedFilter).filter(
         SavedFilter.id == filter_id,
         SavedFilter.user_id == current_user.id,
-    ).first()
+    ))
     if not saved_filter:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Saved filter not found",
         )
-    db.delete(saved_filter)
-    db.commit()
+    await db.delete(saved_filter)
+    await db.commit()
     return None
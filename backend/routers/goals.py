@@ -1,8 +1,8 @@
-from typing import Annotated, List, Optional
+from typing import Annotated, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func as sa_func
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func as sa_func, select, update
 
 from database import get_db
 from models.user import User
@@ -12,22 +12,50 @@ from schemas.dream import DreamResponse
 from schemas.goal import GoalCreate, GoalUpdate, GoalResponse, GoalDetailResponse
 from routers.auth import get_current_user
 from services.ai_service import ai_service
+from services.pagination import keyset_page
+from services.search import text_filter
 
 router = APIRouter()
 
 
-def _goal_with_dream_count(goal: Goal, db: Session) -> dict:
-    dream_count = db.query(sa_func.count(Dream.id)).filter(Dream.goal_id == goal.id).scalar() or 0
-    goal_dict = {c.name: getattr(goal, c.name) for c in goal.__table__.columns}
-    goal_dict["dream_count"] = dream_count
-    return goal_dict
+async def _linked_dream_stats(goal_ids: List[int], db: AsyncSession) -> Dict[int, dict]:
+    """Aggregates of the dreams linked to each goal, in one grouped query."""
+    if not goal_ids:
+        return {}
+    rows = await db.execute(
+        select(
+            Dream.goal_id,
+            sa_func.count(Dream.id),
+            sa_func.avg(Dream.mood),
+            sa_func.max(Dream.dream_date),
+        )
+        .filter(Dream.goal_id.in_(goal_ids))
+        .group_by(Dream.goal_id)
+    )
+    return {
+        goal_id: {
+            "dream_count": count,
+            "avg_dream_mood": round(avg_mood, 2) if avg_mood is not None else None,
+            "last_dream_date": last_date,
+        }
+        for goal_id, count, avg_mood, last_date in rows
+    }
+
+
+async def _goals_with_dream_stats(goals: List[Goal], db: AsyncSession) -> List[GoalResponse]:
+    stats = await _linked_dream_stats([g.id for g in goals], db)
+    return [GoalResponse.model_validate(g).model_copy(update=stats.get(g.id, {})) for g in goals]
+
+
+async def _goal_with_dream_stats(goal: Goal, db: AsyncSession) -> GoalResponse:
+    return (await _goals_with_dream_stats([goal], db))[0]
 
 
 @router.post("/", response_model=GoalResponse, status_code=status.HTTP_201_CREATED)
 async def create_goal(
     goal_data: GoalCreate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     milestones = [m.model_dump() for m in goal_data.milestones] if goal_data.milestones else []
     
@@ -42,15 +70,16 @@ async def create_goal(
         notes=goal_data.notes,
     )
     db.add(goal)
-    db.commit()
-    db.refresh(goal)
-    return _goal_with_dream_count(goal, db)
+    await db.commit()
+    await db.refresh(goal)
+    return await _goal_with_dream_stats(goal, db)
 
 
 @router.get("/", response_model=List[GoalResponse])
 async def get_goals(
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     status_filter: Optional[str] = Query(None, alias="status"),
@@ -59,27 +88,35 @@ async def get_goals(
     priority_min: Optional[int] = Query(None, ge=1, le=5),
     sort_by: Optional[str] = Query(None, pattern="^(date|priority|progress)$"),
     sort_order: Optional[str] = Query(None, pattern="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None),
 ):
-    query = db.query(Goal).filter(Goal.user_id == current_user.id)
+    query = select(Goal).filter(Goal.user_id == current_user.id)
     
     if status_filter:
         query = query.filter(Goal.status == status_filter)
     if category:
         query = query.filter(Goal.category == category)
     if q is not None:
-        search_term = f"%{q}%"
-        query = query.filter(
-            (Goal.title.like(search_term)) | (Goal.description.like(search_term))
-        )
+        query = query.filter(text_filter(db, "goal", q))
     if priority_min is not None:
         query = query.filter(Goal.priority >= priority_min)
 
     sort_col_map = {"date": Goal.created_at, "priority": Goal.priority, "progress": Goal.progress}
-    sort_col = sort_col_map.get(sort_by or "date", Goal.created_at)
-    order = sort_col.asc() if sort_order == "asc" else sort_col.desc()
-
-    goals = query.order_by(order).offset(skip).limit(limit).all()
-    return [_goal_with_dream_count(g, db) for g in goals]
+    sort_by = sort_by or "date"
+
+    goals = await keyset_page(
+        db,
+        query,
+        id_col=Goal.id,
+        sort_col=sort_col_map[sort_by],
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+        response=response,
+    )
+    return await _goals_with_dream_stats(goals, db)
 
 
 @router.get("/categories/list", response_model=List[str])
@@ -95,45 +132,50 @@ async def get_statuses():
 @router.get("/{goal_id}/dreams", response_model=List[DreamResponse])
 async def get_goal_dreams(
     goal_id: int,
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
 ):
-    goal = db.query(Goal).filter(
+    goal = await db.scalar(select(Goal).filter(
         Goal.id == goal_id,
         Goal.user_id == current_user.id
-    ).first()
+    ))
     
     if not goal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
     
-    dreams = (
-        db.query(Dream)
-        .filter(Dream.goal_id == goal_id, Dream.user_id == current_user.id)
-        .order_by(Dream.dream_date.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    return await keyset_page(
+        db,
+        select(Dream).filter(Dream.goal_id == goal_id, Dream.user_id == current_user.id),
+        id_col=Dream.id,
+        sort_col=Dream.dream_date,
+        sort_by="date",
+        sort_order="desc",
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+        response=response,
     )
-    return dreams
 
 
 @router.get("/{goal_id}", response_model=GoalResponse)
 async def get_goal(
     goal_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    goal = db.query(Goal).filter(
+    goal = await db.scalar(select(Goal).filter(
         Goal.id == goal_id,
         Goal.user_id == current_user.id
-    ).first()
+    ))
     
     if not goal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
     
-    return _goal_with_dream_count(goal, db)
+    return await _goal_with_dream_stats(goal, db)
 
 
 @router.put("/{goal_id}", response_model=GoalResponse)
@@ -141,12 +183,12 @@ async def update_goal(
     goal_id: int,
     goal_data: GoalUpdate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    goal = db.query(Goal).filter(
+    goal = await db.scalar(select(Goal).filter(
         Goal.id == goal_id,
         Goal.user_id == current_user.id
-    ).first()
+    ))
     
     if not goal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
@@ -159,28 +201,28 @@ async def update_goal(
     for key, value in update_data.items():
         setattr(goal, key, value)
     
-    db.commit()
-    db.refresh(goal)
-    return _goal_with_dream_count(goal, db)
+    await db.commit()
+    await db.refresh(goal)
+    return await _goal_with_dream_stats(goal, db)
 
 
 @router.delete("/{goal_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_goal(
     goal_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    goal = db.query(Goal).filter(
+    goal = await db.scalar(select(Goal).filter(
         Goal.id == goal_id,
         Goal.user_id == current_user.id
-    ).first()
+    ))
     
     if not goal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
     
-    db.query(Dream).filter(Dream.goal_id == goal_id).update({Dream.goal_id: None})
-    db.delete(goal)
-    db.commit()
+    await db.execute(update(Dream).filter(Dream.goal_id == goal_id).values(goal_id=None))
+    await db.delete(goal)
+    await db.commit()
     return None
 
 
@@ -188,12 +230,12 @@ async def delete_goal(
 async def suggest_goal_steps(
     goal_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    goal = db.query(Goal).filter(
+    goal = await db.scalar(select(Goal).filter(
         Goal.id == goal_id,
         Goal.user_id == current_user.id
-    ).first()
+    ))
     
     if not goal:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Goal not found")
@@ -205,6 +247,6 @@ async def suggest_goal_steps(
     )
     
     goal.ai_suggestions = suggestions
-    db.commit()
-    db.refresh(goal)
-    return _goal_with_dream_count(goal, db)
+    await db.commit()
+    await db.refresh(goal)
+    return await _goal_with_dream_stats(goal, db)
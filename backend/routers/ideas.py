@@ -1,13 +1,16 @@
 from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import get_db
 from models.user import User
 from models.idea import Idea
 from schemas.idea import IdeaCreate, IdeaUpdate, IdeaResponse
 from routers.auth import get_current_user
+from services.pagination import keyset_page
+from services.search import text_filter
 
 router = APIRouter()
 
@@ -16,7 +19,7 @@ router = APIRouter()
 async def create_idea(
     idea_data: IdeaCreate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     idea = Idea(
         user_id=current_user.id,
@@ -26,15 +29,16 @@ async def create_idea(
         priority=idea_data.priority
     )
     db.add(idea)
-    db.commit()
-    db.refresh(idea)
+    await db.commit()
+    await db.refresh(idea)
     return idea
 
 
 @router.get("/", response_model=List[IdeaResponse])
 async def get_ideas(
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     category: Optional[str] = None,
@@ -42,35 +46,44 @@ async def get_ideas(
     q: Optional[str] = Query(None),
     sort_by: Optional[str] = Query(None, pattern="^(date|priority)$"),
     sort_order: Optional[str] = Query(None, pattern="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None),
 ):
-    query = db.query(Idea).filter(Idea.user_id == current_user.id)
+    query = select(Idea).filter(Idea.user_id == current_user.id)
     
     if category:
         query = query.filter(Idea.category == category)
     if priority is not None:
         query = query.filter(Idea.priority == priority)
     if q is not None:
-        search_term = f"%{q}%"
-        query = query.filter(Idea.content.like(search_term))
+        query = query.filter(text_filter(db, "idea", q))
 
     sort_col_map = {"date": Idea.created_at, "priority": Idea.priority}
-    sort_col = sort_col_map.get(sort_by or "date", Idea.created_at)
-    order = sort_col.asc() if sort_order == "asc" else sort_col.desc()
+    sort_by = sort_by or "date"
 
-    ideas = query.order_by(order).offset(skip).limit(limit).all()
-    return ideas
+    return await keyset_page(
+        db,
+        query,
+        id_col=Idea.id,
+        sort_col=sort_col_map[sort_by],
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+        response=response,
+    )
 
 
 @router.get("/{idea_id}", response_model=IdeaResponse)
 async def get_idea(
     idea_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    idea = db.query(Idea).filter(
+    idea = await db.scalar(select(Idea).filter(
         Idea.id == idea_id,
         Idea.user_id == current_user.id
-    ).first()
+    ))
     
     if not idea:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Idea not found")
@@ -83,12 +96,12 @@ async def update_idea(
     idea_id: int,
     idea_data: IdeaUpdate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    idea = db.query(Idea).filter(
+    idea = await db.scalar(select(Idea).filter(
         Idea.id == idea_id,
         Idea.user_id == current_user.id
-    ).first()
+    ))
     
     if not idea:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Idea not found")
@@ -97,8 +110,8 @@ async def update_idea(
     for key, value in update_data.items():
         setattr(idea, key, value)
     
-    db.commit()
-    db.refresh(idea)
+    await db.commit()
+    await db.refresh(idea)
     return idea
 
 
@@ -106,16 +119,16 @@ async def update_idea(
 async def delete_idea(
     idea_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    idea = db.query(Idea).filter(
+    idea = await db.scalar(select(Idea).filter(
         Idea.id == idea_id,
         Idea.user_id == current_user.id
-    ).first()
+    ))
     
     if not idea:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Idea not found")
     
-    db.delete(idea)
-    db.commit()
+    await db.delete(idea)
+    await db.commit()
     return None
@@ -1,36 +1,59 @@
+import hmac
 import logging
 from datetime import datetime, timezone
 from typing import Annotated, Optional
 from collections import Counter
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 
+from config import get_settings
 from database import get_db
 from models.user import User
 from models.research_consent import ResearchConsent
-from models.dream_research_event import DreamResearchEvent
+from models.dream_research_aggregate import DreamResearchAggregate
+from models.research_backfill import ResearchBackfill
 from schemas.research import (
     ConsentTerms,
     ConsentGrant,
     ConsentResponse,
     ConsentRevoke,
     ResearchAggregateResponse,
+    BackfillStatus,
+    ResearchCubeResponse,
 )
 from routers.auth import get_current_user
+from services.purge import PURGE_PENDING
+from services.cache import TTLCache
+from services.research_backfill import cancel_backfills, start_backfill
+from services.research_cube import CUBE_MAX_DIMENSIONS, build_cube
+from services.research_export import EXPORT_FORMATS, encode_export, export_batches, export_watermark
+from services.research_rollup import GROUP_FIELDS, PERIOD_TYPES, mark_consent_days_dirty
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-CURRENT_CONSENT_VERSION = "1.0"
+EXPORT_WATERMARK_HEADER = "X-Export-Watermark"
+
+settings = get_settings()
+
+# Cubes are public and change only as events arrive; a short TTL absorbs repeated queries.
+cube_cache = TTLCache(max_entries=256, ttl_seconds=settings.research_cube_cache_seconds)
+
+CURRENT_CONSENT_VERSION = "1.1"
 CONSENT_TEXT = (
     "By participating in DreamCatcher Research, you agree to contribute "
     "anonymized dream data for academic and scientific research. Your data "
     "will be stripped of all personally identifiable information before "
-    "inclusion in any research dataset. You may revoke consent at any time, "
-    "which will permanently delete all research data derived from your dreams."
+    "inclusion in any research dataset. Besides aggregate statistics, "
+    "approved research partners may receive individual de-identified "
+    "research records, one per dream, each carrying a random-looking key "
+    "that links later edits of the same dream. You may revoke consent at any "
+    "time. Revoking permanently deletes all research data held by "
+    "DreamCatcher, but cannot recall records already delivered to partners."
 )
 DATA_CATEGORIES = [
     "dream_emotions",
@@ -41,8 +64,6 @@ DATA_CATEGORIES = [
     "demographic_brackets",
 ]
 
-K_ANONYMITY_THRESHOLD = 5
-
 
 @router.get("/consent/terms", response_model=ConsentTerms)
 async def get_consent_terms():
@@ -56,12 +77,11 @@ async def get_consent_terms():
 @router.get("/consent/status", response_model=ConsentResponse)
 async def get_consent_status(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    consent = (
-        db.query(ResearchConsent)
+    consent = await db.scalar(
+        select(ResearchConsent)
         .filter(ResearchConsent.user_id == current_user.id)
-        .first()
     )
     if not consent:
         raise HTTPException(
@@ -71,16 +91,34 @@ async def get_consent_status(
     return consent
 
 
+@router.get("/consent/backfill", response_model=BackfillStatus)
+async def get_backfill_status(
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_db),
+):
+    backfill = await db.scalar(
+        select(ResearchBackfill)
+        .filter(ResearchBackfill.user_id == current_user.id)
+        .order_by(ResearchBackfill.id.desc())
+        .limit(1)
+    )
+    if not backfill:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No backfill found",
+        )
+    return backfill
+
+
 @router.post("/consent/grant", response_model=ConsentResponse, status_code=status.HTTP_201_CREATED)
 async def grant_consent(
     data: ConsentGrant,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    existing = (
-        db.query(ResearchConsent)
+    existing = await db.scalar(
+        select(ResearchConsent)
         .filter(ResearchConsent.user_id == current_user.id)
-        .first()
     )
 
     if existing and existing.status == "active":
@@ -89,13 +127,20 @@ async def grant_consent(
             detail="Consent already active",
         )
 
+    if existing and existing.purge_status == PURGE_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Research data from the previous consent is still being deleted. Try again shortly.",
+        )
+
     if existing and existing.status == "revoked":
         existing.status = "active"
         existing.consent_version = data.consent_version
         existing.consented_at = datetime.now(timezone.utc)
         existing.revoked_at = None
-        db.commit()
-        db.refresh(existing)
+        start_backfill(db, current_user.id)
+        await db.commit()
+        await db.refresh(existing)
         return existing
 
     consent = ResearchConsent(
@@ -104,8 +149,9 @@ async def grant_consent(
         status="active",
     )
     db.add(consent)
-    db.commit()
-    db.refresh(consent)
+    start_backfill(db, current_user.id)
+    await db.commit()
+    await db.refresh(consent)
     logger.info("Consent granted for user %s", current_user.id)
     return consent
 
@@ -114,15 +160,14 @@ async def grant_consent(
 async def revoke_consent(
     data: ConsentRevoke,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    consent = (
-        db.query(ResearchConsent)
+    consent = await db.scalar(
+        select(ResearchConsent)
         .filter(
             ResearchConsent.user_id == current_user.id,
             ResearchConsent.status == "active",
         )
-        .first()
     )
     if not consent:
         raise HTTPException(
@@ -130,75 +175,158 @@ async def revoke_consent(
             detail="No active consent found",
         )
 
-    db.query(DreamResearchEvent).filter(
-        DreamResearchEvent.consent_id == consent.id
-    ).delete(synchronize_session="fetch")
-
+    # Events are deleted in chunks by the background purge (services/purge.py).
     consent.status = "revoked"
     consent.revoked_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(consent)
+    consent.purge_status = PURGE_PENDING
+    await mark_consent_days_dirty(db, consent.id)
+    await cancel_backfills(db, current_user.id)
+    await db.commit()
+    await db.refresh(consent)
     logger.info(
         "Consent revoked for user %s, reason: %s", current_user.id, data.reason
     )
     return consent
 
 
+def _group_summary(key: str, group: dict) -> dict:
+    return {
+        "key": key,
+        "count": group["count"],
+        "avg_mood": round(group["mood_sum"] / group["mood_n"], 2) if group["mood_n"] else None,
+        "avg_vividness": round(group["vividness_sum"] / group["vividness_n"], 2) if group["vividness_n"] else None,
+    }
+
+
 @router.get("/aggregate", response_model=ResearchAggregateResponse)
 async def get_aggregate(
     group_by: str = Query("dream_type", description="Field to group by"),
     period_type: Optional[str] = Query(None, description="Filter by period: daily/weekly/monthly"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    valid_group_fields = {
-        "dream_type": DreamResearchEvent.dream_type,
-        "emotion": DreamResearchEvent.emotion,
-        "theme": DreamResearchEvent.theme,
-        "is_lucid": DreamResearchEvent.is_lucid,
-        "age_bracket": DreamResearchEvent.age_bracket,
-        "region": DreamResearchEvent.region,
-        "day_of_week": DreamResearchEvent.day_of_week,
-        "month": DreamResearchEvent.month,
-    }
-
-    if group_by not in valid_group_fields:
+    if group_by not in GROUP_FIELDS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid group_by field. Must be one of: {', '.join(valid_group_fields.keys())}",
+            detail=f"Invalid group_by field. Must be one of: {', '.join(GROUP_FIELDS.keys())}",
+        )
+    if period_type is not None and period_type not in PERIOD_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid period_type. Must be one of: {', '.join(PERIOD_TYPES)}",
         )
 
-    group_col = valid_group_fields[group_by]
-
-    query = db.query(
-        group_col.label("group_key"),
-        func.count().label("count"),
-        func.avg(DreamResearchEvent.mood_score).label("avg_mood"),
-        func.avg(DreamResearchEvent.vividness).label("avg_vividness"),
-    ).group_by(group_col)
-
-    if period_type == "monthly":
-        query = query.filter(DreamResearchEvent.month.isnot(None))
-
-    rows = query.all()
+    # Without a period_type, totals are summed from the monthly rollups, the
+    # coarsest level and therefore the one with the least suppression.
+    rollups = (await db.scalars(
+        select(DreamResearchAggregate)
+        .filter(DreamResearchAggregate.period_type == (period_type or "monthly"))
+        .order_by(DreamResearchAggregate.period_start)
+    )).all()
 
-    groups = []
+    merged: dict[str, dict] = {}
     suppressed = 0
     total_events = 0
+    periods = []
 
-    for row in rows:
-        total_events += row.count
-        if row.count < K_ANONYMITY_THRESHOLD:
-            suppressed += 1
-            continue
-        groups.append({
-            "key": str(row.group_key) if row.group_key is not None else "unknown",
-            "count": row.count,
-            "avg_mood": round(float(row.avg_mood), 2) if row.avg_mood else None,
-            "avg_vividness": round(float(row.avg_vividness), 2) if row.avg_vividness else None,
-        })
+    for rollup in rollups:
+        stats = (rollup.group_stats or {}).get(group_by, {"groups": {}, "suppressed": 0})
+        total_events += rollup.sample_size
+        suppressed += stats["suppressed"]
+        for key, group in stats["groups"].items():
+            target = merged.setdefault(key, dict.fromkeys(group, 0))
+            for name, value in group.items():
+                target[name] += value
+        if period_type is not None:
+            periods.append({
+                "period_start": rollup.period_start,
+                "period_end": rollup.period_end,
+                "sample_size": rollup.sample_size,
+                "lucid_rate": rollup.lucid_rate,
+                "avg_mood": rollup.avg_mood,
+                "avg_sleep_quality": rollup.avg_sleep_quality,
+                "groups": [_group_summary(key, group) for key, group in stats["groups"].items()],
+                "suppressed_groups": stats["suppressed"],
+            })
 
     return ResearchAggregateResponse(
-        groups=groups,
+        groups=[_group_summary(key, group) for key, group in merged.items()],
         total_events=total_events,
         suppressed_groups=suppressed,
+        period_type=period_type,
+        periods=periods,
+    )
+
+
+
+@router.get("/cube", response_model=ResearchCubeResponse)
+async def get_cube(
+    dimensions: str = Query(..., description="Comma-separated fields, e.g. region,age_bracket,dream_type"),
+    filter: list[str] = Query([], description="Repeatable dimension:value restriction, e.g. region:north"),
+    db: AsyncSession = Depends(get_db),
+):
+    fields = [d.strip() for d in dimensions.split(",") if d.strip()]
+    invalid = [d for d in fields if d not in GROUP_FIELDS]
+    if invalid or not fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid dimensions. Must be one of: {', '.join(GROUP_FIELDS.keys())}",
+        )
+    if len(fields) != len(set(fields)) or len(fields) > CUBE_MAX_DIMENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Use between 1 and {CUBE_MAX_DIMENSIONS} distinct dimensions",
+        )
+
+    filters: dict[str, list[str]] = {}
+    for item in filter:
+        field, sep, value = item.partition(":")
+        if not sep or field not in GROUP_FIELDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid filter '{item}'. Use dimension:value with one of: {', '.join(GROUP_FIELDS.keys())}",
+            )
+        filters.setdefault(field, []).append(value)
+
+    key = (tuple(fields), tuple(sorted((f, tuple(sorted(v))) for f, v in filters.items())))
+    cube = cube_cache.get(key)
+    if cube is None:
+        cube = await build_cube(db, fields, filters)
+        cube_cache.set(key, cube)
+    return cube
+
+
+def require_export_token(x_research_export_token: Annotated[Optional[str], Header()] = None) -> None:
+    """Event-level export is for research partners holding ``RESEARCH_EXPORT_TOKEN``."""
+    if not settings.research_export_token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Research export is not enabled")
+    if not x_research_export_token or not hmac.compare_digest(
+        x_research_export_token, settings.research_export_token
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid research export token")
+
+
+@router.get("/export", dependencies=[Depends(require_export_token)])
+async def export_events(
+    format: str = Query("csv", description="csv, arrow or parquet"),
+    since: Optional[datetime] = Query(None, description="Watermark returned by the previous export"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream k-anonymized research events created after ``since``."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}",
+        )
+    if since is not None:
+        since = (since if since.tzinfo else since.replace(tzinfo=timezone.utc)).astimezone(timezone.utc)
+
+    until = export_watermark()
+    filename = f"research-events-{until:%Y%m%dT%H%M%SZ}.{format}"
+    return StreamingResponse(
+        encode_export(export_batches(db, since, until), format),
+        media_type=EXPORT_FORMATS[format],
+        headers={
+            EXPORT_WATERMARK_HEADER: until.isoformat(),
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        },
     )
@@ -0,0 +1,40 @@
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
+from models.user import User
+from models.search_index import SEARCH_INDEXES
+from schemas.search import SearchResponse
+from routers.auth import get_current_user
+from services import search as search_service
+
+router = APIRouter()
+
+TITLE_MAX_LENGTH = 120
+
+
+@router.get("/", response_model=SearchResponse)
+async def search(
+    current_user: Annotated[User, Depends(get_current_user)],
+    db: AsyncSession = Depends(get_db),
+    q: str = Query(..., min_length=1),
+    types: Optional[str] = Query(None, description="Comma-separated subset of: dream, goal, idea"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    entity_types = list(SEARCH_INDEXES)
+    if types:
+        entity_types = [t.strip() for t in types.split(",") if t.strip()]
+        invalid = [t for t in entity_types if t not in SEARCH_INDEXES]
+        if invalid or not entity_types:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid types. Must be a subset of: {', '.join(SEARCH_INDEXES)}",
+            )
+
+    hits = await search_service.search(db, current_user.id, q, entity_types, limit)
+    for hit in hits:
+        if len(hit["title"]) > TITLE_MAX_LENGTH:
+            hit["title"] = hit["title"][:TITLE_MAX_LENGTH].rstrip() + "…"
+    return SearchResponse(query=q, hits=hits)
@@ -1,9 +1,10 @@
 from typing import Annotated, List, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func as sa_func
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func as sa_func, select
 
 from database import get_db
 from models.user import User
@@ -15,8 +16,14 @@ from schemas.sleep_log import (
     SleepLogResponse,
     SleepStats,
     SleepCorrelation,
+    SleepImportResult,
 )
 from routers.auth import get_current_user
+from services.bulk_import import ImportFormatError, detect_format
+from services.pagination import keyset_page
+from services.sleep_correlations import sleep_correlations
+from services.sleep_import import import_sleep_logs, utc
+from services.sleep_stats import TREND_BUCKETS, sleep_stats
 
 router = APIRouter()
 
@@ -25,13 +32,13 @@ router = APIRouter()
 async def create_sleep_log(
     sleep_data: SleepLogCreate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if sleep_data.dream_id:
-        dream = db.query(Dream).filter(
+        dream = await db.scalar(select(Dream).filter(
             Dream.id == sleep_data.dream_id,
             Dream.user_id == current_user.id
-        ).first()
+        ))
         if not dream:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -40,8 +47,8 @@ async def create_sleep_log(
     
     sleep_log = SleepLog(
         user_id=current_user.id,
-        sleep_time=sleep_data.sleep_time,
-        wake_time=sleep_data.wake_time,
+        sleep_time=utc(sleep_data.sleep_time),
+        wake_time=utc(sleep_data.wake_time),
         quality=sleep_data.quality,
         notes=sleep_data.notes,
         dream_id=sleep_data.dream_id,
@@ -53,15 +60,35 @@ async def create_sleep_log(
         stress_level=sleep_data.stress_level,
     )
     db.add(sleep_log)
-    db.commit()
-    db.refresh(sleep_log)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A sleep log with this sleep_time already exists")
+    await db.refresh(sleep_log)
     return sleep_log
 
 
+@router.post("/import", response_model=SleepImportResult)
+async def import_sleep_batch(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    format: Optional[str] = Query(None, description="json, ndjson or csv; defaults from Content-Type"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Upsert nights from a wearable export, keyed on sleep_time; invalid rows are reported and skipped."""
+    try:
+        fmt = detect_format(request.headers.get("content-type"), format)
+        return await import_sleep_logs(db, current_user.id, await request.body(), fmt)
+    except ImportFormatError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
 @router.get("/", response_model=List[SleepLogResponse])
 async def get_sleep_logs(
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     quality: Optional[int] = Query(None, ge=1, le=5),
@@ -70,15 +97,16 @@ async def get_sleep_logs(
     quality_min: Optional[int] = Query(None, ge=1, le=5),
     sort_by: Optional[str] = Query(None, pattern="^(date|quality|duration)$"),
     sort_order: Optional[str] = Query(None, pattern="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None),
 ):
-    query = db.query(SleepLog).filter(SleepLog.user_id == current_user.id)
+    query = select(SleepLog).filter(SleepLog.user_id == current_user.id)
     
     if quality is not None:
         query = query.filter(SleepLog.quality == quality)
     if date_from is not None:
-        query = query.filter(SleepLog.sleep_time >= date_from)
+        query = query.filter(SleepLog.sleep_time >= utc(date_from))
     if date_to is not None:
-        query = query.filter(SleepLog.sleep_time <= date_to)
+        query = query.filter(SleepLog.sleep_time <= utc(date_to))
     if quality_min is not None:
         query = query.filter(SleepLog.quality >= quality_min)
 
@@ -87,114 +115,70 @@ async def get_sleep_logs(
         "quality": SleepLog.quality,
         "duration": SleepLog.sleep_duration_minutes,
     }
-    sort_col = sort_col_map.get(sort_by or "date", SleepLog.sleep_time)
-    order = sort_col.asc() if sort_order == "asc" else sort_col.desc()
-
-    sleep_logs = query.order_by(order).offset(skip).limit(limit).all()
-    return sleep_logs
+    sort_by = sort_by or "date"
+
+    return await keyset_page(
+        db,
+        query,
+        id_col=SleepLog.id,
+        sort_col=sort_col_map[sort_by],
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+        response=response,
+    )
 
 
 @router.get("/stats", response_model=SleepStats)
 async def get_sleep_stats(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     date_from: Optional[datetime] = Query(None),
     date_to: Optional[datetime] = Query(None),
+    bucket: str = Query("auto", pattern=f"^({'|'.join(TREND_BUCKETS)})$"),
+    max_points: int = Query(120, ge=3, le=1000),
 ):
-    query = db.query(SleepLog).filter(SleepLog.user_id == current_user.id)
+    criteria = [SleepLog.user_id == current_user.id]
 
     if date_from:
-        query = query.filter(SleepLog.sleep_time >= date_from)
+        criteria.append(SleepLog.sleep_time >= utc(date_from))
     if date_to:
-        query = query.filter(SleepLog.sleep_time <= date_to)
-
-    logs = query.order_by(SleepLog.sleep_time.asc()).all()
-    total_logs = len(logs)
-
-    if total_logs == 0:
-        return SleepStats(
-            avg_quality=0.0,
-            avg_duration=None,
-            total_logs=0,
-            quality_trend=[],
-        )
-
-    total_quality = sum(log.quality for log in logs)
-    avg_quality = round(total_quality / total_logs, 2)
+        criteria.append(SleepLog.sleep_time <= utc(date_to))
 
-    durations = [log.sleep_duration_minutes for log in logs if log.sleep_duration_minutes is not None]
-    avg_duration = round(sum(durations) / len(durations), 1) if durations else None
-
-    quality_trend = [
-        {
-            "date": log.sleep_time.isoformat(),
-            "quality": log.quality,
-        }
-        for log in logs
-    ]
-
-    return SleepStats(
-        avg_quality=avg_quality,
-        avg_duration=avg_duration,
-        total_logs=total_logs,
-        quality_trend=quality_trend,
-    )
+    return SleepStats(**await sleep_stats(db, criteria, bucket, max_points))
 
 
 @router.get("/correlations", response_model=SleepCorrelation)
 async def get_sleep_correlations(
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     date_from: Optional[datetime] = Query(None),
     date_to: Optional[datetime] = Query(None),
+    include_points: bool = Query(True, description="Include a sample of the raw pairs"),
+    max_points: int = Query(100, ge=1, le=1000),
 ):
-    query = (
-        db.query(SleepLog, Dream)
-        .outerjoin(Dream, SleepLog.dream_id == Dream.id)
-        .filter(SleepLog.user_id == current_user.id)
-    )
+    criteria = [SleepLog.user_id == current_user.id]
 
     if date_from:
-        query = query.filter(SleepLog.sleep_time >= date_from)
+        criteria.append(SleepLog.sleep_time >= utc(date_from))
     if date_to:
-        query = query.filter(SleepLog.sleep_time <= date_to)
-
-    results = query.all()
+        criteria.append(SleepLog.sleep_time <= utc(date_to))
 
-    mood_vs_quality = []
-    duration_vs_vividness = []
-
-    for sleep_log, dream in results:
-        if dream is not None:
-            mood_vs_quality.append({
-                "date": sleep_log.sleep_time.isoformat(),
-                "mood": dream.mood,
-                "quality": sleep_log.quality,
-            })
-
-            if sleep_log.sleep_duration_minutes is not None:
-                duration_vs_vividness.append({
-                    "date": sleep_log.sleep_time.isoformat(),
-                    "duration_minutes": sleep_log.sleep_duration_minutes,
-                    "vividness": dream.vividness,
-                })
-
-    return SleepCorrelation(
-        mood_vs_quality=mood_vs_quality,
-        duration_vs_vividness=duration_vs_vividness,
-    )
+    return SleepCorrelation(**await sleep_correlations(db, criteria, include_points, max_points))
 
 
 @router.get("/{sleep_id}", response_model=SleepLogResponse)
 async def get_sleep_log(
     sleep_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    sleep_log = db.query(SleepLog).filter(
+    sleep_log = await db.scalar(select(SleepLog).filter(
         SleepLog.id == sleep_id,
         SleepLog.user_id == current_user.id
-    ).first()
+    ))
     
     if not sleep_log:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sleep log not found")
@@ -207,21 +191,21 @@ async def update_sleep_log(
     sleep_id: int,
     sleep_data: SleepLogUpdate,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    sleep_log = db.query(SleepLog).filter(
+    sleep_log = await db.scalar(select(SleepLog).filter(
         SleepLog.id == sleep_id,
         SleepLog.user_id == current_user.id
-    ).first()
+    ))
     
     if not sleep_log:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sleep log not found")
     
     if sleep_data.dream_id:
-        dream = db.query(Dream).filter(
+        dream = await db.scalar(select(Dream).filter(
             Dream.id == sleep_data.dream_id,
             Dream.user_id == current_user.id
-        ).first()
+        ))
         if not dream:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -229,11 +213,18 @@ async def update_sleep_log(
             )
     
     update_data = sleep_data.model_dump(exclude_unset=True)
+    for key in ("sleep_time", "wake_time"):
+        if update_data.get(key) is not None:
+            update_data[key] = utc(update_data[key])
     for key, value in update_data.items():
         setattr(sleep_log, key, value)
     
-    db.commit()
-    db.refresh(sleep_log)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A sleep log with this sleep_time already exists")
+    await db.refresh(sleep_log)
     return sleep_log
 
 
@@ -241,16 +232,16 @@ async def update_sleep_log(
 async def delete_sleep_log(
     sleep_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    sleep_log = db.query(SleepLog).filter(
+    sleep_log = await db.scalar(select(SleepLog).filter(
         SleepLog.id == sleep_id,
         SleepLog.user_id == current_user.id
-    ).first()
+    ))
     
     if not sleep_log:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sleep log not found")
     
-    db.delete(sleep_log)
-    db.commit()
+    await db.delete(sleep_log)
+    await db.commit()
     return None
@@ -37,6 +37,17 @@ class DreamUpdate(BaseModel):
     goal_id: Optional[int] = None
 
 
+class DreamImportError(BaseModel):
+    row: int
+    message: str
+
+
+class DreamImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[DreamImportError] = []
+
+
 class DreamResponse(BaseModel):
     id: int
     user_id: int
@@ -45,6 +45,8 @@ class GoalResponse(BaseModel):
     milestones: List[dict]
     ai_suggestions: Optional[str] = None
     dream_count: int = 0
+    avg_dream_mood: Optional[float] = None
+    last_dream_date: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -20,6 +20,7 @@ class ConsentResponse(BaseModel):
     status: str
     consented_at: datetime
     revoked_at: Optional[datetime] = None
+    purge_status: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -29,7 +30,30 @@ class ConsentRevoke(BaseModel):
     reason: Optional[str] = None
 
 
+class BackfillStatus(BaseModel):
+    id: int
+    status: str
+    processed: int
+    total: Optional[int] = None
+    events_written: int
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ResearchCubeResponse(BaseModel):
+    dimensions: list[str]
+    filters: dict[str, list[str]] = {}
+    cells: list[dict]
+    total_events: int
+    suppressed_cells: int
+
+
 class ResearchAggregateResponse(BaseModel):
     groups: list[dict]
     total_events: int
     suppressed_groups: int
+    period_type: Optional[str] = None
+    periods: list[dict] = []
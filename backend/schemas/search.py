@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class SearchHit(BaseModel):
+    entity_type: str
+    id: int
+    title: str
+    snippet: str
+    rank: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    hits: list[SearchHit]
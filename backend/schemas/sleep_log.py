@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class SleepLogCreate(BaseModel):
@@ -52,13 +52,45 @@ class SleepLogResponse(BaseModel):
         from_attributes = True
 
 
+class SleepImportError(BaseModel):
+    row: int
+    message: str
+
+
+class SleepImportResult(BaseModel):
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[SleepImportError] = []
+
+
 class SleepStats(BaseModel):
     avg_quality: float
     avg_duration: Optional[float] = None
     total_logs: int
     quality_trend: list[dict]
+    trend_bucket: Optional[str] = None
+    quality_percentiles: dict[str, float] = {}
+    duration_percentiles: dict[str, float] = {}
+
+
+class CorrelationBin(BaseModel):
+    bin: int  # quality level, or whole hours of sleep for duration
+    count: int
+    mean: float
+    ci95: Optional[list[float]] = None
+
+
+class CorrelationStats(BaseModel):
+    n: int
+    pearson: Optional[float] = None
+    pearson_ci95: Optional[list[float]] = None
+    spearman: Optional[float] = None
+    bins: list[CorrelationBin] = []
 
 
 class SleepCorrelation(BaseModel):
-    mood_vs_quality: list[dict]
-    duration_vs_vividness: list[dict]
+    mood_vs_quality_stats: CorrelationStats
+    duration_vs_vividness_stats: CorrelationStats
+    mood_vs_quality: list[dict] = []
+    duration_vs_vividness: list[dict] = []
@@ -79,6 +79,19 @@ class UserExport(BaseModel):
         from_attributes = True
 
 
+class AccountExportStatus(BaseModel):
+    id: int
+    format: str
+    status: str
+    size_bytes: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -0,0 +1,250 @@
+"""Streaming export of a user's account data.
+
+Each table is read through ``yield_per`` in batches of
+``account_export_batch_size`` rows. Every row is validated through its
+response schema and serialized on its own, and output leaves in chunks of
+about ``CHUNK_BYTES``. Memory stays flat however much a user has logged.
+
+Formats:
+
+- ``json``: the ``UserExport`` document (``user``, ``dreams``, ``goals``,
+  ``ideas``, ``sleep_logs``), written incrementally.
+- ``ndjson``: one ``{"type": ..., "data": ...}`` record per line.
+- ``zip``: a deflated archive with one JSON file per section.
+
+Exports can also run in the background (``AccountExport`` rows). The job
+writes the artifact under ``account_export_dir`` for later download, and
+deletes it after ``account_export_retention_hours``. File operations run in
+worker threads, so a slow disk never stalls the event loop.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import zipfile
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models.account_export import AccountExport
+from models.dream import Dream
+from models.goal import Goal
+from models.idea import Idea
+from models.sleep_log import SleepLog
+from models.user import User
+from schemas.dream import DreamResponse
+from schemas.goal import GoalResponse
+from schemas.idea import IdeaResponse
+from schemas.sleep_log import SleepLogResponse
+from schemas.user import UserResponse
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+CHUNK_BYTES = 64 * 1024
+
+ACCOUNT_EXPORT_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "zip": "application/zip",
+}
+
+# (section name, model, response schema), in export order after the user record.
+EXPORT_SECTIONS = (
+    ("dreams", Dream, DreamResponse),
+    ("goals", Goal, GoalResponse),
+    ("ideas", Idea, IdeaResponse),
+    ("sleep_logs", SleepLog, SleepLogResponse),
+)
+
+
+def _user_json(user: User) -> str:
+    return UserResponse.model_validate(user).model_dump_json()
+
+
+async def _section_rows(db: AsyncSession, user_id: int, model, schema) -> AsyncIterator[str]:
+    """JSON of each of the user's rows in ``model``, read ``yield_per`` rows at a time."""
+    result = await db.stream_scalars(
+        select(model)
+        .filter(model.user_id == user_id)
+        .order_by(model.id)
+        .execution_options(yield_per=settings.account_export_batch_size)
+    )
+    async for row in result:
+        yield schema.model_validate(row).model_dump_json()
+
+
+async def _buffered(parts: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    buffer, size = [], 0
+    async for part in parts:
+        data = part.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def _json_parts(db: AsyncSession, user: User) -> AsyncIterator[str]:
+    yield '{"user":' + _user_json(user)
+    for name, model, schema in EXPORT_SECTIONS:
+        yield f',"{name}":['
+        separator = ""
+        async for row in _section_rows(db, user.id, model, schema):
+            yield separator + row
+            separator = ","
+        yield "]"
+    yield "}"
+
+
+async def _ndjson_parts(db: AsyncSession, user: User) -> AsyncIterator[str]:
+    yield '{"type":"user","data":' + _user_json(user) + "}\n"
+    for name, model, schema in EXPORT_SECTIONS:
+        record_type = json.dumps(name)
+        async for row in _section_rows(db, user.id, model, schema):
+            yield '{"type":' + record_type + ',"data":' + row + "}\n"
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable sink, so zipfile streams entries with data descriptors."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self.pending = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.pending += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks, self.pending = b"".join(self._chunks), [], 0
+        return data
+
+
+async def _zip_stream(db: AsyncSession, user: User) -> AsyncIterator[bytes]:
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("user.json", _user_json(user))
+        for name, model, schema in EXPORT_SECTIONS:
+            with archive.open(f"{name}.json", "w") as entry:
+                entry.write(b"[")
+                separator = b""
+                async for row in _section_rows(db, user.id, model, schema):
+                    entry.write(separator + row.encode())
+                    separator = b","
+                    if sink.pending >= CHUNK_BYTES:
+                        yield sink.drain()
+                entry.write(b"]")
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_account_export(db: AsyncSession, user: User, fmt: str) -> AsyncIterator[bytes]:
+    """The user's data in one of ``ACCOUNT_EXPORT_FORMATS``, as a byte stream."""
+    if fmt == "zip":
+        return _zip_stream(db, user)
+    if fmt == "ndjson":
+        return _buffered(_ndjson_parts(db, user))
+    return _buffered(_json_parts(db, user))
+
+
+def export_filename(export: AccountExport) -> str:
+    return f"dreamcatcher-export-{export.id}.{export.format}"
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def _remove_artifact(export: AccountExport) -> None:
+    if export.path:
+        await asyncio.to_thread(_remove_file, export.path)
+        export.path = None
+
+
+async def run_export(db: AsyncSession, export: AccountExport) -> None:
+    """Write ``export``'s artifact to disk and mark it complete (or failed)."""
+    user = await db.scalar(select(User).filter(User.id == export.user_id, User.deleted_at.is_(None)))
+    if user is None:
+        export.status = "failed"
+        export.error = "Account no longer exists"
+        await db.commit()
+        return
+
+    export.status = "running"
+    await db.commit()
+
+    path = os.path.join(settings.account_export_dir, export_filename(export))
+    partial = path + ".part"
+    try:
+        await asyncio.to_thread(os.makedirs, settings.account_export_dir, exist_ok=True)
+        size = 0
+        f = await asyncio.to_thread(open, partial, "wb")
+        try:
+            async for chunk in stream_account_export(db, user, export.format):
+                await asyncio.to_thread(f.write, chunk)
+                size += len(chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.replace, partial, path)
+    except Exception:
+        logger.exception("Account export %s failed", export.id)
+        await asyncio.to_thread(_remove_file, partial)
+        export.status = "failed"
+        export.error = "Export failed"
+        await db.commit()
+        return
+
+    export.path = path
+    export.size_bytes = size
+    export.status = "complete"
+    export.completed_at = datetime.now(timezone.utc)
+    await db.commit()
+    logger.info("Account export %s complete: %d bytes", export.id, size)
+
+
+async def delete_export_artifacts(db: AsyncSession, user_id: int) -> None:
+    """Remove a user's export files, e.g. before their account is purged. Does not commit."""
+    exports = (await db.scalars(
+        select(AccountExport).filter(AccountExport.user_id == user_id, AccountExport.path.is_not(None))
+    )).all()
+    for export in exports:
+        await _remove_artifact(export)
+
+
+async def expire_account_exports(db: AsyncSession) -> int:
+    """Delete artifacts older than the retention period. Returns how many expired."""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.account_export_retention_hours)
+    exports = (await db.scalars(
+        select(AccountExport).filter(AccountExport.status == "complete", AccountExport.completed_at < cutoff)
+    )).all()
+    for export in exports:
+        await _remove_artifact(export)
+        export.status = "expired"
+    await db.commit()
+    return len(exports)
+
+
+async def run_account_exports(db: AsyncSession) -> int:
+    """Expire old artifacts, then run every pending export, oldest first. Returns how many ran."""
+    await expire_account_exports(db)
+    exports = (await db.scalars(
+        select(AccountExport).filter(AccountExport.status == "pending").order_by(AccountExport.id)
+    )).all()
+    for export in exports:
+        await run_export(db, export)
+    return len(exports)
@@ -0,0 +1,158 @@
+"""Content-addressed cache for AI completions.
+
+A result is keyed by the SHA-256 of the method name, its prompt version, the
+model and the normalized inputs. Only a request that would send the same
+prompt to the same model gets the stored answer. Bumping a prompt version
+or changing ``openai_model`` therefore retires old entries without a flush.
+
+There are two tiers. An in-process LRU answers repeats without I/O. The
+``ai_results`` table is shared by every worker and survives restarts. A
+persistent hit is copied into the LRU for the rest of its TTL. Failures of
+the persistent tier are logged and treated as misses, so a cache problem
+never turns into a failed AI call. Only real completions are stored;
+fallback answers are cheap and should not outlive an outage.
+"""
+import copy
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import get_settings
+from database import AsyncSessionLocal
+from models.ai_result import AIResult
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+def _normalize(value: Any) -> Any:
+    """Collapse whitespace in text and ignore the order of list items."""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, (list, tuple)):
+        return sorted((_normalize(v) for v in value), key=lambda v: json.dumps(v, sort_keys=True))
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def cache_key(method: str, prompt_version: int, model: str, inputs: dict) -> str:
+    payload = json.dumps(
+        {"method": method, "version": prompt_version, "model": model, "inputs": _normalize(inputs)},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AIResultCache:
+    """Two-tier (in-process LRU, then database) store of AI results."""
+
+    def __init__(self, session_factory: async_sessionmaker, max_entries: int, ttl_seconds: float):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.memory = TTLCache(max_entries, ttl_seconds)
+        self.persistent_hits = 0
+        self.persistent_misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        value = self.memory.get(key)
+        if value is not None:
+            return copy.deepcopy(value)  # callers may mutate what they get back
+        now = datetime.now(timezone.utc)
+        try:
+            async with self.session_factory() as db:
+                row = (await db.execute(
+                    select(AIResult.value, AIResult.expires_at).filter(AIResult.key == key, AIResult.expires_at > now)
+                )).first()
+        except Exception:
+            self.errors += 1
+            logger.exception("AI result cache read failed")
+            return None
+        if row is None:
+            self.persistent_misses += 1
+            return None
+        self.persistent_hits += 1
+        value, expires_at = row
+        if expires_at.tzinfo is None:  # SQLite returns naive UTC
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        self.memory.set(key, value, (expires_at - now).total_seconds())
+        return value
+
+    async def set(self, key: str, method: str, value: Any) -> None:
+        if not self.enabled or value is None:
+            return
+        self.memory.set(key, value)
+        now = datetime.now(timezone.utc)
+        try:
+            async with self.session_factory() as db:
+                await db.merge(AIResult(
+                    key=key,
+                    method=method,
+                    value=value,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=self.ttl_seconds),
+                ))
+                await db.commit()
+        except Exception:
+            # Usually a concurrent identical miss that stored the row first.
+            self.errors += 1
+            logger.exception("AI result cache write failed")
+            return
+        self.stores += 1
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        hits = memory["hits"] + self.persistent_hits
+        lookups = memory["hits"] + memory["misses"]
+        return {
+            "memory": memory,
+            "persistent_hits": self.persistent_hits,
+            "persistent_misses": self.persistent_misses,
+            "stores": self.stores,
+            "errors": self.errors,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+async def prune_ai_results(db: AsyncSession) -> int:
+    """Delete expired rows, then the oldest beyond ``ai_cache_max_rows``. Returns rows deleted."""
+    deleted = (await db.execute(
+        delete(AIResult).where(AIResult.expires_at <= datetime.now(timezone.utc))
+    )).rowcount
+    cutoff = (await db.execute(
+        select(AIResult.created_at)
+        .order_by(AIResult.created_at.desc())
+        .offset(settings.ai_cache_max_rows)
+        .limit(1)
+    )).scalar()
+    if cutoff is not None:
+        deleted += (await db.execute(delete(AIResult).where(AIResult.created_at <= cutoff))).rowcount
+    await db.commit()
+    return deleted
+
+
+ai_result_cache = AIResultCache(
+    AsyncSessionLocal,
+    max_entries=settings.ai_cache_memory_entries,
+    ttl_seconds=settings.ai_cache_ttl_seconds,
+)
@@ -0,0 +1,193 @@
+"""Background AI jobs: submit, run on a bounded worker pool, poll for the result.
+
+A synchronous AI endpoint holds its request open for the whole completion,
+and a client that gives up throws the paid result away. A job is instead
+stored as an ``ai_jobs`` row and its id is put on an in-process priority
+queue. ``ai_job_workers`` tasks take ids off the queue, lowest priority
+value first. Each worker claims its job with a conditional UPDATE, so a job
+runs once even when several processes have queued it. The result goes on
+the row, and interpretations are also saved on the dream. Clients poll
+``GET /api/ai/jobs/{id}``.
+
+The queue is only a wake-up list; the table is the source of truth. The
+periodic sweep re-queues pending jobs (after a restart, or ones submitted
+to another process) and retries running jobs whose worker was lost, up to
+``ai_job_max_attempts``. It also deletes finished jobs after
+``ai_job_retention_hours``.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import get_settings
+from database import AsyncSessionLocal
+from models.ai_job import AIJob
+from models.dream import Dream
+from services.ai_service import ai_service
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Lower runs first: a single interpretation is something a user is waiting on.
+JOB_PRIORITIES = {"interpret": 0, "patterns": 10}
+UNFINISHED = ("pending", "running")
+
+
+async def recent_dreams_for_patterns(db: AsyncSession, user_id: int, days: int) -> list[dict]:
+    """The inputs ``analyze_dream_patterns`` takes for the last ``days`` days of dreams."""
+    since = datetime.utcnow() - timedelta(days=days)
+    dreams = (await db.scalars(
+        select(Dream)
+        .filter(Dream.user_id == user_id, Dream.dream_date >= since.date())
+        .order_by(Dream.dream_date.desc())
+    )).all()
+    return [
+        {
+            "content": d.content,
+            "emotions": d.emotions or [],
+            "tags": d.tags or [],
+            "dream_type": d.dream_type or "normal",
+            "mood": d.mood,
+        }
+        for d in dreams
+    ]
+
+
+async def _interpret(db: AsyncSession, job: AIJob) -> dict:
+    dream = await db.scalar(select(Dream).filter(Dream.id == job.params["dream_id"], Dream.user_id == job.user_id))
+    if dream is None:
+        raise LookupError("Dream not found")
+    interpretation = await ai_service.interpret_dream(
+        dream_content=dream.content,
+        mood=dream.mood,
+        tags=dream.tags or [],
+    )
+    dream.ai_interpretation = interpretation
+    return {"dream_id": dream.id, "interpretation": interpretation}
+
+
+async def _patterns(db: AsyncSession, job: AIJob) -> dict:
+    dreams = await recent_dreams_for_patterns(db, job.user_id, job.params["days"])
+    return await ai_service.analyze_dream_patterns(dreams)
+
+
+JOB_RUNNERS: dict[str, Callable[[AsyncSession, AIJob], Awaitable[dict]]] = {
+    "interpret": _interpret,
+    "patterns": _patterns,
+}
+
+
+async def run_job(db: AsyncSession, job_id: int) -> bool:
+    """Claim and run one pending job. Returns False if another worker had it already."""
+    claimed = await db.execute(
+        update(AIJob)
+        .where(AIJob.id == job_id, AIJob.status == "pending")
+        .values(status="running", started_at=datetime.now(timezone.utc), attempts=AIJob.attempts + 1)
+    )
+    await db.commit()
+    if claimed.rowcount != 1:
+        return False
+
+    job = await db.get(AIJob, job_id)
+    try:
+        job.result = await JOB_RUNNERS[job.kind](db, job)
+        job.status = "complete"
+    except Exception as exc:
+        logger.exception("AI job %s failed", job_id)
+        job.status = "failed"
+        job.error = str(exc)[:500]
+    job.completed_at = datetime.now(timezone.utc)
+    await db.commit()
+    return True
+
+
+class AIJobQueue:
+    """In-process priority queue of job ids drained by a fixed pool of workers."""
+
+    def __init__(self, session_factory: async_sessionmaker, workers: int):
+        self.session_factory = session_factory
+        self.workers = workers
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._queued: set[int] = set()
+        self._tasks: list[asyncio.Task] = []
+        self.completed = 0
+
+    def start(self) -> None:
+        self._queue = asyncio.PriorityQueue()
+        self._queued.clear()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def enqueue(self, job_id: int, priority: int) -> None:
+        if self._queue is None or job_id in self._queued:
+            return
+        self._queued.add(job_id)
+        self._queue.put_nowait((priority, job_id))
+
+    async def join(self) -> None:
+        """Wait until every queued job has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _work(self) -> None:
+        while True:
+            _, job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                async with self.session_factory() as db:
+                    if await run_job(db, job_id):
+                        self.completed += 1
+            except Exception:
+                logger.exception("AI job worker failed on job %s", job_id)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "completed": self.completed,
+        }
+
+
+async def sweep_ai_jobs(db: AsyncSession) -> int:
+    """Retry lost jobs, re-queue pending ones and delete expired results. Returns jobs queued."""
+    now = datetime.now(timezone.utc)
+    stale = AIJob.started_at < now - timedelta(seconds=settings.ai_job_stale_seconds)
+    await db.execute(
+        update(AIJob)
+        .where(AIJob.status == "running", stale, AIJob.attempts >= settings.ai_job_max_attempts)
+        .values(status="failed", error="Gave up after repeated interruptions", completed_at=now)
+    )
+    await db.execute(
+        update(AIJob)
+        .where(AIJob.status == "running", stale)
+        .values(status="pending", started_at=None)
+    )
+    await db.execute(
+        delete(AIJob).where(
+            AIJob.status.in_(("complete", "failed")),
+            AIJob.completed_at < now - timedelta(hours=settings.ai_job_retention_hours),
+        )
+    )
+    pending = (await db.execute(
+        select(AIJob.id, AIJob.priority).filter(AIJob.status == "pending").order_by(AIJob.priority, AIJob.id)
+    )).all()
+    await db.commit()  # before waking workers, so none of them waits on this transaction
+    for job_id, priority in pending:
+        ai_jobs.enqueue(job_id, priority)
+    return len(pending)
+
+
+ai_jobs = AIJobQueue(AsyncSessionLocal, workers=settings.ai_job_workers)
@@ -1,17 +1,123 @@
-from typing import Optional
-from openai import OpenAI
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+from openai import AsyncOpenAI
 from config import get_settings
+from services.ai_cache import ai_result_cache, cache_key
 
 settings = get_settings()
 
+# Bump a method's version whenever its prompt or parsing changes, so cached
+# results produced by the old prompt are no longer served.
+PROMPT_VERSIONS = {
+    "interpret_dream": 1,
+    "brainstorm_ideas": 1,
+    "auto_tag_dream": 1,
+    "dream_to_ideas": 1,
+}
+
 
 class AIService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
+        self.client = None
+        if settings.openai_api_key:
+            # One pooled HTTP client for the process so calls reuse keep-alive connections.
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.openai_max_concurrency,
+                    max_keepalive_connections=settings.openai_max_concurrency,
+                ),
+                timeout=settings.openai_timeout_seconds,
+            )
+            self.client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                http_client=http_client,
+                max_retries=settings.openai_max_retries,
+            )
+        self._semaphore = asyncio.Semaphore(settings.openai_max_concurrency)
+        # Cache key -> the one task computing it; concurrent identical calls await it.
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.coalesced_calls = 0
     
     def is_available(self) -> bool:
         return self.client is not None and bool(settings.openai_api_key)
-    
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+
+    async def _chat(self, messages: list[dict], max_tokens: int, temperature: float):
+        """Run a chat completion under the global concurrency cap.
+
+        Waiting for a slot and the upstream call share one deadline, so a
+        saturated pool fails fast into the caller's fallback path.
+        """
+        async def call():
+            async with self._semaphore:
+                return await self.client.chat.completions.create(
+                    model=settings.openai_model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                )
+
+        return await asyncio.wait_for(call(), timeout=settings.openai_timeout_seconds)
+
+    async def _cached(
+        self,
+        method: str,
+        inputs: dict,
+        call: Callable[[], Awaitable[Any]],
+        fallback: Callable[[], Any],
+        error_label: str,
+    ) -> Any:
+        """Serve ``method`` for ``inputs`` from the result cache, else ``call()`` and store it.
+
+        Concurrent callers with the same key share one lookup and one upstream
+        call, whichever way it ends: each gets a copy of the same result or
+        fallback. The shared task is shielded, so a caller that disconnects
+        does not cancel it for the others, and a finished completion is still
+        cached. When ``call`` raises, the fallback is returned and nothing is
+        cached.
+        """
+        key = cache_key(method, PROMPT_VERSIONS[method], settings.openai_model, inputs)
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._resolve(key, method, call, fallback, error_label))
+            self._inflight[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self.coalesced_calls += 1
+        return copy.deepcopy(await asyncio.shield(flight))
+
+    def _land(self, key: str, flight: asyncio.Future) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    async def _resolve(
+        self,
+        key: str,
+        method: str,
+        call: Callable[[], Awaitable[Any]],
+        fallback: Callable[[], Any],
+        error_label: str,
+    ) -> Any:
+        cached = await ai_result_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            result = await call()
+        except Exception as e:
+            print(f"{error_label}: {e}")
+            return fallback()
+        await ai_result_cache.set(key, method, result)
+        return result
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "coalesced_calls": self.coalesced_calls}
+
     async def interpret_dream(self, dream_content: str, mood: int, tags: list[str]) -> str:
         if not self.is_available():
             return self._fallback_interpretation(dream_content, tags)
@@ -37,9 +143,8 @@ Provide a concise interpretation (2-3 paragraphs) that:
 
 Be supportive and insightful, not prescriptive. Acknowledge that dream interpretation is subjective."""
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+        async def call() -> str:
+            response = await self._chat(
                 messages=[
                     {"role": "system", "content": "You are a thoughtful dream analyst who provides insightful, supportive interpretations of dreams. You draw on common dream symbolism and psychological concepts while acknowledging the personal nature of dream meaning."},
                     {"role": "user", "content": prompt}
@@ -48,9 +153,14 @@ Be supportive and insightful, not prescriptive. Acknowledge that dream interpret
                 temperature=0.7
             )
             return response.choices[0].message.content
-        except Exception as e:
-            print(f"OpenAI error: {e}")
-            return self._fallback_interpretation(dream_content, tags)
+
+        return await self._cached(
+            "interpret_dream",
+            {"content": dream_content, "mood": mood, "tags": tags or []},
+            call,
+            lambda: self._fallback_interpretation(dream_content, tags),
+            "OpenAI error",
+        )
     
     async def suggest_goal_steps(self, goal_title: str, goal_description: str, category: str) -> str:
         if not self.is_available():
@@ -65,8 +175,7 @@ Category: {category}
 Provide 3-5 specific, actionable steps to help achieve this goal. Be practical and encouraging."""
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._chat(
                 messages=[
                     {"role": "system", "content": "You are a supportive life coach who helps people break down their goals into actionable steps."},
                     {"role": "user", "content": prompt}
@@ -98,8 +207,7 @@ Provide:
 3. 2-3 actionable suggestions for improvement"""
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._chat(
                 messages=[
                     {"role": "system", "content": "You are a sleep health advisor who analyzes sleep patterns and provides supportive, practical advice."},
                     {"role": "user", "content": prompt}
@@ -126,9 +234,8 @@ Provide:
 2. Potential challenges to consider
 3. Related ideas worth exploring"""
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+        async def call() -> str:
+            response = await self._chat(
                 messages=[
                     {"role": "system", "content": "You are a creative thinking partner who helps develop and expand ideas."},
                     {"role": "user", "content": prompt}
@@ -137,9 +244,14 @@ Provide:
                 temperature=0.8
             )
             return response.choices[0].message.content
-        except Exception as e:
-            print(f"OpenAI error: {e}")
-            return "Unable to brainstorm at this time."
+
+        return await self._cached(
+            "brainstorm_ideas",
+            {"content": idea_content, "category": category},
+            call,
+            lambda: "Unable to brainstorm at this time.",
+            "OpenAI error",
+        )
     
     async def auto_tag_dream(self, content: str, mood: int) -> dict:
         if not self.is_available():
@@ -167,9 +279,8 @@ Return a JSON object with exactly these fields:
 
 Return ONLY valid JSON, no other text."""
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+        async def call() -> dict:
+            response = await self._chat(
                 messages=[
                     {"role": "system", "content": "You are a dream analysis tool that extracts structured metadata from dream descriptions. Always respond with valid JSON only."},
                     {"role": "user", "content": prompt}
@@ -186,9 +297,14 @@ Return ONLY valid JSON, no other text."""
                 "dream_type": result.get("dream_type", "normal") if result.get("dream_type") in ("normal", "nightmare", "lucid", "daydream") else "normal",
                 "lucidity_level": max(0, min(5, int(result.get("lucidity_level", 0)))),
             }
-        except Exception as e:
-            print(f"OpenAI auto-tag error: {e}")
-            return self._fallback_auto_tag(content, mood)
+
+        return await self._cached(
+            "auto_tag_dream",
+            {"content": content, "mood": mood},
+            call,
+            lambda: self._fallback_auto_tag(content, mood),
+            "OpenAI auto-tag error",
+        )
 
     def _fallback_auto_tag(self, content: str, mood: int) -> dict:
         content_lower = content.lower()
@@ -252,8 +368,7 @@ Return a JSON object with exactly these fields:
 Return ONLY valid JSON, no other text."""
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._chat(
                 messages=[
                     {"role": "system", "content": "You are a dream pattern analyst. You identify recurring themes, emotional trends, and temporal patterns across a series of dreams. Always respond with valid JSON only."},
                     {"role": "user", "content": prompt}
@@ -297,9 +412,8 @@ Return a JSON object with exactly this field:
 
 Return ONLY valid JSON, no other text."""
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+        async def call() -> dict:
+            response = await self._chat(
                 messages=[
                     {"role": "system", "content": "You are a creative ideation coach who helps people transform dream imagery and emotions into actionable real-life ideas. Always respond with valid JSON only."},
                     {"role": "user", "content": prompt}
@@ -318,9 +432,14 @@ Return ONLY valid JSON, no other text."""
                 }
                 for idea in ideas if idea.get("content")
             ]}
-        except Exception as e:
-            print(f"OpenAI dream-to-ideas error: {e}")
-            return fallback
+
+        return await self._cached(
+            "dream_to_ideas",
+            {"content": dream_content, "emotions": dream_emotions or []},
+            call,
+            lambda: fallback,
+            "OpenAI dream-to-ideas error",
+        )
 
     async def explore_dream(self, dream_content: str, question: str) -> dict:
         fallback = {
@@ -348,8 +467,7 @@ Return a JSON object with exactly these fields:
 Return ONLY valid JSON, no other text."""
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._chat(
                 messages=[
                     {"role": "system", "content": "You are a compassionate dream exploration guide. You help people understand their dreams through Socratic dialogue, drawing on dream symbolism and psychology. Always respond with valid JSON only."},
                     {"role": "user", "content": prompt}
@@ -393,8 +511,7 @@ Return a JSON object with exactly these fields:
 Return ONLY valid JSON, no other text."""
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = await self._chat(
                 messages=[
                     {"role": "system", "content": "You are a dream-goal alignment analyst who identifies connections between a person's subconscious dream patterns and their conscious goals. Always respond with valid JSON only."},
                     {"role": "user", "content": prompt}
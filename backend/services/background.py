@@ -0,0 +1,24 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(
+    session_factory: async_sessionmaker,
+    job: Callable[[AsyncSession], Awaitable[object]],
+    interval_seconds: float,
+) -> None:
+    """Run ``job`` with a fresh session now and then every ``interval_seconds`` until cancelled."""
+    while True:
+        try:
+            async with session_factory() as db:
+                await job(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background job %s failed", getattr(job, "__name__", job))
+        await asyncio.sleep(interval_seconds)
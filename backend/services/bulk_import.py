@@ -0,0 +1,110 @@
+"""Parsing shared by the bulk import endpoints.
+
+Imports accept a JSON array (or an object wrapping one), NDJSON, or CSV with
+a header row. Records come back numbered from 1 in input order, so that
+per-row errors can point at the offending line. A record that cannot be
+parsed on its own (a bad NDJSON line) is reported for that row. The rest
+of the import carries on.
+"""
+import csv
+import io
+import json
+from typing import Iterator, Optional, Union
+
+from pydantic import ValidationError
+
+IMPORT_FORMATS = ("json", "ndjson", "csv")
+
+_CONTENT_TYPES = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/ndjson": "ndjson",
+    "text/csv": "csv",
+}
+
+
+class ImportFormatError(ValueError):
+    """The payload as a whole cannot be read in the requested format."""
+
+
+def detect_format(content_type: Optional[str], requested: Optional[str]) -> str:
+    """Explicit ``format`` query value, else the request's Content-Type, else JSON."""
+    if requested:
+        if requested not in IMPORT_FORMATS:
+            raise ImportFormatError(f"Invalid format. Must be one of: {', '.join(IMPORT_FORMATS)}")
+        return requested
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    return _CONTENT_TYPES.get(media_type, "json")
+
+
+def _csv_value(value: str):
+    value = value.strip()
+    if not value:
+        return None
+    if value[0] in "[{":
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_records(body: bytes, fmt: str, wrapper_key: str) -> Iterator[tuple[int, Union[dict, str]]]:
+    """Yield ``(row, record)`` pairs, or ``(row, error message)`` for rows that do not parse.
+
+    JSON may be a bare array or ``{wrapper_key: [...]}``. Empty CSV cells
+    are omitted so that schema defaults apply.
+    """
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError("Payload must be UTF-8") from exc
+
+    if fmt == "json":
+        try:
+            payload = json.loads(text) if text.strip() else []
+        except ValueError as exc:
+            raise ImportFormatError(f"Invalid JSON: {exc}") from exc
+        if isinstance(payload, dict):
+            payload = payload.get(wrapper_key)
+        if not isinstance(payload, list):
+            raise ImportFormatError(f"Expected a JSON array or an object with a '{wrapper_key}' array")
+        for row, record in enumerate(payload, start=1):
+            yield row, record if isinstance(record, dict) else "Expected a JSON object"
+
+    elif fmt == "ndjson":
+        row = 0
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield row, f"Invalid JSON: {exc}"
+                continue
+            yield row, record if isinstance(record, dict) else "Expected a JSON object"
+
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        for row, record in enumerate(reader, start=1):
+            if None in record:
+                yield row, "Row has more values than the header"
+                continue
+            values = {k.strip(): _csv_value(v or "") for k, v in record.items() if k}
+            yield row, {k: v for k, v in values.items() if v is not None}
+
+
+def validation_message(exc: ValidationError) -> str:
+    """One line per failing field, e.g. ``mood: Input should be less than or equal to 5``."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()
+    )
+
+
+def split_list(value) -> list:
+    """A list field given as a CSV cell: a JSON array, or ``;``-separated values."""
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(";") if part.strip()]
+    return value
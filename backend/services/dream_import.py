@@ -0,0 +1,84 @@
+"""Bulk dream import for users moving over from other journaling apps.
+
+Every record is validated with ``DreamCreate``. Referenced goals are
+checked with one query for the whole import. Valid dreams are then written
+in chunks of ``dream_import_chunk_size``, each chunk in one transaction
+with one bulk INSERT. Bulk inserts skip the ORM mapper hooks, so each chunk
+also writes the dreams' ``dream_labels`` rows and research outbox entries
+itself. The outbox worker then extracts research events for the whole
+import in batches. Invalid rows are reported by row number and do not stop
+the others.
+"""
+from datetime import datetime, timezone
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models.dream import Dream
+from models.dream_label import DreamLabel, LABEL_FIELDS, label_rows
+from models.goal import Goal
+from models.research_outbox import ResearchOutbox
+from schemas.dream import DreamCreate
+from services.bulk_import import ImportFormatError, parse_records, split_list, validation_message
+
+settings = get_settings()
+
+
+def _validate(record: dict) -> DreamCreate:
+    for field in LABEL_FIELDS:
+        if field in record:
+            record[field] = split_list(record[field])
+    return DreamCreate.model_validate(record)
+
+
+async def import_dreams(db: AsyncSession, user_id: int, body: bytes, fmt: str) -> dict:
+    """Import the dreams in ``body``; returns counts and per-row errors."""
+    errors: list[dict] = []
+    valid: list[tuple[int, DreamCreate]] = []
+    for row, record in parse_records(body, fmt, wrapper_key="dreams"):
+        if row > settings.dream_import_max_rows:
+            raise ImportFormatError(f"At most {settings.dream_import_max_rows} dreams per import")
+        if isinstance(record, str):
+            errors.append({"row": row, "message": record})
+            continue
+        try:
+            valid.append((row, _validate(record)))
+        except ValidationError as exc:
+            errors.append({"row": row, "message": validation_message(exc)})
+
+    goal_ids = {dream.goal_id for _, dream in valid if dream.goal_id is not None}
+    owned = set()
+    if goal_ids:
+        owned = set((await db.scalars(
+            select(Goal.id).filter(Goal.user_id == user_id, Goal.id.in_(goal_ids))
+        )).all())
+    rows = []
+    for row, dream in valid:
+        if dream.goal_id is not None and dream.goal_id not in owned:
+            errors.append({"row": row, "message": "goal_id: Goal not found or does not belong to you"})
+        else:
+            rows.append(dream)
+
+    now = datetime.now(timezone.utc)
+    size = settings.dream_import_chunk_size
+    for start in range(0, len(rows), size):
+        chunk = [
+            {**dream.model_dump(), "user_id": user_id, "dream_date": dream.dream_date or now}
+            for dream in rows[start:start + size]
+        ]
+        ids = (await db.scalars(insert(Dream).returning(Dream.id, sort_by_parameter_order=True), chunk)).all()
+
+        labels = [
+            label
+            for dream_id, values in zip(ids, chunk)
+            for label in label_rows(dream_id, user_id, values)
+        ]
+        if labels:
+            await db.execute(insert(DreamLabel), labels)
+        await db.execute(insert(ResearchOutbox), [{"dream_id": dream_id, "user_id": user_id} for dream_id in ids])
+        await db.commit()
+
+    errors.sort(key=lambda e: e["row"])
+    return {"imported": len(rows), "failed": len(errors), "errors": errors}
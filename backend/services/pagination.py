@@ -0,0 +1,114 @@
+"""Keyset (cursor) pagination for the list endpoints.
+
+Offset paging makes the database walk past every skipped row, and a row
+inserted while a client scrolls shifts the whole window (duplicates or gaps).
+A cursor instead records the sort value and id of the last row returned;
+the next page seeks directly past that position through the same index that
+serves the ORDER BY.
+
+Cursors are opaque to clients: base64url-encoded JSON carrying the sort
+key name, direction, last sort value and last id. A cursor is only valid for
+the ordering it was issued for.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+from fastapi import Response
+from sqlalchemy import DateTime, String, and_, or_, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed or was issued for a different ordering."""
+
+
+def encode_cursor(sort_by: str, sort_order: str, value: Any, last_id: int) -> str:
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    payload = json.dumps({"s": sort_by, "o": sort_order, "v": value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = payload["v"], payload["id"]
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+        if not isinstance(last_id, int):
+            raise ValueError("cursor id must be an integer")
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    if payload.get("s") != sort_by or payload.get("o") != sort_order:
+        raise InvalidCursor("Cursor was issued for a different sort order")
+    return value, last_id
+
+
+def comparable_key(db: AsyncSession, sort_col):
+    # SQLite stores datetimes as text, and rows written by func.now() lack the
+    # microseconds SQLAlchemy adds when binding a datetime. Comparing against
+    # the raw stored text keeps the seek exact for both.
+    if db.bind.dialect.name == "sqlite" and isinstance(sort_col.type, DateTime):
+        return type_coerce(sort_col, String)
+    return sort_col
+
+
+def _seek(key, id_col, descending: bool, value: Any, last_id: int):
+    """Rows strictly after (value, last_id) in ``key, id`` order with NULL keys last (desc) or first (asc)."""
+    if descending:
+        if value is None:
+            return and_(key.is_(None), id_col < last_id)
+        return or_(key < value, and_(key == value, id_col < last_id), key.is_(None))
+    if value is None:
+        return or_(key.is_not(None), and_(key.is_(None), id_col > last_id))
+    return or_(key > value, and_(key == value, id_col > last_id))
+
+
+async def keyset_page(
+    db: AsyncSession,
+    query: Select,
+    *,
+    id_col,
+    sort_col,
+    sort_by: str,
+    sort_order: Optional[str],
+    cursor: Optional[str],
+    skip: int,
+    limit: int,
+    response: Response,
+) -> list:
+    """Run ``query`` ordered by ``sort_col`` then id and return one page.
+
+    ``sort_order`` defaults to descending. When a full page is returned the
+    cursor for the following page is set on the ``X-Next-Cursor`` header.
+    ``skip`` still applies, counted from the cursor position when one is given.
+    """
+    sort_order = sort_order or "desc"
+    descending = sort_order == "desc"
+    key = comparable_key(db, sort_col)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by, sort_order)
+        query = query.filter(_seek(key, id_col, descending, value, last_id))
+
+    if descending:
+        query = query.order_by(sort_col.desc().nulls_last(), id_col.desc())
+    else:
+        query = query.order_by(sort_col.asc().nulls_first(), id_col.asc())
+
+    rows = (await db.execute(
+        query.add_columns(key.label("_sort_key")).offset(skip).limit(limit)
+    )).all()
+
+    items = [row[0] for row in rows]
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_by, sort_order, last._sort_key, last[0].id)
+    return items
@@ -0,0 +1,62 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+from config import get_settings
+
+settings = get_settings()
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing pool's queue is full and the call is rejected."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool instead of the event loop.
+
+    bcrypt releases the GIL, so threads give real parallelism. Admission is
+    capped at ``workers + queue_limit`` in-flight calls; anything beyond that
+    is rejected immediately rather than queued behind a login burst.
+    """
+
+    def __init__(self, workers: int, queue_limit: int, rounds: int = 12):
+        self.context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds, deprecated="auto")
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.capacity = workers + queue_limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise HashingPoolSaturated()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "capacity": self.capacity, "rejected": self.rejected}
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    queue_limit=settings.password_hash_queue_limit,
+)
@@ -0,0 +1,67 @@
+import copy
+import time
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from config import get_settings
+from models.user import User
+from services.cache import TTLCache
+
+settings = get_settings()
+
+
+class PrincipalCache:
+    """Caches verified JWTs and the user rows they resolve to.
+
+    Tokens map to the user id they were issued for, so a hit skips the
+    signature check; user ids map to a column snapshot, so a hit skips the
+    user lookup. Entries are per-process, which is why the TTL stays short:
+    another worker's profile change becomes visible here within one TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.tokens = TTLCache(max_entries, ttl_seconds)
+        self.users = TTLCache(max_entries, ttl_seconds)
+        self._columns = [attr.key for attr in inspect(User).column_attrs]
+
+    def get_user_id(self, token: str) -> Optional[int]:
+        entry = self.tokens.get(token)
+        return entry[0] if entry else None
+
+    def set_token(self, token: str, user_id: int, expires_at: Optional[float]) -> None:
+        ttl = None if expires_at is None else expires_at - time.time()
+        self.tokens.set(token, (user_id, expires_at), ttl)
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        snapshot = self.users.get(user_id)
+        if snapshot is None:
+            return None
+        # Rebuild a detached instance per request so handlers never share
+        # mutable state; the caller attaches it to its session without a query.
+        user = User(**copy.deepcopy(snapshot))
+        make_transient_to_detached(user)
+        return user
+
+    def set_user(self, user: User) -> None:
+        self.users.set(user.id, {key: getattr(user, key) for key in self._columns})
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.users.pop(user_id)
+
+    def invalidate_tokens(self, user_id: int) -> None:
+        self.tokens.discard_where(lambda _token, entry: entry[0] == user_id)
+
+    def clear(self) -> None:
+        self.tokens.clear()
+        self.users.clear()
+
+    def stats(self) -> dict:
+        return {"tokens": self.tokens.stats(), "users": self.users.stats()}
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.auth_cache_max_entries,
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+)
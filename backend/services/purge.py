@@ -0,0 +1,105 @@
+"""Background purges for consent revocation and account deletion.
+
+Both used to delete everything inside the request, loading every row into
+the session first, and on SQLite held the single write lock for the whole
+time. The request now only flags the work (``ResearchConsent.purge_status``
+or ``User.deleted_at``). This job deletes the data in chunks of
+``purge_chunk_size`` rows, one transaction per chunk, so other writers can
+interleave between chunks.
+"""
+import asyncio
+import logging
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models.account_export import AccountExport
+from models.ai_job import AIJob
+from models.dream import Dream
+from models.dream_label import DreamLabel
+from models.dream_research_event import DreamResearchEvent
+from models.goal import Goal
+from models.idea import Idea
+from models.research_backfill import ResearchBackfill
+from models.research_consent import ResearchConsent
+from models.research_outbox import ResearchOutbox
+from models.saved_filter import SavedFilter
+from models.sleep_log import SleepLog
+from models.user import User
+from services.account_export import delete_export_artifacts
+from services.research_rollup import mark_event_days_dirty
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+PURGE_PENDING = "pending"
+PURGE_COMPLETE = "complete"
+
+# Deletion order for an account's rows: referencing tables before referenced ones.
+ACCOUNT_TABLES = (
+    SleepLog, DreamLabel, Dream, Goal, Idea, SavedFilter, ResearchOutbox, ResearchBackfill, AccountExport, AIJob,
+)
+
+
+async def _delete_in_chunks(db: AsyncSession, model, *criteria, research_events: bool = False) -> int:
+    """Delete rows of ``model`` matching ``criteria``, committing after each chunk."""
+    deleted = 0
+    while True:
+        ids = (await db.scalars(select(model.id).filter(*criteria).limit(settings.purge_chunk_size))).all()
+        if not ids:
+            return deleted
+        if research_events:
+            await mark_event_days_dirty(db, model.id.in_(ids))
+        await db.execute(delete(model).filter(model.id.in_(ids)))
+        await db.commit()
+        deleted += len(ids)
+        await asyncio.sleep(0)
+
+
+async def _purge_research_events(db: AsyncSession, consent_id: int) -> int:
+    return await _delete_in_chunks(
+        db, DreamResearchEvent, DreamResearchEvent.consent_id == consent_id, research_events=True
+    )
+
+
+async def purge_revoked_consents(db: AsyncSession) -> int:
+    """Delete the research events and backfill progress of every revocation still pending.
+
+    Returns consents completed.
+    """
+    consents = (await db.scalars(
+        select(ResearchConsent).filter(ResearchConsent.purge_status == PURGE_PENDING)
+    )).all()
+    for consent in consents:
+        deleted = await _purge_research_events(db, consent.id)
+        await _delete_in_chunks(db, ResearchBackfill, ResearchBackfill.user_id == consent.user_id)
+        consent.purge_status = PURGE_COMPLETE
+        await db.commit()
+        logger.info("Research purge complete for consent %s: %d events deleted", consent.id, deleted)
+    return len(consents)
+
+
+async def purge_deleted_accounts(db: AsyncSession) -> int:
+    """Delete all data of accounts marked deleted, then the accounts. Returns accounts purged."""
+    user_ids = (await db.scalars(select(User.id).filter(User.deleted_at.is_not(None)))).all()
+    for user_id in user_ids:
+        consent = await db.scalar(select(ResearchConsent).filter(ResearchConsent.user_id == user_id))
+        if consent is not None:
+            await _purge_research_events(db, consent.id)
+            await db.execute(delete(ResearchConsent).filter(ResearchConsent.id == consent.id))
+            await db.commit()
+        await delete_export_artifacts(db, user_id)
+        await db.commit()
+        for model in ACCOUNT_TABLES:
+            await _delete_in_chunks(db, model, model.user_id == user_id)
+        await db.execute(delete(User).filter(User.id == user_id))
+        await db.commit()
+        logger.info("Account %s purged", user_id)
+    return len(user_ids)
+
+
+async def run_purges(db: AsyncSession) -> None:
+    await purge_revoked_consents(db)
+    await purge_deleted_accounts(db)
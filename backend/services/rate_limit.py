@@ -0,0 +1,45 @@
+import time
+from collections import deque
+from typing import Optional
+
+from services.cache import TTLCache
+
+
+class AttemptThrottle:
+    """Sliding-window attempt counter keyed by an arbitrary string (IP, email).
+
+    Keys live in an LRU-bounded cache, so a flood of distinct keys cannot
+    grow memory without bound.
+    """
+
+    def __init__(self, max_attempts: int, window_seconds: float, max_keys: int = 50000):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self._attempts = TTLCache(max_keys, window_seconds)
+
+    def _window(self, key: str) -> deque:
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            attempts = deque()
+        cutoff = time.monotonic() - self.window_seconds
+        while attempts and attempts[0] <= cutoff:
+            attempts.popleft()
+        return attempts
+
+    def retry_after(self, key: str) -> Optional[int]:
+        """Seconds until ``key`` may try again, or None if it is under the limit."""
+        attempts = self._window(key)
+        if len(attempts) < self.max_attempts:
+            return None
+        return max(1, int(attempts[0] + self.window_seconds - time.monotonic()) + 1)
+
+    def record(self, key: str) -> None:
+        attempts = self._window(key)
+        attempts.append(time.monotonic())
+        self._attempts.set(key, attempts)
+
+    def reset(self, key: str) -> None:
+        self._attempts.pop(key)
+
+    def clear(self) -> None:
+        self._attempts.clear()
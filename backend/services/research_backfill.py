@@ -0,0 +1,125 @@
+"""Resumable extraction of research events from existing dreams.
+
+Granting consent only routes new and edited dreams through the outbox; this
+job covers the dreams written before. It also re-extracts everyone's events
+when the extraction rules change (``start_backfill(db)`` with no user, or
+``python -m services.research_backfill --all``).
+
+Dreams are read in id order, one batch of ``research_backfill_batch_size``
+per transaction. Only the columns extraction needs are loaded. Events are
+written with one bulk insert per batch, replacing earlier events of the
+same dreams. The batch and the backfill's progress commit together, so an
+interrupted run resumes after the last committed batch. A pause between
+batches leaves room for interactive writes.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+from config import get_settings
+from models.dream import Dream
+from models.research_backfill import ResearchBackfill
+from models.research_consent import ResearchConsent
+from services.research_extraction import EXTRACTION_COLUMNS, extract_events, replace_events
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def _scope(backfill: ResearchBackfill):
+    if backfill.user_id is not None:
+        return [Dream.user_id == backfill.user_id]
+    consenting = select(ResearchConsent.user_id).filter(ResearchConsent.status == "active")
+    return [Dream.user_id.in_(consenting)]
+
+
+def start_backfill(db: AsyncSession, user_id: Optional[int] = None) -> ResearchBackfill:
+    """Queue a backfill for one user, or for every consenting user. Does not commit."""
+    backfill = ResearchBackfill(user_id=user_id, status="pending", last_dream_id=0, processed=0, events_written=0)
+    db.add(backfill)
+    return backfill
+
+
+async def cancel_backfills(db: AsyncSession, user_id: int) -> None:
+    """Stop a user's unfinished backfills, e.g. on revocation. Does not commit."""
+    await db.execute(
+        update(ResearchBackfill)
+        .filter(ResearchBackfill.user_id == user_id, ResearchBackfill.status.in_(ACTIVE_STATUSES))
+        .values(status="cancelled")
+    )
+
+
+async def run_backfill_batch(db: AsyncSession, backfill: ResearchBackfill) -> bool:
+    """Process the next batch and commit it with the progress. Returns False once finished."""
+    await db.refresh(backfill)
+    if backfill.status not in ACTIVE_STATUSES:
+        return False
+
+    if backfill.status == "pending":
+        backfill.status = "running"
+        backfill.total = await db.scalar(select(func.count(Dream.id)).filter(*_scope(backfill)))
+
+    dreams = (await db.scalars(
+        select(Dream)
+        .options(load_only(*EXTRACTION_COLUMNS))
+        .filter(*_scope(backfill), Dream.id > backfill.last_dream_id)
+        .order_by(Dream.id)
+        .limit(settings.research_backfill_batch_size)
+    )).all()
+
+    if not dreams:
+        backfill.status = "complete"
+        backfill.completed_at = datetime.now(timezone.utc)
+        await db.commit()
+        logger.info("Research backfill %s complete: %d events", backfill.id, backfill.events_written)
+        return False
+
+    written = await replace_events(db, await extract_events(db, dreams))
+    backfill.last_dream_id = dreams[-1].id
+    backfill.processed += len(dreams)
+    backfill.events_written += written
+    await db.commit()
+    return True
+
+
+async def run_backfills(db: AsyncSession) -> int:
+    """Drive every unfinished backfill to completion, oldest first. Returns how many ran."""
+    backfills = (await db.scalars(
+        select(ResearchBackfill)
+        .filter(ResearchBackfill.status.in_(ACTIVE_STATUSES))
+        .order_by(ResearchBackfill.id)
+    )).all()
+    for backfill in backfills:
+        while await run_backfill_batch(db, backfill):
+            await asyncio.sleep(settings.research_backfill_batch_delay_seconds)
+    return len(backfills)
+
+
+async def _main() -> None:
+    from database import AsyncSessionLocal
+
+    parser = argparse.ArgumentParser(description="Re-extract research events from existing dreams.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--all", action="store_true", help="every consenting user")
+    target.add_argument("--user-id", type=int, help="a single user")
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        backfill = start_backfill(db, None if args.all else args.user_id)
+        await db.commit()
+        await run_backfills(db)
+        print(f"backfill {backfill.id}: {backfill.processed} dreams scanned, {backfill.events_written} events written")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,161 @@
+"""Multi-dimensional research cube with consistent k-anonymity suppression.
+
+One grouped query returns the finest cells (every requested dimension
+grouped). All coarser grouping sets, down to the grand total, are summed
+from those cells in memory, so a cube over N dimensions costs one scan
+instead of 2^N.
+
+Suppressing each cell under ``K_ANONYMITY_THRESHOLD`` on its own is not
+enough once subtotals are published too: a suppressed cell could be
+recovered as its parent total minus its published siblings. After primary
+suppression, every parent/children group along every dimension is checked.
+If the suppressed children of a published parent add up to fewer than K
+events, the smallest published sibling is suppressed as well. This repeats
+until no group changes, so no published combination of cells pins down a
+group of fewer than K events.
+"""
+from itertools import combinations
+from typing import Iterable, Mapping, Sequence
+
+from sqlalchemy import false, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.dream_research_event import DreamResearchEvent
+from services.research_rollup import GROUP_FIELDS, K_ANONYMITY_THRESHOLD, active_events, group_key
+from services.research_store import research_store
+
+CUBE_MAX_DIMENSIONS = 3
+
+# Marker for a dimension that is rolled up (summed over) in a cell.
+ALL = "*"
+
+_STATS = ("count", "mood_sum", "mood_n", "vividness_sum", "vividness_n")
+
+
+def _matches(dimension: str, values: Sequence[str]):
+    """SQL condition equivalent to the store's filter on encoded group keys."""
+    col = GROUP_FIELDS[dimension]
+    conditions = []
+    for value in values:
+        if value == "unknown":
+            conditions.append(col.is_(None))
+        elif dimension == "is_lucid":
+            conditions.append(col == (value == "True"))
+        elif dimension in ("day_of_week", "month"):
+            if value.lstrip("-").isdigit():
+                conditions.append(col == int(value))
+        else:
+            conditions.append(col == value)
+    return or_(*conditions) if conditions else false()
+
+
+async def _finest_cells(
+    db: AsyncSession, dimensions: Sequence[str], filters: Mapping[str, Sequence[str]]
+) -> dict[tuple, list]:
+    E = DreamResearchEvent
+    cols = [GROUP_FIELDS[d] for d in dimensions]
+    rows = await db.execute(
+        select(
+            *cols,
+            func.count(),
+            func.sum(E.mood_score),
+            func.count(E.mood_score),
+            func.sum(E.vividness),
+            func.count(E.vividness),
+        )
+        .filter(active_events(), *(_matches(d, values) for d, values in filters.items()))
+        .group_by(*cols)
+    )
+    cells: dict[tuple, list] = {}
+    n = len(dimensions)
+    for row in rows:
+        key = tuple(group_key(v) for v in row[:n])
+        stats = cells.setdefault(key, [0] * len(_STATS))
+        for i, value in enumerate(row[n:]):
+            stats[i] += value or 0
+    return cells
+
+
+def _roll_up(finest: dict[tuple, list], n: int) -> dict[tuple, list]:
+    """Every grouping set, keyed by tuples with ``ALL`` for rolled-up dimensions."""
+    cube: dict[tuple, list] = {}
+    for key, stats in finest.items():
+        for size in range(n + 1):
+            for kept in combinations(range(n), size):
+                cell = tuple(key[i] if i in kept else ALL for i in range(n))
+                target = cube.setdefault(cell, [0] * len(_STATS))
+                for i, value in enumerate(stats):
+                    target[i] += value
+    return cube
+
+
+def _sibling_groups(cells: Iterable[tuple], n: int) -> dict[tuple, list[tuple]]:
+    """(parent, dimension) -> cells that differ from parent only in that dimension."""
+    groups: dict[tuple, list[tuple]] = {}
+    for cell in cells:
+        for d in range(n):
+            if cell[d] != ALL:
+                parent = cell[:d] + (ALL,) + cell[d + 1:]
+                groups.setdefault((parent, d), []).append(cell)
+    return groups
+
+
+def suppress(cube: dict[tuple, list], n: int, k: int = K_ANONYMITY_THRESHOLD) -> set[tuple]:
+    """Cells to withhold: primary (count < k) plus complementary suppression."""
+    count = {cell: stats[0] for cell, stats in cube.items()}
+    suppressed = {cell for cell, c in count.items() if c < k}
+    groups = _sibling_groups(cube, n)
+
+    changed = True
+    while changed:
+        changed = False
+        for (parent, _), children in groups.items():
+            if parent in suppressed:
+                continue
+            hidden = sum(count[c] for c in children if c in suppressed)
+            if 0 < hidden < k:
+                published = [c for c in children if c not in suppressed]
+                if published:
+                    suppressed.add(min(published, key=lambda c: (count[c], c)))
+                    changed = True
+    return suppressed
+
+
+def _cell_summary(dimensions: Sequence[str], cell: tuple, stats: list) -> dict:
+    values = dict(zip(_STATS, stats))
+    return {
+        "dimensions": dict(zip(dimensions, cell)),
+        "count": values["count"],
+        "avg_mood": round(values["mood_sum"] / values["mood_n"], 2) if values["mood_n"] else None,
+        "avg_vividness": round(values["vividness_sum"] / values["vividness_n"], 2) if values["vividness_n"] else None,
+    }
+
+
+async def build_cube(
+    db: AsyncSession, dimensions: Sequence[str], filters: Mapping[str, Sequence[str]] = {}
+) -> dict:
+    """Publishable cells of every grouping set over ``dimensions``, restricted to ``filters``.
+
+    Served from the in-memory research store once it is loaded, otherwise
+    from one grouped SQL query.
+    """
+    n = len(dimensions)
+    if research_store.ready:
+        finest = research_store.cells(dimensions, filters)
+    else:
+        finest = await _finest_cells(db, dimensions, filters)
+    cube = _roll_up(finest, n)
+    grand_total = cube.get((ALL,) * n, [0])[0]
+    suppressed = suppress(cube, n)
+
+    published = sorted(
+        (cell for cell in cube if cell not in suppressed),
+        key=lambda cell: (sum(v != ALL for v in cell), cell),
+    )
+    return {
+        "dimensions": list(dimensions),
+        "filters": {d: list(values) for d, values in filters.items()},
+        "cells": [_cell_summary(dimensions, cell, cube[cell]) for cell in published],
+        "total_events": grand_total,
+        "suppressed_cells": len(suppressed),
+    }
@@ -0,0 +1,190 @@
+"""Streaming export of k-anonymized research events for research partners.
+
+Events are read through a server-side cursor in batches of
+``research_export_batch_size`` and written out one batch at a time, as CSV,
+an Arrow IPC stream, or Parquet (one row group per batch). Memory use
+depends on the batch size, not on the size of the table.
+
+Only the coded research fields leave the database, plus ``event_key``.
+``id``, ``consent_id``, ``dream_ref`` and ``created_at`` are never exported. ``age_bracket`` and
+``region`` are quasi-identifiers. When an (age_bracket, region) combination
+has fewer than ``K_ANONYMITY_THRESHOLD`` distinct contributors, both fields
+are blanked on those rows. Events of revoked consents still awaiting their
+purge are excluded, and so are events of consents given under terms that
+did not disclose event-level export (see ``EXPORT_CONSENT_VERSIONS``).
+
+Incremental exports use ``created_at`` watermarks. Each export covers
+(since, until], where ``until`` trails the current time by
+``WATERMARK_LAG`` so that late commits are not skipped. The client passes
+the returned watermark as ``since`` next time. Editing a dream re-extracts
+it into a new event with a later ``created_at``, so the edit shows up in a
+later export. ``event_key`` is the same for every version of a dream, and
+partners keep the latest row per key. It is a keyed hash under its own
+label, so it cannot be matched to ``dream_ref`` or to an event id.
+"""
+import csv
+import hashlib
+import hmac
+import io
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models.dream_research_event import DreamResearchEvent
+from models.research_consent import ResearchConsent
+from services.research_rollup import K_ANONYMITY_THRESHOLD, WATERMARK_LAG
+
+settings = get_settings()
+
+E = DreamResearchEvent
+
+EXPORT_SCHEMA = pa.schema([
+    ("event_key", pa.string()),
+    ("dream_type", pa.string()),
+    ("emotion", pa.string()),
+    ("theme", pa.string()),
+    ("is_lucid", pa.bool_()),
+    ("is_recurring", pa.bool_()),
+    ("mood_score", pa.int8()),
+    ("sleep_quality", pa.int8()),
+    ("vividness", pa.int8()),
+    ("day_of_week", pa.int8()),
+    ("month", pa.int8()),
+    ("age_bracket", pa.string()),
+    ("region", pa.string()),
+])
+EXPORT_COLUMNS = tuple(EXPORT_SCHEMA.names)
+EVENT_COLUMNS = EXPORT_COLUMNS[1:]  # read as-is from the event table
+QUASI_IDENTIFIERS = ("age_bracket", "region")
+
+# Consent text versions that disclose event-level partner export and that
+# exported rows cannot be recalled on revocation.
+EXPORT_CONSENT_VERSIONS = ("1.1",)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def event_key(dream_ref: Optional[str], event_id: str) -> str:
+    """Opaque key shared by every version of an event's source dream."""
+    source = f"dream:{dream_ref}" if dream_ref else f"event:{event_id}"
+    return hmac.new(settings.secret_key.encode(), f"export:{source}".encode(), hashlib.sha256).hexdigest()
+
+
+def export_watermark(now: Optional[datetime] = None) -> datetime:
+    """Upper bound for an export starting now, to whole seconds."""
+    now = now or datetime.now(timezone.utc)
+    return (now - WATERMARK_LAG).replace(microsecond=0)
+
+
+def _window(since: Optional[datetime], until: datetime) -> list:
+    criteria = [
+        E.consent_id.in_(select(ResearchConsent.id).filter(
+            ResearchConsent.status == "active",
+            ResearchConsent.consent_version.in_(EXPORT_CONSENT_VERSIONS),
+        )),
+        E.created_at <= until,
+    ]
+    if since is not None:
+        criteria.append(E.created_at > since)
+    return criteria
+
+
+async def _publishable_classes(db: AsyncSession, until: datetime) -> set[tuple]:
+    """Quasi-identifier combinations shared by at least K contributors."""
+    cols = [getattr(E, name) for name in QUASI_IDENTIFIERS]
+    rows = await db.execute(
+        select(*cols)
+        .filter(*_window(None, until))
+        .group_by(*cols)
+        .having(func.count(func.distinct(E.consent_id)) >= K_ANONYMITY_THRESHOLD)
+    )
+    return {tuple(row) for row in rows}
+
+
+async def export_batches(
+    db: AsyncSession, since: Optional[datetime], until: datetime
+) -> AsyncIterator[dict[str, list]]:
+    """Column-oriented batches of anonymized events created in (since, until]."""
+    publishable = await _publishable_classes(db, until)
+    qi = [EXPORT_COLUMNS.index(name) for name in QUASI_IDENTIFIERS]
+
+    query = (
+        select(E.dream_ref, E.id, *(getattr(E, name) for name in EVENT_COLUMNS))
+        .filter(*_window(since, until))
+        .order_by(E.created_at, E.id)
+        .execution_options(yield_per=settings.research_export_batch_size)
+    )
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        rows = [[event_key(ref, event_id), *values] for ref, event_id, *values in partition]
+        for row in rows:
+            if tuple(row[i] for i in qi) not in publishable:
+                for i in qi:
+                    row[i] = None
+        yield dict(zip(EXPORT_COLUMNS, map(list, zip(*rows))))
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def _csv_stream(batches: AsyncIterator[dict[str, list]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(zip(*(batch[name] for name in EXPORT_COLUMNS)))
+        yield buffer.getvalue().encode()
+
+
+async def _columnar_stream(batches: AsyncIterator[dict[str, list]], fmt: str) -> AsyncIterator[bytes]:
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, EXPORT_SCHEMA)
+    else:
+        writer = pa.ipc.new_stream(sink, EXPORT_SCHEMA)
+    try:
+        async for batch in batches:
+            writer.write_batch(pa.RecordBatch.from_pydict(batch, schema=EXPORT_SCHEMA))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def encode_export(batches: AsyncIterator[dict[str, list]], fmt: str) -> AsyncIterator[bytes]:
+    """Serialize ``batches`` incrementally in one of ``EXPORT_FORMATS``."""
+    if fmt == "csv":
+        return _csv_stream(batches)
+    return _columnar_stream(batches, fmt)
@@ -1,17 +1,40 @@
+import hashlib
+import hmac
 import logging
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import Optional, Sequence
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+from config import get_settings
 from models.dream import Dream
 from models.user import User
 from models.research_consent import ResearchConsent
 from models.dream_research_event import DreamResearchEvent
+from models.research_outbox import ResearchOutbox
+from services.research_rollup import mark_event_days_dirty
 
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
+OUTBOX_BATCH_SIZE = 500
+
+# The only dream columns extraction reads; content and other text stay unloaded.
+EXTRACTION_COLUMNS = (
+    Dream.id, Dream.user_id, Dream.emotions, Dream.tags, Dream.lucidity_level,
+    Dream.dream_date, Dream.mood, Dream.dream_type, Dream.vividness, Dream.is_recurring,
+)
+
+
+def dream_ref(dream_id: int) -> str:
+    """Keyed hash identifying an event's source dream without exposing its id."""
+    return hmac.new(settings.secret_key.encode(), f"dream:{dream_id}".encode(), hashlib.sha256).hexdigest()
 
-def extract_research_event(
-    dream: Dream, user: User, consent: ResearchConsent, db: Session
-) -> Optional[DreamResearchEvent]:
+
+def build_research_event(dream: Dream, user: User, consent: ResearchConsent) -> Optional[dict]:
+    """De-identified research event values for ``dream``, or None without active consent."""
     if consent.status != "active":
         logger.debug("Consent not active for user %s, skipping extraction", user.id)
         return None
@@ -32,23 +55,114 @@ def extract_research_event(
         day_of_week = dream.dream_date.weekday()
         month = dream.dream_date.month
 
-    event = DreamResearchEvent(
-        consent_id=consent.id,
-        emotion=emotion,
-        theme=theme,
-        is_lucid=is_lucid,
-        mood_score=dream.mood,
-        dream_type=dream.dream_type,
-        vividness=dream.vividness,
-        is_recurring=dream.is_recurring or False,
-        day_of_week=day_of_week,
-        month=month,
-        age_bracket=user.age_bracket,
-        region=user.region,
-    )
-
-    db.add(event)
-    db.commit()
-    db.refresh(event)
-    logger.info("Research event %s extracted for consent %s", event.id, consent.id)
-    return event
+    return {
+        "consent_id": consent.id,
+        "dream_ref": dream_ref(dream.id),
+        "emotion": emotion,
+        "theme": theme,
+        "is_lucid": is_lucid,
+        "mood_score": dream.mood,
+        "dream_type": dream.dream_type,
+        "vividness": dream.vividness,
+        "is_recurring": dream.is_recurring or False,
+        "day_of_week": day_of_week,
+        "month": month,
+        "age_bracket": user.age_bracket,
+        "region": user.region,
+    }
+
+
+async def extract_events(db: AsyncSession, dreams: Sequence[Dream]) -> list[dict]:
+    """Research event values for the dreams whose owners have active consent.
+
+    Loads the owners and their consents with one query each.
+    """
+    user_ids = {d.user_id for d in dreams}
+    if not user_ids:
+        return []
+    users = {u.id: u for u in (await db.scalars(select(User).filter(User.id.in_(user_ids)))).all()}
+    consents = {
+        c.user_id: c
+        for c in (await db.scalars(
+            select(ResearchConsent).filter(
+                ResearchConsent.user_id.in_(user_ids),
+                ResearchConsent.status == "active",
+            )
+        )).all()
+    }
+
+    events = []
+    for dream in dreams:
+        consent = consents.get(dream.user_id)
+        if consent is None or dream.user_id not in users:
+            continue
+        values = build_research_event(dream, users[dream.user_id], consent)
+        if values is not None:
+            events.append(values)
+    return events
+
+
+async def replace_events(db: AsyncSession, events: list[dict]) -> int:
+    """Bulk insert ``events``, replacing earlier events of the same dreams. Does not commit.
+
+    Consents were read before this transaction wrote anything, so a revocation
+    (and its purge) may have committed since. They are checked again after
+    the first write: SQLite then holds its write lock and Postgres holds a
+    share lock on the consent rows, so a revocation can no longer commit
+    between the check and the insert. Events of consents that are no longer
+    active are dropped. Returns the number of events inserted.
+    """
+    if not events:
+        return 0
+    replaced = DreamResearchEvent.dream_ref.in_([e["dream_ref"] for e in events])
+    await mark_event_days_dirty(db, replaced)
+    await db.execute(delete(DreamResearchEvent).filter(replaced))
+
+    active = set((await db.scalars(
+        select(ResearchConsent.id)
+        .filter(
+            ResearchConsent.id.in_({e["consent_id"] for e in events}),
+            ResearchConsent.status == "active",
+        )
+        .with_for_update(read=True)
+    )).all())
+    events = [e for e in events if e["consent_id"] in active]
+    if events:
+        await db.execute(insert(DreamResearchEvent), events)
+    return len(events)
+
+
+async def drain_research_outbox(db: AsyncSession, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Turn one batch of outbox rows into research events and commit.
+
+    A dream's previous event is replaced, so edits re-extract instead of
+    adding a second event. Rows for deleted dreams or users without active
+    consent are discarded. Returns the number of outbox rows consumed.
+    """
+    entries = (await db.scalars(
+        select(ResearchOutbox).order_by(ResearchOutbox.id).limit(batch_size)
+    )).all()
+    if not entries:
+        return 0
+
+    dreams = (await db.scalars(
+        select(Dream)
+        .options(load_only(*EXTRACTION_COLUMNS))
+        .filter(Dream.id.in_({e.dream_id for e in entries}))
+    )).all()
+    written = await replace_events(db, await extract_events(db, dreams))
+
+    await db.execute(delete(ResearchOutbox).filter(ResearchOutbox.id.in_([e.id for e in entries])))
+    await db.commit()
+    logger.info("Research outbox: %d entries drained, %d events written", len(entries), written)
+    return len(entries)
+
+
+async def drain_all(db: AsyncSession, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Drain the outbox until it is empty. Returns the number of rows consumed."""
+    total = 0
+    while True:
+        drained = await drain_research_outbox(db, batch_size)
+        total += drained
+        if drained < batch_size:
+            return total
@@ -0,0 +1,346 @@
+"""Incremental daily/weekly/monthly rollups of research events.
+
+The public aggregate endpoint reads ``dream_research_aggregates`` instead of
+grouping the raw event table on every request. ``refresh_rollups`` finds the
+days that changed since its last run (new events past the watermark, plus
+days recorded as dirty when events were deleted or their consent revoked),
+aggregates those days in a handful of grouped queries, and rewrites only the
+periods containing them. Events of revoked consents are left out from the
+moment of revocation, not only once the purge has deleted them.
+
+k-anonymity is applied when rollups are written, so nothing below
+``K_ANONYMITY_THRESHOLD`` is ever persisted in publishable form. A period with
+fewer events gets no row at all, and groups below the threshold are dropped.
+Published totals are also checked against what they could be subtracted
+from, the way ``research_cube`` checks subtotals:
+
+- Within a weekly or monthly period, if the dropped groups of a field add up
+  to fewer than K events, the smallest published group is dropped as well.
+- Daily rows carry totals only. A group breakdown per day could be
+  subtracted from the weekly and monthly ones.
+- Days are checked per fragment, the part of a week that falls in one month.
+  Fragment totals follow from the weekly and monthly totals, so the days
+  withheld in a fragment must add up to K events or none. Otherwise more days
+  are withheld, and if the fragment itself is too small, its week and month
+  are withheld instead.
+"""
+import calendar
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import Date, case, delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import dialect_insert
+from models.dream_research_aggregate import DreamResearchAggregate
+from models.dream_research_event import DreamResearchEvent
+from models.research_consent import ResearchConsent
+from models.research_rollup import ResearchRollupDirtyDay, ResearchRollupState
+
+logger = logging.getLogger(__name__)
+
+K_ANONYMITY_THRESHOLD = 5
+
+PERIOD_TYPES = ("daily", "weekly", "monthly")
+
+# Events committed slightly out of created_at order are still picked up.
+WATERMARK_LAG = timedelta(minutes=5)
+
+GROUP_FIELDS = {
+    "dream_type": DreamResearchEvent.dream_type,
+    "emotion": DreamResearchEvent.emotion,
+    "theme": DreamResearchEvent.theme,
+    "is_lucid": DreamResearchEvent.is_lucid,
+    "age_bracket": DreamResearchEvent.age_bracket,
+    "region": DreamResearchEvent.region,
+    "day_of_week": DreamResearchEvent.day_of_week,
+    "month": DreamResearchEvent.month,
+}
+
+
+def group_key(value) -> str:
+    return str(value) if value is not None else "unknown"
+
+
+def period_bounds(period_type: str, day: date) -> tuple[date, date]:
+    """First and last day (inclusive) of the period containing ``day``."""
+    if period_type == "daily":
+        return day, day
+    if period_type == "weekly":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period_type == "monthly":
+        last = calendar.monthrange(day.year, day.month)[1]
+        return day.replace(day=1), day.replace(day=last)
+    raise ValueError(f"Unknown period type: {period_type}")
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def _event_day():
+    return func.date(DreamResearchEvent.created_at)
+
+
+def active_events():
+    """Events of active consents. A revoked consent's events are excluded until the purge deletes them."""
+    return DreamResearchEvent.consent_id.in_(select(ResearchConsent.id).filter(ResearchConsent.status == "active"))
+
+
+def _in_days(first: date, last: date):
+    return (
+        (DreamResearchEvent.created_at >= literal(first, Date()))
+        & (DreamResearchEvent.created_at < literal(last + timedelta(days=1), Date()))
+    )
+
+
+def _empty_totals() -> dict:
+    return {"count": 0, "lucid": 0, "mood_sum": 0, "mood_n": 0, "sleep_sum": 0, "sleep_n": 0}
+
+
+def _empty_group() -> dict:
+    return {"count": 0, "mood_sum": 0, "mood_n": 0, "vividness_sum": 0, "vividness_n": 0}
+
+
+def _add(target: dict, values: dict) -> None:
+    for name, value in values.items():
+        target[name] += value or 0
+
+
+async def _daily_totals(db: AsyncSession, first: date, last: date) -> dict[date, dict]:
+    E = DreamResearchEvent
+    rows = await db.execute(
+        select(
+            _event_day().label("day"),
+            func.count(),
+            func.sum(case((E.is_lucid, 1), else_=0)),
+            func.sum(E.mood_score),
+            func.count(E.mood_score),
+            func.sum(E.sleep_quality),
+            func.count(E.sleep_quality),
+        )
+        .filter(_in_days(first, last), active_events())
+        .group_by(_event_day())
+    )
+    return {
+        _as_date(day): dict(zip(_empty_totals(), values))
+        for day, *values in rows
+    }
+
+
+async def _daily_groups(db: AsyncSession, field: str, first: date, last: date) -> list[tuple[date, str, dict]]:
+    E = DreamResearchEvent
+    col = GROUP_FIELDS[field]
+    rows = await db.execute(
+        select(
+            _event_day().label("day"),
+            col,
+            func.count(),
+            func.sum(E.mood_score),
+            func.count(E.mood_score),
+            func.sum(E.vividness),
+            func.count(E.vividness),
+        )
+        .filter(_in_days(first, last), active_events())
+        .group_by(_event_day(), col)
+    )
+    return [
+        (_as_date(day), group_key(key), dict(zip(_empty_group(), values)))
+        for day, key, *values in rows
+    ]
+
+
+def _complement(counts: dict, hidden: set) -> bool:
+    """Hide one more cell if the hidden ``counts`` of a published total sum to fewer than K.
+
+    Hides the smallest published cell and returns True, or returns False if
+    nothing needed (or was left) to hide.
+    """
+    hidden_total = sum(counts[cell] for cell in hidden)
+    published = [cell for cell in counts if cell not in hidden]
+    if not 0 < hidden_total < K_ANONYMITY_THRESHOLD or not published:
+        return False
+    hidden.add(min(published, key=lambda cell: (counts[cell], cell)))
+    return True
+
+
+def _suppress(counts: dict) -> set:
+    """Cells under the threshold, plus complementary ones until the hidden total is 0 or at least K."""
+    hidden = {cell for cell, count in counts.items() if count < K_ANONYMITY_THRESHOLD}
+    while _complement(counts, hidden):
+        pass
+    return hidden
+
+
+def _publishable_groups(groups: dict[str, dict]) -> dict:
+    hidden = _suppress({key: stats["count"] for key, stats in groups.items()})
+    kept = {key: stats for key, stats in groups.items() if key not in hidden}
+    return {"groups": kept, "suppressed": len(hidden)}
+
+
+def _suppressed_days(daily: dict[date, dict]) -> tuple[set[date], set[tuple[str, date]]]:
+    """Days whose rows are withheld, and (period_type, start) of weeks and months withheld with them."""
+    fragments = defaultdict(dict)
+    for day, values in daily.items():
+        fragment = (period_bounds("weekly", day)[0], period_bounds("monthly", day)[0])
+        fragments[fragment][day] = values["count"]
+
+    days, periods = set(), set()
+    for (week, month), counts in fragments.items():
+        hidden = _suppress(counts)
+        days |= hidden
+        if 0 < sum(counts[day] for day in hidden) < K_ANONYMITY_THRESHOLD:
+            periods |= {("weekly", week), ("monthly", month)}
+    return days, periods
+
+
+def _aggregate_row(period_type: str, start: date, end: date, totals: dict, groups: Optional[dict]) -> Optional[dict]:
+    if totals["count"] < K_ANONYMITY_THRESHOLD:
+        return None
+    group_stats = None
+    if groups is not None:
+        group_stats = {field: _publishable_groups(groups[field]) for field in GROUP_FIELDS}
+    return {
+        "period_type": period_type,
+        "period_start": start,
+        "period_end": end,
+        "sample_size": totals["count"],
+        "emotion_counts": {k: g["count"] for k, g in group_stats["emotion"]["groups"].items()} if group_stats else None,
+        "theme_counts": {k: g["count"] for k, g in group_stats["theme"]["groups"].items()} if group_stats else None,
+        "lucid_rate": round(totals["lucid"] / totals["count"], 4),
+        "avg_mood": round(totals["mood_sum"] / totals["mood_n"], 2) if totals["mood_n"] else None,
+        "avg_sleep_quality": round(totals["sleep_sum"] / totals["sleep_n"], 2) if totals["sleep_n"] else None,
+        "group_stats": group_stats,
+    }
+
+
+async def rollup_days(db: AsyncSession, days: Iterable[date]) -> int:
+    """Recompute every weekly and monthly period containing one of ``days``, and each day in them.
+
+    Returns the number of aggregate rows written. Does not commit.
+    """
+    periods = {(pt, *period_bounds(pt, day)) for day in days for pt in ("weekly", "monthly")}
+    if not periods:
+        return 0
+    first = min(start for _, start, _ in periods)
+    last = max(end for _, _, end in periods)
+    period_of = {(pt, start): (pt, start, end) for pt, start, end in periods}
+
+    def periods_for(day: date):
+        for pt in ("weekly", "monthly"):
+            key = (pt, period_bounds(pt, day)[0])
+            if key in period_of:
+                yield period_of[key]
+
+    covered = sorted({
+        start + timedelta(days=i) for _, start, end in periods for i in range((end - start).days + 1)
+    })
+
+    # Whole weeks and months are loaded, so every fragment of a rewritten period is complete.
+    daily = await _daily_totals(db, first, last)
+    hidden_days, hidden_periods = _suppressed_days(daily)
+
+    totals = defaultdict(_empty_totals)
+    for day, values in daily.items():
+        for period in periods_for(day):
+            _add(totals[period], values)
+
+    groups = defaultdict(lambda: {field: defaultdict(_empty_group) for field in GROUP_FIELDS})
+    for field in GROUP_FIELDS:
+        for day, key, values in await _daily_groups(db, field, first, last):
+            for period in periods_for(day):
+                _add(groups[period][field][key], values)
+
+    rows = [
+        row for period in periods
+        if period[:2] not in hidden_periods
+        and (row := _aggregate_row(*period, totals[period], groups[period])) is not None
+    ]
+    rows += [
+        row for day in covered
+        if day in daily and day not in hidden_days
+        and (row := _aggregate_row("daily", day, day, daily[day], None)) is not None
+    ]
+
+    starts = {"daily": covered}
+    for pt in ("weekly", "monthly"):
+        starts[pt] = [start for p, start, _ in periods if p == pt]
+    for pt in PERIOD_TYPES:
+        await db.execute(
+            delete(DreamResearchAggregate).filter(
+                DreamResearchAggregate.period_type == pt,
+                DreamResearchAggregate.period_start.in_(starts[pt]),
+            )
+        )
+    if rows:
+        await db.execute(insert(DreamResearchAggregate), rows)
+    return len(rows)
+
+
+async def mark_event_days_dirty(db: AsyncSession, *criteria) -> None:
+    """Record the days of the events matching ``criteria`` before they are deleted.
+
+    Also bumps the deletion counter if any event matches. Does not commit.
+    """
+    marked = await db.execute(
+        insert(ResearchRollupDirtyDay).from_select(
+            ["day"],
+            select(_event_day()).filter(*criteria).distinct(),
+        )
+    )
+    if not marked.rowcount:
+        return
+    state = ResearchRollupState.__table__.c
+    await db.execute(
+        dialect_insert(db, ResearchRollupState)
+        .values(id=1, deletions=1)
+        .on_conflict_do_update(index_elements=[state.id], set_={"deletions": func.coalesce(state.deletions, 0) + 1})
+    )
+
+
+async def event_deletions(db: AsyncSession) -> int:
+    """How many times research events have been deleted or withdrawn by a revocation."""
+    return await db.scalar(select(ResearchRollupState.deletions).filter(ResearchRollupState.id == 1)) or 0
+
+
+async def mark_consent_days_dirty(db: AsyncSession, consent_id: int) -> None:
+    """Withdraw a revoked consent's events from rollups and the research store. Does not commit."""
+    await mark_event_days_dirty(db, DreamResearchEvent.consent_id == consent_id)
+
+
+async def refresh_rollups(db: AsyncSession) -> int:
+    """Bring rollups up to date with the event table and commit.
+
+    Returns the number of aggregate rows written.
+    """
+    state = await db.get(ResearchRollupState, 1)
+    if state is None:
+        state = ResearchRollupState(id=1)
+        db.add(state)
+
+    high_water = await db.scalar(select(func.max(DreamResearchEvent.created_at)))
+
+    new_days = select(_event_day()).distinct()
+    if state.watermark is not None:
+        new_days = new_days.filter(DreamResearchEvent.created_at >= state.watermark - WATERMARK_LAG)
+    days = {_as_date(d) for d in (await db.scalars(new_days)).all() if d is not None}
+
+    dirty = (await db.execute(select(ResearchRollupDirtyDay.id, ResearchRollupDirtyDay.day))).all()
+    days.update(_as_date(d) for _, d in dirty)
+
+    written = await rollup_days(db, days)
+
+    if dirty:
+        max_dirty_id = max(dirty_id for dirty_id, _ in dirty)
+        await db.execute(delete(ResearchRollupDirtyDay).filter(ResearchRollupDirtyDay.id <= max_dirty_id))
+    if high_water is not None:
+        state.watermark = high_water
+    await db.commit()
+
+    if days:
+        logger.info("Research rollups refreshed for %d day(s), %d aggregate row(s) written", len(days), written)
+    return written
+
@@ -0,0 +1,245 @@
+"""Columnar in-memory snapshot of research events for ad-hoc analytics.
+
+Research events are low-cardinality codes, so each dimension is
+dictionary-encoded into an ``int32`` array, and mood/vividness are kept as
+``int8`` (0 = missing). Grouped counts and sums then come from
+``np.bincount`` over those arrays, with no SQL scan, and filters are
+boolean masks.
+
+Only events of active consents are loaded; those of revoked consents stay
+out while they await the purge. ``refresh`` appends events created after
+the last one loaded, read in (created_at, id) order and concatenated onto
+the columns once per load. Deletions and revocations cannot be seen that
+way, so each one bumps a counter in the same transaction. The snapshot is rebuilt from scratch when that counter has
+moved since it was loaded, when an event committed late with an older
+created_at was skipped (fewer rows loaded than the table has up to the last
+key), or when the last full load is older than ``FULL_RELOAD_SECONDS``.
+Events inserted while a refresh runs are simply picked up by the next one.
+"""
+import logging
+import threading
+import time
+from typing import Mapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, or_, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.dream_research_event import DreamResearchEvent
+from services.pagination import comparable_key
+from services.research_rollup import GROUP_FIELDS, active_events, event_deletions, group_key
+
+logger = logging.getLogger(__name__)
+
+LOAD_BATCH_SIZE = 50_000
+FULL_RELOAD_SECONDS = 3600.0
+# Above this many possible group combinations, group with np.unique instead of a dense bincount.
+DENSE_GROUP_LIMIT = 1 << 22
+
+
+class _Dictionary:
+    """Value <-> int code mapping for one dimension."""
+
+    def __init__(self):
+        self.values: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    def encode(self, raw: Sequence) -> np.ndarray:
+        codes = self._codes
+        out = np.empty(len(raw), dtype=np.int32)
+        for i, value in enumerate(raw):
+            key = group_key(value)
+            code = codes.get(key)
+            if code is None:
+                code = codes[key] = len(self.values)
+                self.values.append(key)
+            out[i] = code
+        return out
+
+    def code(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+    def copy(self) -> "_Dictionary":
+        copied = _Dictionary()
+        copied.values = list(self.values)
+        copied._codes = dict(self._codes)
+        return copied
+
+
+class _Snapshot:
+    def __init__(self):
+        self.dictionaries = {d: _Dictionary() for d in GROUP_FIELDS}
+        self.codes = {d: np.empty(0, dtype=np.int32) for d in GROUP_FIELDS}
+        self.mood = np.empty(0, dtype=np.int8)
+        self.vividness = np.empty(0, dtype=np.int8)
+        self.last_key = None
+        self.last_ids: set[str] = set()  # ids sharing last_key, to skip on the next incremental load
+        self.deletions = 0  # event_deletions() when the load started
+        self.pending: list[tuple] = []  # encoded partitions not yet in the columns
+
+    def __len__(self) -> int:
+        return len(self.mood)
+
+    def append(self, rows: list) -> None:
+        """Encode one partition of rows; the columns grow only in ``finish``."""
+        n = len(GROUP_FIELDS)
+        columns = list(zip(*rows))
+        codes = {d: self.dictionaries[d].encode(columns[i]) for i, d in enumerate(GROUP_FIELDS)}
+        mood = np.array([v or 0 for v in columns[n]], dtype=np.int8)
+        vividness = np.array([v or 0 for v in columns[n + 1]], dtype=np.int8)
+        self.pending.append((codes, mood, vividness))
+
+        ids, keys = columns[n + 2], columns[n + 3]
+        last_key = keys[-1]
+        if last_key != self.last_key:
+            self.last_key, self.last_ids = last_key, set()
+        self.last_ids.update(i for i, k in zip(ids, keys) if k == last_key)
+
+    def finish(self) -> None:
+        """Concatenate the pending partitions onto the columns, once per load."""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        for dimension in GROUP_FIELDS:
+            self.codes[dimension] = np.concatenate([self.codes[dimension], *(p[0][dimension] for p in pending)])
+        self.mood = np.concatenate([self.mood, *(p[1] for p in pending)])
+        self.vividness = np.concatenate([self.vividness, *(p[2] for p in pending)])
+
+
+class ResearchEventStore:
+    """Process-wide columnar snapshot; readers see a consistent, immutable snapshot."""
+
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshot = None
+            self._loaded_at = 0.0
+
+    async def _load(self, db: AsyncSession, snapshot: _Snapshot) -> None:
+        E = DreamResearchEvent
+        key = comparable_key(db, E.created_at)
+        query = (
+            select(*GROUP_FIELDS.values(), E.mood_score, E.vividness, E.id, key)
+            .filter(active_events())
+            .order_by(key, E.id)
+        )
+        if snapshot.last_key is not None:
+            query = query.filter(or_(key > snapshot.last_key, and_(key == snapshot.last_key, E.id.not_in(snapshot.last_ids))))
+        result = await db.stream(query.execution_options(yield_per=LOAD_BATCH_SIZE))
+        async for partition in result.partitions():
+            snapshot.append(partition)
+        snapshot.finish()
+
+    async def _loaded_all_up_to_last_key(self, db: AsyncSession, snapshot: _Snapshot) -> bool:
+        if snapshot.last_key is None:
+            return len(snapshot) == 0
+        key = comparable_key(db, DreamResearchEvent.created_at)
+        loaded = select(func.count(DreamResearchEvent.id)).filter(active_events(), key <= snapshot.last_key)
+        return len(snapshot) == await db.scalar(loaded)
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """Load new events, rebuilding when rows were deleted. Returns the snapshot size."""
+        # Read before loading: a deletion that commits mid-load moves it past this value.
+        deletions = await event_deletions(db)
+        current = self._snapshot
+        stale = (
+            current is None
+            or current.deletions != deletions
+            or time.monotonic() - self._loaded_at > FULL_RELOAD_SECONDS
+        )
+
+        if not stale:
+            # Extend a copy so concurrent readers keep the previous snapshot intact.
+            snapshot = _Snapshot()
+            snapshot.__dict__.update(current.__dict__)
+            snapshot.dictionaries = {d: dictionary.copy() for d, dictionary in current.dictionaries.items()}
+            snapshot.codes = dict(current.codes)
+            snapshot.last_ids = set(current.last_ids)
+            snapshot.pending = []
+            await self._load(db, snapshot)
+            stale = not await self._loaded_all_up_to_last_key(db, snapshot)
+        if stale:
+            snapshot = _Snapshot()
+            await self._load(db, snapshot)
+            loaded_at = time.monotonic()
+        else:
+            loaded_at = self._loaded_at
+        snapshot.deletions = deletions
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._loaded_at = loaded_at
+        return len(snapshot)
+
+    def _mask(self, snapshot: _Snapshot, filters: Mapping[str, Sequence[str]]) -> Optional[np.ndarray]:
+        mask = None
+        for dimension, values in filters.items():
+            dictionary = snapshot.dictionaries[dimension]
+            codes = [c for c in (dictionary.code(v) for v in values) if c is not None]
+            selected = np.isin(snapshot.codes[dimension], np.array(codes, dtype=np.int32))
+            mask = selected if mask is None else mask & selected
+        return mask
+
+    def cells(self, dimensions: Sequence[str], filters: Mapping[str, Sequence[str]] = {}) -> dict[tuple, list]:
+        """Grouped [count, mood_sum, mood_n, vividness_sum, vividness_n] per combination of ``dimensions``."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("Research event store is not loaded")
+
+        mask = self._mask(snapshot, filters)
+        sizes = [max(len(snapshot.dictionaries[d].values), 1) for d in dimensions]
+        combined = np.zeros(len(snapshot), dtype=np.int64)
+        for dimension, size in zip(dimensions, sizes):
+            combined = combined * size + snapshot.codes[dimension]
+        mood, vividness = snapshot.mood, snapshot.vividness
+        if mask is not None:
+            combined, mood, vividness = combined[mask], mood[mask], vividness[mask]
+
+        groups = int(np.prod(sizes, dtype=np.int64))
+        if groups <= DENSE_GROUP_LIMIT:
+            keys, index = None, combined
+            length = groups
+        else:
+            keys, index = np.unique(combined, return_inverse=True)
+            length = len(keys)
+
+        stats = [
+            np.bincount(index, minlength=length),
+            np.bincount(index, weights=mood, minlength=length),
+            np.bincount(index, weights=mood > 0, minlength=length),
+            np.bincount(index, weights=vividness, minlength=length),
+            np.bincount(index, weights=vividness > 0, minlength=length),
+        ]
+        present = np.nonzero(stats[0])[0]
+
+        cells = {}
+        for slot in present:
+            code = int(keys[slot]) if keys is not None else int(slot)
+            labels = []
+            for dimension, size in zip(reversed(dimensions), reversed(sizes)):
+                code, part = divmod(code, size)
+                labels.append(snapshot.dictionaries[dimension].values[part])
+            cells[tuple(reversed(labels))] = [int(s[slot]) for s in stats]
+        return cells
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "events": len(snapshot),
+            "bytes": sum(a.nbytes for a in snapshot.codes.values()) + snapshot.mood.nbytes + snapshot.vividness.nbytes,
+            "cardinality": {d: len(snapshot.dictionaries[d].values) for d in GROUP_FIELDS},
+        }
+
+
+research_store = ResearchEventStore()
@@ -0,0 +1,102 @@
+import re
+from typing import Optional
+
+from sqlalchemy import Integer, column, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.dream import Dream
+from models.goal import Goal
+from models.idea import Idea
+from models.search_index import SEARCH_INDEXES, SearchIndexSpec
+
+SEARCH_MODELS = {"dream": Dream, "goal": Goal, "idea": Idea}
+
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+SNIPPET_TOKENS = 16
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(q: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query: every word, prefix-matched, all required."""
+    tokens = _TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    return " AND ".join(f'"{token}"*' for token in tokens)
+
+
+def uses_fts(db: AsyncSession) -> bool:
+    return db.bind is not None and db.bind.dialect.name == "sqlite"
+
+
+def _like_filter(entity_type: str, q: str):
+    model = SEARCH_MODELS[entity_type]
+    search_term = f"%{q}%"
+    return or_(*(getattr(model, c).like(search_term) for c in SEARCH_INDEXES[entity_type].columns))
+
+
+def text_filter(db: AsyncSession, entity_type: str, q: str):
+    """WHERE clause for a list endpoint's ``q`` parameter.
+
+    Uses the FTS index on SQLite and falls back to LIKE elsewhere, or when
+    the text has no searchable words.
+    """
+    match = fts_query(q)
+    if match is None or not uses_fts(db):
+        return _like_filter(entity_type, q)
+    spec = SEARCH_INDEXES[entity_type]
+    matching_ids = (
+        text(f"SELECT rowid FROM {spec.fts_table} WHERE {spec.fts_table} MATCH :fts_q")
+        .bindparams(fts_q=match)
+        .columns(column("rowid", Integer))
+    )
+    return SEARCH_MODELS[entity_type].id.in_(matching_ids)
+
+
+def _fts_arm(spec: SearchIndexSpec) -> str:
+    fts = spec.fts_table
+    return (
+        f"SELECT '{spec.entity_type}' AS entity_type, e.id AS id, e.{spec.title_column} AS title, "
+        f"snippet({fts}, -1, :open, :close, '…', {SNIPPET_TOKENS}) AS snippet, "
+        f"bm25({fts}) AS rank "
+        f"FROM {fts} JOIN {spec.table} e ON e.id = {fts}.rowid "
+        f"WHERE {fts} MATCH :fts_q AND e.user_id = :user_id"
+    )
+
+
+async def search(
+    db: AsyncSession, user_id: int, q: str, entity_types: list[str], limit: int
+) -> list[dict]:
+    """Ranked hits across ``entity_types``; lower rank is a better match."""
+    match = fts_query(q)
+    if match is None:
+        return []
+
+    if uses_fts(db):
+        sql = " UNION ALL ".join(_fts_arm(SEARCH_INDEXES[t]) for t in entity_types)
+        rows = await db.execute(
+            text(f"{sql} ORDER BY rank LIMIT :limit"),
+            {"fts_q": match, "user_id": user_id, "open": SNIPPET_OPEN, "close": SNIPPET_CLOSE, "limit": limit},
+        )
+        return [dict(row._mapping) for row in rows]
+
+    hits = []
+    for entity_type in entity_types:
+        model = SEARCH_MODELS[entity_type]
+        spec = SEARCH_INDEXES[entity_type]
+        result = await db.execute(
+            model.__table__.select()
+            .where(model.user_id == user_id, _like_filter(entity_type, q))
+            .limit(limit)
+        )
+        for row in result.mappings():
+            body = " ".join(str(row[c]) for c in spec.columns if row[c])
+            hits.append({
+                "entity_type": entity_type,
+                "id": row["id"],
+                "title": row[spec.title_column],
+                "snippet": body[:200],
+                "rank": 0.0,
+            })
+    return hits[:limit]
@@ -0,0 +1,122 @@
+"""Sleep-dream correlation statistics, computed with NumPy over projected columns.
+
+Only the five columns involved are read (no ORM objects). For each pair,
+mood vs. sleep quality and sleep duration vs. dream vividness, the result
+has:
+
+- Pearson's r with a 95% confidence interval (Fisher z-transform),
+- Spearman's rho (Pearson over average ranks, so ties are handled),
+- the mean of the y variable per x bin (quality level, or hour of sleep
+  duration), with a 95% normal-approximation interval.
+
+Raw points are optional. When requested, they are thinned to at most
+``max_points`` evenly spaced nights in date order.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.dream import Dream
+from models.sleep_log import SleepLog
+
+Z_95 = 1.959964
+DURATION_BIN_MINUTES = 60
+
+
+def _rank(values: np.ndarray) -> np.ndarray:
+    """1-based ranks with ties given their average rank."""
+    order = values.argsort(kind="mergesort")
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(1, len(values) + 1)
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    return (np.bincount(inverse, weights=ranks) / counts)[inverse]
+
+
+def _pearson(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    if len(x) < 2 or x.std() == 0 or y.std() == 0:
+        return None
+    return float(np.corrcoef(x, y)[0, 1])
+
+
+def _fisher_interval(r: Optional[float], n: int) -> Optional[list[float]]:
+    if r is None or n <= 3:
+        return None
+    z = math.atanh(max(min(r, 0.999999), -0.999999))
+    half = Z_95 / math.sqrt(n - 3)
+    return [round(math.tanh(z - half), 4), round(math.tanh(z + half), 4)]
+
+
+def _binned_means(keys: np.ndarray, y: np.ndarray) -> list[dict]:
+    """Mean of ``y`` per distinct key, with a 95% interval where n > 1."""
+    bins, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    sums = np.bincount(inverse, weights=y)
+    squares = np.bincount(inverse, weights=y * y)
+    means = sums / counts
+    result = []
+    for key, n, mean, sq in zip(bins, counts, means, squares):
+        interval = None
+        if n > 1:
+            variance = max((sq - n * mean * mean) / (n - 1), 0.0)
+            half = Z_95 * math.sqrt(variance / n)
+            interval = [round(mean - half, 3), round(mean + half, 3)]
+        result.append({"bin": int(key), "count": int(n), "mean": round(float(mean), 3), "ci95": interval})
+    return result
+
+
+def correlation_summary(x: np.ndarray, y: np.ndarray, bin_keys: np.ndarray) -> dict:
+    n = len(x)
+    pearson = _pearson(x, y)
+    spearman = _pearson(_rank(x), _rank(y)) if n else None
+    return {
+        "n": n,
+        "pearson": round(pearson, 4) if pearson is not None else None,
+        "pearson_ci95": _fisher_interval(pearson, n),
+        "spearman": round(spearman, 4) if spearman is not None else None,
+        "bins": _binned_means(bin_keys, y) if n else [],
+    }
+
+
+def _sample(count: int, max_points: int) -> np.ndarray:
+    if count <= max_points:
+        return np.arange(count)
+    return np.unique(np.linspace(0, count - 1, max_points).round().astype(int))
+
+
+async def sleep_correlations(db: AsyncSession, criteria: list, include_points: bool, max_points: int) -> dict:
+    rows = (await db.execute(
+        select(SleepLog.sleep_time, SleepLog.quality, SleepLog.sleep_duration_minutes, Dream.mood, Dream.vividness)
+        .join(Dream, SleepLog.dream_id == Dream.id)
+        .filter(*criteria)
+        .order_by(SleepLog.sleep_time)
+    )).all()
+
+    dates = [r[0] for r in rows]
+    columns = np.array([r[1:] for r in rows], dtype=float).reshape(len(rows), 4)
+    quality, duration, mood, vividness = columns.T
+
+    paired = ~np.isnan(quality) & ~np.isnan(mood)
+    timed = ~np.isnan(duration) & ~np.isnan(vividness)
+
+    result = {
+        "mood_vs_quality_stats": correlation_summary(quality[paired], mood[paired], quality[paired]),
+        "duration_vs_vividness_stats": correlation_summary(
+            duration[timed], vividness[timed], duration[timed] // DURATION_BIN_MINUTES
+        ),
+        "mood_vs_quality": [],
+        "duration_vs_vividness": [],
+    }
+    if include_points:
+        index = np.flatnonzero(paired)
+        result["mood_vs_quality"] = [
+            {"date": dates[i].isoformat(), "mood": int(mood[i]), "quality": int(quality[i])}
+            for i in index[_sample(len(index), max_points)]
+        ]
+        index = np.flatnonzero(timed)
+        result["duration_vs_vividness"] = [
+            {"date": dates[i].isoformat(), "duration_minutes": int(duration[i]), "vividness": int(vividness[i])}
+            for i in index[_sample(len(index), max_points)]
+        ]
+    return result
@@ -0,0 +1,123 @@
+"""Bulk ingestion of sleep history exported from wearables.
+
+A sync usually re-sends nights already stored, so the import is an upsert
+on the unique (user_id, sleep_time) index. Each chunk of
+``sleep_import_chunk_size`` nights is written with INSERT ... ON CONFLICT DO
+UPDATE, one statement per set of fields present, so a stored night only
+changes in the fields the payload has. The database resolves the conflict,
+so two imports of the same nights at once cannot insert a night twice. A
+SELECT beforehand only sorts nights into inserted and updated for the
+response. If a payload repeats a night, the last occurrence wins.
+
+Times are normalized to UTC, and naive times are taken as UTC, so the same
+night always maps to the same key. ``sleep_duration_minutes`` is computed
+from the sleep and wake times when the export does not provide it.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from database import dialect_insert
+from models.dream import Dream
+from models.sleep_log import SleepLog
+from schemas.sleep_log import SleepLogCreate
+from services.bulk_import import ImportFormatError, parse_records, validation_message
+
+settings = get_settings()
+
+# Column values for fields a new night's payload leaves out.
+_DEFAULTS = {
+    name: field.get_default(call_default_factory=True)
+    for name, field in SleepLogCreate.model_fields.items()
+    if not field.is_required()
+}
+
+
+def utc(value: datetime) -> datetime:
+    """``value`` as an aware UTC datetime; naive values are taken as UTC."""
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _night_key(value: datetime) -> datetime:
+    """Comparable form of a sleep_time, whether read back naive (SQLite) or aware."""
+    return utc(value).replace(tzinfo=None)
+
+
+def _prepare(record: dict) -> dict:
+    """Validated column values for one night; only fields present in ``record`` plus the computed ones."""
+    sleep = SleepLogCreate.model_validate(record)
+    values = sleep.model_dump(exclude_unset=True)
+    values["sleep_time"] = utc(sleep.sleep_time)
+    values["wake_time"] = utc(sleep.wake_time)
+    if values["wake_time"] <= values["sleep_time"]:
+        raise ValueError("wake_time: must be after sleep_time")
+    if sleep.sleep_duration_minutes is None:
+        values["sleep_duration_minutes"] = round((values["wake_time"] - values["sleep_time"]).total_seconds() / 60)
+    return values
+
+
+async def import_sleep_logs(db: AsyncSession, user_id: int, body: bytes, fmt: str) -> dict:
+    """Upsert the nights in ``body``; returns counts and per-row errors."""
+    errors: list[dict] = []
+    nights: dict[datetime, tuple[int, dict]] = {}
+    for row, record in parse_records(body, fmt, wrapper_key="sleep_logs"):
+        if row > settings.sleep_import_max_rows:
+            raise ImportFormatError(f"At most {settings.sleep_import_max_rows} nights per import")
+        if isinstance(record, str):
+            errors.append({"row": row, "message": record})
+            continue
+        try:
+            values = _prepare(record)
+        except ValidationError as exc:
+            errors.append({"row": row, "message": validation_message(exc)})
+            continue
+        except ValueError as exc:
+            errors.append({"row": row, "message": str(exc)})
+            continue
+        nights[_night_key(values["sleep_time"])] = (row, values)
+
+    dream_ids = {v["dream_id"] for _, v in nights.values() if v.get("dream_id") is not None}
+    if dream_ids:
+        owned = set((await db.scalars(
+            select(Dream.id).filter(Dream.user_id == user_id, Dream.id.in_(dream_ids))
+        )).all())
+        for key, (row, values) in list(nights.items()):
+            if values.get("dream_id") is not None and values["dream_id"] not in owned:
+                errors.append({"row": row, "message": "dream_id: Dream not found or doesn't belong to you"})
+                del nights[key]
+
+    inserted = updated = 0
+    pending = [values for _, values in nights.values()]
+    size = settings.sleep_import_chunk_size
+    for start in range(0, len(pending), size):
+        chunk = pending[start:start + size]
+        existing = {
+            _night_key(sleep_time)
+            for sleep_time in await db.scalars(
+                select(SleepLog.sleep_time).filter(
+                    SleepLog.user_id == user_id,
+                    SleepLog.sleep_time.in_([v["sleep_time"] for v in chunk]),
+                )
+            )
+        }
+        by_fields = defaultdict(list)
+        for values in chunk:
+            by_fields[frozenset(values)].append({**_DEFAULTS, **values, "user_id": user_id})
+        for fields, rows in by_fields.items():
+            stmt = dialect_insert(db, SleepLog)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SleepLog.user_id, SleepLog.sleep_time],
+                set_={**{name: stmt.excluded[name] for name in fields - {"sleep_time"}}, "updated_at": func.now()},
+            )
+            await db.execute(stmt, rows)
+        await db.commit()
+        stored = sum(_night_key(v["sleep_time"]) in existing for v in chunk)
+        inserted += len(chunk) - stored
+        updated += stored
+
+    errors.sort(key=lambda e: e["row"])
+    return {"inserted": inserted, "updated": updated, "failed": len(errors), "errors": errors}
@@ -0,0 +1,162 @@
+"""Sleep statistics computed in the database, with a size-bounded trend.
+
+Averages and counts come from one aggregate query. Percentiles come from
+grouped value counts. Quality is 1-5 and durations are whole minutes, so
+each histogram has one row per distinct value, whatever the date range.
+The percentiles are interpolated from it exactly like ``percentile_cont``.
+
+The quality trend is grouped into day, week or month buckets in SQL. With
+``auto``, the finest bucket that fits ``max_points`` is chosen from the
+range's span. A series still longer than ``max_points`` is downsampled with
+Largest-Triangle-Three-Buckets (LTTB), which keeps peaks and dips that
+plain striding would drop. Payload and memory are therefore bounded by
+``max_points`` for a month or for a decade of nights. ``none`` reads the raw
+nightly series and only downsamples it.
+"""
+from datetime import datetime
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.sleep_log import SleepLog
+
+TREND_BUCKETS = ("auto", "none", "day", "week", "month")
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Approximate days per bucket, used to pick the ``auto`` bucket from the span.
+_BUCKET_DAYS = {"day": 1, "week": 7, "month": 30}
+
+
+def _bucket_start(db: AsyncSession, bucket: str):
+    """SQL expression for the ISO date starting each row's bucket (weeks start on Monday)."""
+    col = SleepLog.sleep_time
+    if db.bind.dialect.name == "sqlite":
+        if bucket == "week":
+            return func.date(col, "weekday 0", "-6 days")
+        if bucket == "month":
+            return func.strftime("%Y-%m-01", col)
+        return func.date(col)
+    return func.to_char(func.date_trunc(bucket, col), "YYYY-MM-DD")
+
+
+def histogram_percentiles(histogram: Sequence[tuple], percentiles: Sequence[int] = PERCENTILES) -> dict:
+    """Linearly interpolated percentiles (as ``percentile_cont``) from sorted (value, count) pairs."""
+    if not histogram:
+        return {}
+    values = np.array([v for v, _ in histogram], dtype=float)
+    ends = np.cumsum([c for _, c in histogram])  # rank (exclusive) where each value stops
+    n = int(ends[-1])
+
+    def at(rank: int) -> float:
+        return float(values[np.searchsorted(ends, rank, side="right")])
+
+    result = {}
+    for p in percentiles:
+        position = p / 100 * (n - 1)
+        lower = int(np.floor(position))
+        upper = min(lower + 1, n - 1)
+        low, high = at(lower), at(upper)
+        result[f"p{p}"] = round(low + (high - low) * (position - lower), 2)
+    return result
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of at most ``threshold`` points preserving the visual shape of (x, y)."""
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        raise ValueError("LTTB needs a threshold of at least 3")
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = [0]
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex.
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        a = selected[-1]
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        selected.append(start + int(np.argmax(areas)))
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def _downsample(points: list[dict], max_points: int) -> list[dict]:
+    if len(points) <= max_points:
+        return points
+    x = np.array([datetime.fromisoformat(p["date"]).timestamp() for p in points])
+    y = np.array([p["quality"] for p in points], dtype=float)
+    return [points[i] for i in lttb(x, y, max_points)]
+
+
+def _as_datetime(value) -> datetime:
+    # SQLite can return MIN/MAX of a DateTime column as the stored text.
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def _choose_bucket(first: datetime, last: datetime, max_points: int) -> str:
+    span_days = (last - first).days + 1
+    for bucket, days in _BUCKET_DAYS.items():
+        if span_days / days <= max_points:
+            return bucket
+    return "month"
+
+
+async def sleep_stats(db: AsyncSession, criteria: list, bucket: str, max_points: int) -> dict:
+    """Averages, percentiles and a trend of at most ``max_points`` for logs matching ``criteria``."""
+    total, avg_quality, avg_duration, first, last = (await db.execute(
+        select(
+            func.count(SleepLog.id),
+            func.avg(SleepLog.quality),
+            func.avg(SleepLog.sleep_duration_minutes),
+            func.min(SleepLog.sleep_time),
+            func.max(SleepLog.sleep_time),
+        ).filter(*criteria)
+    )).one()
+    if not total:
+        return {"avg_quality": 0.0, "avg_duration": None, "total_logs": 0, "quality_trend": []}
+
+    quality_hist = (await db.execute(
+        select(SleepLog.quality, func.count())
+        .filter(*criteria, SleepLog.quality.is_not(None))
+        .group_by(SleepLog.quality)
+        .order_by(SleepLog.quality)
+    )).all()
+    duration_hist = (await db.execute(
+        select(SleepLog.sleep_duration_minutes, func.count())
+        .filter(*criteria, SleepLog.sleep_duration_minutes.is_not(None))
+        .group_by(SleepLog.sleep_duration_minutes)
+        .order_by(SleepLog.sleep_duration_minutes)
+    )).all()
+
+    if bucket == "auto":
+        bucket = _choose_bucket(_as_datetime(first), _as_datetime(last), max_points)
+    if bucket == "none":
+        rows = await db.execute(
+            select(SleepLog.sleep_time, SleepLog.quality).filter(*criteria).order_by(SleepLog.sleep_time)
+        )
+        trend = [{"date": _as_datetime(t).isoformat(), "quality": q} for t, q in rows]
+    else:
+        start = _bucket_start(db, bucket).label("bucket")
+        rows = await db.execute(
+            select(start, func.avg(SleepLog.quality), func.count())
+            .filter(*criteria)
+            .group_by(start)
+            .order_by(start)
+        )
+        trend = [{"date": str(day), "quality": round(float(q), 2), "count": n} for day, q, n in rows]
+
+    return {
+        "avg_quality": round(float(avg_quality or 0), 2),
+        "avg_duration": round(float(avg_duration), 1) if avg_duration is not None else None,
+        "total_logs": total,
+        "quality_trend": _downsample(trend, max_points),
+        "trend_bucket": bucket,
+        "quality_percentiles": histogram_percentiles(quality_hist),
+        "duration_percentiles": histogram_percentiles(duration_hist),
+    }
@@ -0,0 +1,161 @@
+-- Schema created by Base.metadata.create_all at the baseline commit, before versioned migrations.
+CREATE TABLE users (
+	id INTEGER NOT NULL, 
+	email VARCHAR NOT NULL, 
+	password_hash VARCHAR NOT NULL, 
+	name VARCHAR, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	avatar_url VARCHAR(500), 
+	bio TEXT, 
+	timezone VARCHAR(50), 
+	theme_preference VARCHAR(20), 
+	notification_preferences JSON, 
+	dream_reminder_time VARCHAR(5), 
+	sleep_reminder_time VARCHAR(5), 
+	last_login_at DATETIME, 
+	age_bracket VARCHAR(10), 
+	gender_category VARCHAR(20), 
+	region VARCHAR(50), 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_users_id ON users (id);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE dream_research_aggregates (
+	id INTEGER NOT NULL, 
+	period_type VARCHAR(20) NOT NULL, 
+	period_start DATE NOT NULL, 
+	period_end DATE NOT NULL, 
+	sample_size INTEGER NOT NULL, 
+	emotion_counts JSON, 
+	theme_counts JSON, 
+	lucid_rate FLOAT, 
+	avg_mood FLOAT, 
+	avg_sleep_quality FLOAT, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_dream_research_aggregates_id ON dream_research_aggregates (id);
+CREATE TABLE goals (
+	id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	title VARCHAR(255) NOT NULL, 
+	description TEXT, 
+	category VARCHAR(50), 
+	status VARCHAR(50), 
+	progress INTEGER, 
+	target_date DATETIME, 
+	milestones JSON, 
+	ai_suggestions TEXT, 
+	priority INTEGER, 
+	notes TEXT, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_goals_id ON goals (id);
+CREATE TABLE ideas (
+	id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	content TEXT NOT NULL, 
+	category VARCHAR(100), 
+	tags JSON, 
+	priority INTEGER, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_ideas_id ON ideas (id);
+CREATE TABLE research_consent (
+	id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	status VARCHAR(20) NOT NULL, 
+	consent_version VARCHAR(20) NOT NULL, 
+	consented_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, 
+	revoked_at DATETIME, 
+	ip_hash VARCHAR(64), 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	UNIQUE (user_id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_research_consent_id ON research_consent (id);
+CREATE TABLE saved_filters (
+	id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	name VARCHAR(100) NOT NULL, 
+	entity_type VARCHAR(20) NOT NULL, 
+	filter_config JSON NOT NULL, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_saved_filters_id ON saved_filters (id);
+CREATE TABLE dreams (
+	id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	title VARCHAR(255) NOT NULL, 
+	content TEXT NOT NULL, 
+	mood INTEGER, 
+	tags JSON, 
+	ai_interpretation TEXT, 
+	dream_date DATETIME, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	lucidity_level INTEGER, 
+	emotions JSON, 
+	characters JSON, 
+	locations JSON, 
+	is_recurring BOOLEAN, 
+	recurring_theme VARCHAR(255), 
+	vividness INTEGER, 
+	dream_type VARCHAR(20), 
+	goal_id INTEGER, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id), 
+	FOREIGN KEY(goal_id) REFERENCES goals (id) ON DELETE SET NULL
+);
+CREATE INDEX ix_dreams_id ON dreams (id);
+CREATE TABLE dream_research_events (
+	id VARCHAR(36) NOT NULL, 
+	consent_id INTEGER NOT NULL, 
+	emotion VARCHAR(50), 
+	theme VARCHAR(100), 
+	is_lucid BOOLEAN NOT NULL, 
+	mood_score INTEGER, 
+	sleep_quality INTEGER, 
+	dream_type VARCHAR(20), 
+	vividness INTEGER, 
+	is_recurring BOOLEAN, 
+	day_of_week INTEGER, 
+	month INTEGER, 
+	age_bracket VARCHAR(10), 
+	region VARCHAR(50), 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(consent_id) REFERENCES research_consent (id) ON DELETE CASCADE
+);
+CREATE TABLE sleep_logs (
+	id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	dream_id INTEGER, 
+	sleep_time DATETIME NOT NULL, 
+	wake_time DATETIME NOT NULL, 
+	quality INTEGER, 
+	notes TEXT, 
+	sleep_duration_minutes INTEGER, 
+	sleep_position VARCHAR(50), 
+	pre_sleep_activity VARCHAR(255), 
+	caffeine_intake BOOLEAN, 
+	exercise_today BOOLEAN, 
+	stress_level INTEGER, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id), 
+	FOREIGN KEY(dream_id) REFERENCES dreams (id)
+);
+CREATE INDEX ix_sleep_logs_id ON sleep_logs (id);
@@ -0,0 +1,115 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+# The app's own engine (used by the lifespan's migrations) must never reach
+# the real database file, and export artifacts go to a scratch directory.
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+_export_dir = tempfile.mkdtemp(prefix="dreamcatcher-exports-")
+atexit.register(shutil.rmtree, _export_dir, ignore_errors=True)
+os.environ.setdefault("ACCOUNT_EXPORT_DIR", _export_dir)
+# The lifespan's periodic jobs open sessions on the app engine, not the test
+# one. Tests run each job directly against the test engine instead.
+for interval in (
+    "RESEARCH_OUTBOX_INTERVAL_SECONDS",
+    "RESEARCH_ROLLUP_INTERVAL_SECONDS",
+    "PURGE_INTERVAL_SECONDS",
+    "RESEARCH_BACKFILL_INTERVAL_SECONDS",
+    "RESEARCH_STORE_REFRESH_SECONDS",
+    "ACCOUNT_EXPORT_INTERVAL_SECONDS",
+    "AI_CACHE_PRUNE_INTERVAL_SECONDS",
+    "AI_JOB_SWEEP_INTERVAL_SECONDS",
+):
+    os.environ.setdefault(interval, "0")
+
+from main import app
+from database import Base, get_db
+from routers.auth import email_throttle, ip_throttle
+from routers.research import cube_cache
+from services.ai_cache import ai_result_cache
+from services.ai_jobs import ai_jobs
+from services.principal_cache import principal_cache
+from services.research_store import research_store
+
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = async_sessionmaker(
+    bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+# AI job workers and the AI result cache open their own sessions rather than using get_db.
+ai_jobs.session_factory = TestingSessionLocal
+ai_result_cache.session_factory = TestingSessionLocal
+
+
+async def override_get_db():
+    async with TestingSessionLocal() as db:
+        yield db
+
+
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def drop_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_db] = override_get_db
+    principal_cache.clear()
+    ip_throttle.clear()
+    email_throttle.clear()
+    cube_cache.clear()
+    research_store.clear()
+    ai_result_cache.clear()
+    with TestClient(app) as c:
+        c.portal.call(create_tables)
+        yield c
+        c.portal.call(drop_tables)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def registered_user(client):
+    """Helper fixture to create a registered user and return credentials."""
+    user_data = {
+        "email": "testuser@example.com",
+        "password": "securepassword123",
+        "name": "Test User"
+    }
+    response = client.post("/api/auth/register", json=user_data)
+    assert response.status_code == 201
+    return user_data
+
+
+@pytest.fixture
+def auth_token(client, registered_user):
+    """Helper fixture to get an auth token for a registered user."""
+    response = client.post(
+        "/api/auth/login",
+        data={
+            "username": registered_user["email"],
+            "password": registered_user["password"]
+        }
+    )
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+
+@pytest.fixture
+def auth_headers(auth_token):
+    """Authorization header for the registered user."""
+    return {"Authorization": f"Bearer {auth_token}"}
@@ -0,0 +1,290 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from models.ai_job import AIJob
+from models.ai_result import AIResult
+from services import ai_cache
+from services.ai_cache import ai_result_cache, prune_ai_results
+from services.ai_jobs import JOB_PRIORITIES, AIJobQueue, ai_jobs, sweep_ai_jobs
+from services.ai_service import PROMPT_VERSIONS, ai_service, settings
+from services.cache import TTLCache
+from tests.conftest import TestingSessionLocal
+
+
+class FakeCompletions:
+    """Stands in for ``client.chat.completions``; counts upstream calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.content = "A flight over water suggests a wish for freedom."
+        self.error = None
+        self.delay = 0.0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+
+
+@pytest.fixture
+def openai(client, monkeypatch):
+    completions = FakeCompletions()
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    monkeypatch.setattr(ai_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    for counter in ("persistent_hits", "persistent_misses", "stores", "errors"):
+        monkeypatch.setattr(ai_result_cache, counter, 0)
+    monkeypatch.setattr(ai_service, "coalesced_calls", 0)
+    monkeypatch.setattr(ai_result_cache, "memory", TTLCache(16, ai_result_cache.ttl_seconds))
+    return completions
+
+
+def _count_results(client) -> int:
+    async def count():
+        async with TestingSessionLocal() as db:
+            return await db.scalar(select(func.count()).select_from(AIResult))
+    return client.portal.call(count)
+
+
+class TestAIResultCache:
+    """Tests for the content-addressed AI result cache."""
+
+    def test_identical_request_is_served_from_cache(self, client, auth_headers, openai):
+        body = {"idea_content": "A garden that  waters itself", "category": "home"}
+        first = client.post("/api/ai/brainstorm", json=body, headers=auth_headers)
+        # Whitespace differences normalize to the same key.
+        second = client.post(
+            "/api/ai/brainstorm",
+            json={"idea_content": " A garden that waters itself ", "category": "home"},
+            headers=auth_headers,
+        )
+
+        assert first.json() == second.json() == {"suggestions": openai.content}
+        assert openai.calls == 1
+        stats = client.get("/api/health").json()["caches"]["ai_results"]
+        assert stats["memory"]["hits"] == 1
+        assert stats["stores"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_different_inputs_miss(self, client, auth_headers, openai):
+        client.post("/api/ai/brainstorm", json={"idea_content": "A garden", "category": "home"}, headers=auth_headers)
+        client.post("/api/ai/brainstorm", json={"idea_content": "A garden", "category": "work"}, headers=auth_headers)
+
+        assert openai.calls == 2
+
+    def test_persistent_tier_survives_a_restart(self, client, auth_headers, openai):
+        openai.content = json.dumps({"emotions": ["wonder"], "dream_type": "lucid", "lucidity_level": 4})
+        body = {"content": "I knew it was a dream and flew.", "mood": 5}
+        first = client.post("/api/ai/auto-tag", json=body, headers=auth_headers).json()
+
+        ai_result_cache.memory.clear()  # a fresh worker has an empty LRU
+        second = client.post("/api/ai/auto-tag", json=body, headers=auth_headers).json()
+        third = client.post("/api/ai/auto-tag", json=body, headers=auth_headers).json()
+
+        assert first == second == third
+        assert first["dream_type"] == "lucid"
+        assert openai.calls == 1
+        assert ai_result_cache.persistent_hits == 1
+        assert ai_result_cache.memory.hits == 1
+
+    def test_prompt_version_is_part_of_the_key(self, client, auth_headers, openai, monkeypatch):
+        body = {"idea_content": "A garden", "category": "home"}
+        client.post("/api/ai/brainstorm", json=body, headers=auth_headers)
+        monkeypatch.setitem(PROMPT_VERSIONS, "brainstorm_ideas", 2)
+        client.post("/api/ai/brainstorm", json=body, headers=auth_headers)
+
+        assert openai.calls == 2
+
+    def test_fallback_is_not_cached(self, client, auth_headers, openai):
+        openai.error = RuntimeError("upstream down")
+        body = {"idea_content": "A garden", "category": "home"}
+        failed = client.post("/api/ai/brainstorm", json=body, headers=auth_headers)
+        assert failed.json() == {"suggestions": "Unable to brainstorm at this time."}
+
+        openai.error = None
+        recovered = client.post("/api/ai/brainstorm", json=body, headers=auth_headers)
+
+        assert recovered.json() == {"suggestions": openai.content}
+        assert openai.calls == 2
+        assert _count_results(client) == 1
+
+    def test_prune_drops_expired_and_oldest_rows(self, client, monkeypatch):
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "key": f"{i:064d}",
+                "method": "brainstorm_ideas",
+                "value": "x",
+                "created_at": now - timedelta(minutes=10 - i),
+                "expires_at": now + timedelta(days=1) if i else now - timedelta(seconds=1),
+            }
+            for i in range(5)
+        ]
+
+        async def seed_and_prune():
+            async with TestingSessionLocal() as db:
+                await db.execute(insert(AIResult), rows)
+                await db.commit()
+                deleted = await prune_ai_results(db)
+                keys = (await db.scalars(select(AIResult.key).order_by(AIResult.key))).all()
+                return deleted, keys
+
+        monkeypatch.setattr(ai_cache.settings, "ai_cache_max_rows", 2)
+        deleted, keys = client.portal.call(seed_and_prune)
+
+        assert deleted == 3
+        assert keys == [f"{3:064d}", f"{4:064d}"]
+
+
+
+def _interpret_concurrently(client, count: int, cancel_first: bool = False) -> list:
+    async def run():
+        tasks = [
+            asyncio.create_task(ai_service.interpret_dream("Falling through clouds", 3, ["sky"]))
+            for _ in range(count)
+        ]
+        if cancel_first:
+            await asyncio.sleep(0.01)
+            tasks[0].cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    return client.portal.call(run)
+
+
+class TestSingleFlight:
+    """Tests for coalescing identical concurrent AI calls."""
+
+    def test_concurrent_identical_calls_share_one_upstream_call(self, client, openai):
+        openai.delay = 0.05
+        results = _interpret_concurrently(client, 5)
+
+        assert results == [openai.content] * 5
+        assert openai.calls == 1
+        assert ai_service.stats() == {"in_flight": 0, "coalesced_calls": 4}
+
+    def test_failure_is_shared_as_the_fallback(self, client, openai):
+        openai.delay = 0.05
+        openai.error = RuntimeError("brownout")
+        results = _interpret_concurrently(client, 5)
+
+        assert openai.calls == 1
+        assert len(set(results)) == 1
+        assert results[0] == ai_service._fallback_interpretation("Falling through clouds", ["sky"])
+        assert _count_results(client) == 0
+
+    def test_cancelled_caller_does_not_cancel_the_others(self, client, openai):
+        openai.delay = 0.05
+        results = _interpret_concurrently(client, 3, cancel_first=True)
+
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert results[1:] == [openai.content] * 2
+        assert openai.calls == 1
+        assert _count_results(client) == 1
+
+
+def _create_dream(client, auth_headers, content="Falling through clouds") -> int:
+    response = client.post("/api/dreams/", json={"title": "Clouds", "content": content, "mood": 3, "tags": ["sky"]}, headers=auth_headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+class TestAIJobs:
+    """Tests for queued AI jobs and status polling."""
+
+    def test_interpret_job_saves_the_result_on_the_dream(self, client, auth_headers, openai):
+        dream_id = _create_dream(client, auth_headers)
+        submitted = client.post("/api/ai/jobs", json={"kind": "interpret", "dream_id": dream_id}, headers=auth_headers)
+        assert submitted.status_code == 202
+        assert submitted.json()["status"] in ("pending", "running", "complete")
+
+        client.portal.call(ai_jobs.join)
+        job = client.get(f"/api/ai/jobs/{submitted.json()['id']}", headers=auth_headers).json()
+
+        assert job["status"] == "complete"
+        assert job["result"] == {"dream_id": dream_id, "interpretation": openai.content}
+        dream = client.get(f"/api/dreams/{dream_id}", headers=auth_headers).json()
+        assert dream["ai_interpretation"] == openai.content
+
+    def test_patterns_job(self, client, auth_headers, openai):
+        for content in ("Clouds", "More clouds", "Clouds again"):
+            _create_dream(client, auth_headers, content)
+        openai.content = json.dumps({"recurring_symbols": ["clouds"], "summary": "Flight recurs."})
+        job_id = client.post("/api/ai/jobs", json={"kind": "patterns", "days": 7}, headers=auth_headers).json()["id"]
+
+        client.portal.call(ai_jobs.join)
+        job = client.get(f"/api/ai/jobs/{job_id}", headers=auth_headers).json()
+
+        assert job["status"] == "complete"
+        assert job["params"] == {"days": 7}
+        assert job["result"]["recurring_symbols"] == ["clouds"]
+
+    def test_identical_unfinished_job_is_reused(self, client, auth_headers, openai):
+        openai.delay = 0.2
+        dream_id = _create_dream(client, auth_headers)
+        body = {"kind": "interpret", "dream_id": dream_id}
+        first = client.post("/api/ai/jobs", json=body, headers=auth_headers).json()
+        second = client.post("/api/ai/jobs", json=body, headers=auth_headers).json()
+        client.portal.call(ai_jobs.join)
+
+        assert first["id"] == second["id"]
+        assert openai.calls == 1
+
+    def test_invalid_submissions(self, client, auth_headers):
+        missing = client.post("/api/ai/jobs", json={"kind": "interpret"}, headers=auth_headers)
+        unknown = client.post("/api/ai/jobs", json={"kind": "interpret", "dream_id": 999}, headers=auth_headers)
+        bad_kind = client.post("/api/ai/jobs", json={"kind": "explore"}, headers=auth_headers)
+
+        assert missing.status_code == 400
+        assert unknown.status_code == 404
+        assert bad_kind.status_code == 422
+        assert client.get("/api/ai/jobs/999", headers=auth_headers).status_code == 404
+
+    def test_jobs_run_in_priority_order(self, client, auth_headers, openai):
+        dream_id = _create_dream(client, auth_headers)
+
+        async def run():
+            async with TestingSessionLocal() as db:
+                jobs = [
+                    AIJob(user_id=1, kind="patterns", params={"days": 30}, priority=JOB_PRIORITIES["patterns"]),
+                    AIJob(user_id=1, kind="interpret", params={"dream_id": dream_id}, priority=JOB_PRIORITIES["interpret"]),
+                ]
+                db.add_all(jobs)
+                await db.commit()
+            queue = AIJobQueue(TestingSessionLocal, workers=1)
+            queue.start()
+            for job in jobs:
+                queue.enqueue(job.id, job.priority)
+            await queue.join()
+            await queue.stop()
+            async with TestingSessionLocal() as db:
+                return (await db.scalars(select(AIJob.kind).order_by(AIJob.started_at))).all()
+
+        assert client.portal.call(run) == ["interpret", "patterns"]
+
+    def test_sweep_retries_lost_jobs_and_expires_old_ones(self, client, auth_headers, openai):
+        dream_id = _create_dream(client, auth_headers)
+        now = datetime.now(timezone.utc)
+
+        async def run():
+            async with TestingSessionLocal() as db:
+                lost = AIJob(
+                    user_id=1, kind="interpret", params={"dream_id": dream_id}, priority=0,
+                    status="running", attempts=1, started_at=now - timedelta(hours=1),
+                )
+                old = AIJob(
+                    user_id=1, kind="patterns", params={"days": 30}, priority=10,
+                    status="complete", completed_at=now - timedelta(days=2),
+                )
+                db.add_all([lost, old])
+                await db.commit()
+                await sweep_ai_jobs(db)
+            await ai_jobs.join()
+            async with TestingSessionLocal() as db:
+                return (await db.execute(select(AIJob.kind, AIJob.status, AIJob.attempts))).all()
+
+        assert client.portal.call(run) == [("interpret", "complete", 2)]
@@ -1,64 +1,15 @@
-import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-
-from main import app
-from database import Base, get_db
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-@pytest.fixture
-def client():
-    Base.metadata.create_all(bind=engine)
-    app.dependency_overrides[get_db] = override_get_db
-    with TestClient(app) as c:
-        yield c
-    Base.metadata.drop_all(bind=engine)
-    app.dependency_overrides.clear()
-
-
-@pytest.fixture
-def registered_user(client):
-    """Helper fixture to create a registered user and return credentials."""
-    user_data = {
-        "email": "testuser@example.com",
-        "password": "securepassword123",
-        "name": "Test User"
-    }
-    response = client.post("/api/auth/register", json=user_data)
-    assert response.status_code == 201
-    return user_data
-
-
-@pytest.fixture
-def auth_token(client, registered_user):
-    """Helper fixture to get an auth token for a registered user."""
-    response = client.post(
-        "/api/auth/login",
-        data={
-            "username": registered_user["email"],
-            "password": registered_user["password"]
-        }
-    )
-    assert response.status_code == 200
-    return response.json()["access_token"]
+import io
+import json
+import os
+import zipfile
+
+from starlette.requests import Request
+
+from routers import auth
+from routers.auth import email_throttle, ip_throttle
+from services import account_export
+from services.password_hasher import password_hasher
+from services.principal_cache import principal_cache
 
 
 class TestRegistration:
@@ -422,3 +373,201 @@ class TestEdgeCases:
         
         # All tokens should be valid and non-empty
         assert all(len(t) > 0 for t in tokens)
+
+
+class TestPrincipalCache:
+    """Tests for the verified-principal cache in get_current_user."""
+
+    def test_repeat_requests_hit_cache(self, client, auth_token):
+        """A second request with the same token is served from the cache."""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        client.get("/api/auth/me", headers=headers)
+        hits_before = principal_cache.users.hits
+
+        response = client.get("/api/auth/me", headers=headers)
+
+        assert response.status_code == 200
+        assert principal_cache.users.hits == hits_before + 1
+        assert principal_cache.get_user_id(auth_token) == response.json()["id"]
+
+    def test_update_me_invalidates_cached_user(self, client, auth_token):
+        """Profile updates are visible on the next request."""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        client.get("/api/auth/me", headers=headers)
+
+        response = client.put("/api/auth/me", json={"name": "Renamed"}, headers=headers)
+        assert response.status_code == 200
+
+        response = client.get("/api/auth/me", headers=headers)
+        assert response.json()["name"] == "Renamed"
+
+    def test_change_password_invalidates_cached_user(self, client, registered_user, auth_token):
+        """A changed password is checked against the new hash, not a cached one."""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        response = client.put(
+            "/api/auth/password",
+            json={"current_password": registered_user["password"], "new_password": "newpassword456"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+        response = client.put(
+            "/api/auth/password",
+            json={"current_password": registered_user["password"], "new_password": "another789"},
+            headers=headers,
+        )
+        assert response.status_code == 400
+
+    def test_delete_account_invalidates_token(self, client, registered_user, auth_token):
+        """A deleted account's cached token no longer authenticates."""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        client.get("/api/auth/me", headers=headers)
+
+        response = client.delete(
+            "/api/auth/me", params={"password": registered_user["password"]}, headers=headers
+        )
+        assert response.status_code == 200
+
+        response = client.get("/api/auth/me", headers=headers)
+        assert response.status_code == 401
+
+
+class TestHashingAdmission:
+    """Tests for the bcrypt worker pool and login throttling."""
+
+    def test_saturated_pool_returns_503(self, client, registered_user):
+        """Logins are rejected with 503 when the hashing pool is full."""
+        capacity = password_hasher.capacity
+        password_hasher.capacity = 0
+        try:
+            response = client.post(
+                "/api/auth/login/json",
+                json={"email": registered_user["email"], "password": registered_user["password"]},
+            )
+        finally:
+            password_hasher.capacity = capacity
+
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+
+    def test_repeated_failures_for_email_are_throttled(self, client, registered_user):
+        """Too many failed logins for one email return 429, even with the right password."""
+        for _ in range(email_throttle.max_attempts):
+            response = client.post(
+                "/api/auth/login/json",
+                json={"email": registered_user["email"], "password": "wrongpassword"},
+            )
+            assert response.status_code == 401
+
+        response = client.post(
+            "/api/auth/login/json",
+            json={"email": registered_user["email"], "password": registered_user["password"]},
+        )
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+    def test_successful_login_resets_email_failures(self, client, registered_user):
+        """A successful login clears the failed-attempt count for that email."""
+        for _ in range(email_throttle.max_attempts - 1):
+            client.post(
+                "/api/auth/login/json",
+                json={"email": registered_user["email"], "password": "wrongpassword"},
+            )
+        response = client.post(
+            "/api/auth/login/json",
+            json={"email": registered_user["email"], "password": registered_user["password"]},
+        )
+        assert response.status_code == 200
+        assert email_throttle.retry_after(registered_user["email"]) is None
+
+    def test_successful_logins_do_not_consume_ip_budget(self, client, registered_user):
+        """Only failed attempts count against the per-IP bucket."""
+        for _ in range(ip_throttle.max_attempts + 1):
+            response = client.post(
+                "/api/auth/login/json",
+                json={"email": registered_user["email"], "password": registered_user["password"]},
+            )
+            assert response.status_code == 200
+        assert ip_throttle.retry_after("testclient") is None
+
+    def test_forwarded_for_is_only_honored_from_trusted_proxies(self, monkeypatch):
+        """X-Forwarded-For names the client only when the peer is a trusted proxy."""
+        def request(peer, forwarded):
+            headers = [(b"x-forwarded-for", forwarded.encode())]
+            return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+        chain = "6.6.6.6, 198.51.100.7, 10.0.0.2"
+        assert auth._client_ip(request("10.0.0.1", chain)) == "10.0.0.1"
+
+        monkeypatch.setattr(auth, "trusted_proxies", auth._parse_networks("10.0.0.0/8"))
+        assert auth._client_ip(request("10.0.0.1", chain)) == "198.51.100.7"
+        assert auth._client_ip(request("203.0.113.9", chain)) == "203.0.113.9"
+        assert auth._client_ip(request("10.0.0.1", "")) == "10.0.0.1"
+
+
+async def _run_exports():
+    from tests.conftest import TestingSessionLocal
+
+    async with TestingSessionLocal() as db:
+        return await account_export.run_account_exports(db)
+
+
+class TestAccountExport:
+    """Tests for the streamed and background account exports."""
+
+    def _log_data(self, client, headers):
+        for i in range(3):
+            client.post("/api/dreams/", json={"title": f"Dream {i}", "content": "x", "mood": 3}, headers=headers)
+        client.post("/api/ideas/", json={"title": "Idea", "content": "y"}, headers=headers)
+
+    def test_json_export_keeps_document_shape(self, client, auth_headers):
+        self._log_data(client, auth_headers)
+        response = client.get("/api/auth/export", headers=auth_headers)
+        assert response.status_code == 200
+
+        body = response.json()
+        assert set(body) == {"user", "dreams", "goals", "ideas", "sleep_logs"}
+        assert [d["title"] for d in body["dreams"]] == ["Dream 0", "Dream 1", "Dream 2"]
+        assert len(body["ideas"]) == 1 and body["goals"] == []
+
+    def test_ndjson_and_zip_exports(self, client, auth_headers):
+        self._log_data(client, auth_headers)
+
+        ndjson = client.get("/api/auth/export", params={"format": "ndjson"}, headers=auth_headers)
+        records = [json.loads(line) for line in ndjson.text.splitlines()]
+        assert [r["type"] for r in records] == ["user", "dreams", "dreams", "dreams", "ideas"]
+
+        archive = zipfile.ZipFile(io.BytesIO(
+            client.get("/api/auth/export", params={"format": "zip"}, headers=auth_headers).content
+        ))
+        assert sorted(archive.namelist()) == ["dreams.json", "goals.json", "ideas.json", "sleep_logs.json", "user.json"]
+        assert len(json.loads(archive.read("dreams.json"))) == 3
+
+        assert client.get("/api/auth/export", params={"format": "xml"}, headers=auth_headers).status_code == 400
+
+    def test_background_export_artifact(self, client, auth_headers, tmp_path, monkeypatch):
+        monkeypatch.setattr(account_export.settings, "account_export_dir", str(tmp_path))
+        self._log_data(client, auth_headers)
+
+        job = client.post("/api/auth/export/jobs", params={"format": "ndjson"}, headers=auth_headers)
+        assert job.status_code == 202
+        assert job.json()["status"] == "pending"
+        again = client.post("/api/auth/export/jobs", params={"format": "ndjson"}, headers=auth_headers)
+        assert again.json()["id"] == job.json()["id"]
+
+        download_url = f"/api/auth/export/jobs/{job.json()['id']}/download"
+        assert client.get(download_url, headers=auth_headers).status_code == 409
+
+        assert client.portal.call(_run_exports) == 1
+        status = client.get(f"/api/auth/export/jobs/{job.json()['id']}", headers=auth_headers).json()
+        assert status["status"] == "complete" and status["size_bytes"] > 0
+
+        download = client.get(download_url, headers=auth_headers)
+        assert download.status_code == 200
+        assert len(download.text.splitlines()) == 5
+
+        monkeypatch.setattr(account_export.settings, "account_export_retention_hours", -1)
+        client.portal.call(_run_exports)
+        assert client.get(download_url, headers=auth_headers).status_code == 409
+        assert os.listdir(tmp_path) == []
+
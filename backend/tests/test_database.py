@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, insert, select
+
+import database
+from database import Base, SerializedWriteSession, WriterGate, build_async_engine, build_session_factory
+from models.user import User
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    gate = WriterGate()
+    monkeypatch.setattr(SerializedWriteSession, "gate", gate)
+    return gate
+
+
+def _run(tmp_path, scenario):
+    """Run ``scenario(session_factory)`` against a fresh file database with the production profile."""
+    async def main():
+        engine = build_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'gate.db'}", sqlite_profile=True)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            return await scenario(build_session_factory(engine, serialize_writes=True))
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def _new_user(n: int):
+    return insert(User).values(email=f"user{n}@example.com", password_hash="x")
+
+
+class TestWriterGate:
+    """Tests for the serialized writer used by the SQLite production profile."""
+
+    def test_concurrent_writers_are_serialized(self, tmp_path, gate):
+        """A second writer waits for the first one's transaction to end."""
+        async def scenario(session_factory):
+            order = []
+            first_wrote = asyncio.Event()
+            release_first = asyncio.Event()
+
+            async def first():
+                async with session_factory() as db:
+                    await db.execute(_new_user(1))
+                    first_wrote.set()
+                    await release_first.wait()
+                    await db.commit()
+                    order.append("first committed")
+
+            async def second():
+                await first_wrote.wait()
+                async with session_factory() as db:
+                    db.add(User(email="user2@example.com", password_hash="x"))
+                    await db.commit()
+                    order.append("second committed")
+
+            tasks = [asyncio.create_task(first()), asyncio.create_task(second())]
+            await first_wrote.wait()
+            await asyncio.sleep(0.05)
+            assert gate.lock.locked() and order == []
+            release_first.set()
+            await asyncio.gather(*tasks)
+
+            assert not gate.lock.locked()
+            return order
+
+        assert _run(tmp_path, scenario) == ["first committed", "second committed"]
+
+    def test_gate_is_released_on_rollback_and_on_exception(self, tmp_path, gate):
+        """Rolling back, or leaving the session through an exception, frees the gate."""
+        async def scenario(session_factory):
+            async with session_factory() as db:
+                await db.execute(_new_user(1))
+                assert gate.lock.locked()
+                await db.rollback()
+                assert not gate.lock.locked()
+
+            with pytest.raises(RuntimeError):
+                async with session_factory() as db:
+                    await db.execute(_new_user(2))
+                    raise RuntimeError("handler failed")
+            assert not gate.lock.locked()
+
+            async with session_factory() as db:
+                return await db.scalar(select(func.count(User.id)))
+
+        assert _run(tmp_path, scenario) == 0
+
+    def test_read_only_sessions_do_not_take_the_gate(self, tmp_path, gate):
+        """Reads neither acquire the gate nor wait for a writer holding it."""
+        async def scenario(session_factory):
+            async with session_factory() as writer:
+                await writer.execute(_new_user(1))
+                assert gate.lock.locked()
+
+                async with session_factory() as reader:
+                    count = await asyncio.wait_for(reader.scalar(select(func.count(User.id))), timeout=5)
+                    assert not reader._holds_writer
+                await writer.commit()
+            return count
+
+        assert _run(tmp_path, scenario) == 0
+
+    def test_profile_session_factory_uses_the_gate(self):
+        """Only the serialized factory hands out gated sessions."""
+        engine = database.async_engine
+        assert build_session_factory(engine, serialize_writes=True).class_ is SerializedWriteSession
+        assert build_session_factory(engine).class_ is not SerializedWriteSession
@@ -0,0 +1,105 @@
+class TestDreamLabels:
+    """Tests for the normalized tag/emotion/character/location index."""
+
+    def test_tag_filter_is_exact(self, client, auth_headers):
+        """Filtering by tag does not match tags that merely contain the text."""
+        client.post("/api/dreams/", json={"title": "Beach", "content": "x", "tags": ["sea"]}, headers=auth_headers)
+        client.post("/api/dreams/", json={"title": "Shells", "content": "x", "tags": ["seashell"]}, headers=auth_headers)
+
+        response = client.get("/api/dreams/", params={"tag": "sea"}, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert [d["title"] for d in response.json()] == ["Beach"]
+
+    def test_vocabulary_tracks_updates_and_deletes(self, client, auth_headers):
+        """/tags reflects the current labels of the user's dreams."""
+        dream = client.post(
+            "/api/dreams/",
+            json={"title": "A", "content": "x", "tags": ["sea"], "emotions": ["joy"], "locations": ["beach"]},
+            headers=auth_headers,
+        ).json()
+        client.post("/api/dreams/", json={"title": "B", "content": "x", "tags": ["sea", "storm"]}, headers=auth_headers)
+
+        client.put(f"/api/dreams/{dream['id']}", json={"emotions": ["fear"]}, headers=auth_headers)
+        vocabulary = client.get("/api/dreams/tags", headers=auth_headers).json()
+        assert vocabulary == {
+            "tags": ["sea", "storm"],
+            "emotions": ["fear"],
+            "characters": [],
+            "locations": ["beach"],
+        }
+
+        client.delete(f"/api/dreams/{dream['id']}", headers=auth_headers)
+        vocabulary = client.get("/api/dreams/tags", headers=auth_headers).json()
+        assert vocabulary["emotions"] == []
+        assert vocabulary["locations"] == []
+        assert vocabulary["tags"] == ["sea", "storm"]
+
+    def test_long_tags_sharing_a_prefix_do_not_collide(self, client, auth_headers):
+        """Tags that are equal once cut to the column length are stored as one label."""
+        prefix = "s" * 255
+        response = client.post(
+            "/api/dreams/",
+            json={"title": "Long", "content": "x", "tags": [prefix + "a", prefix + "b"]},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 201
+        assert client.get("/api/dreams/tags", headers=auth_headers).json()["tags"] == [prefix]
+
+
+class TestDreamImport:
+    """Tests for the bulk dream import endpoint."""
+
+    def test_json_import_reports_invalid_rows(self, client, auth_headers):
+        payload = {"dreams": [
+            {"title": "Flying", "content": "over hills", "tags": ["sky"], "mood": 5},
+            {"title": "", "content": "no title"},
+            {"title": "Falling", "content": "down", "mood": 9},
+            {"title": "Sea", "content": "waves", "tags": ["sky", "water"]},
+        ]}
+        response = client.post("/api/dreams/import", json=payload, headers=auth_headers)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["imported"] == 2 and body["failed"] == 2
+        assert [e["row"] for e in body["errors"]] == [2, 3]
+        assert "mood" in body["errors"][1]["message"]
+
+        titles = [d["title"] for d in client.get("/api/dreams/", headers=auth_headers).json()]
+        assert sorted(titles) == ["Flying", "Sea"]
+        tags = client.get("/api/dreams/tags", headers=auth_headers).json()
+        assert tags["tags"] == ["sky", "water"]
+
+    def test_csv_and_ndjson_import_with_goal_check(self, client, auth_headers):
+        goal_id = client.post("/api/goals/", json={"title": "Lucid"}, headers=auth_headers).json()["id"]
+
+        csv_body = (
+            "title,content,tags,goal_id,dream_date\n"
+            f"One,first,a;b,{goal_id},2024-01-02T07:00:00\n"
+            "Two,second,,999,\n"
+        )
+        response = client.post(
+            "/api/dreams/import", content=csv_body, headers={**auth_headers, "Content-Type": "text/csv"}
+        )
+        body = response.json()
+        assert body["imported"] == 1
+        assert body["errors"] == [{"row": 2, "message": "goal_id: Goal not found or does not belong to you"}]
+
+        ndjson = '{"title": "Three", "content": "x"}\nnot json\n'
+        response = client.post(
+            "/api/dreams/import", params={"format": "ndjson"}, content=ndjson, headers=auth_headers
+        )
+        assert response.json()["imported"] == 1
+        assert response.json()["errors"][0]["row"] == 2
+
+        dreams = {d["title"]: d for d in client.get("/api/dreams/", headers=auth_headers).json()}
+        assert dreams["One"]["tags"] == ["a", "b"] and dreams["One"]["goal_id"] == goal_id
+        assert dreams["One"]["dream_date"].startswith("2024-01-02")
+
+    def test_malformed_payload_is_rejected(self, client, auth_headers):
+        response = client.post(
+            "/api/dreams/import", content="{not json", headers={**auth_headers, "Content-Type": "application/json"}
+        )
+        assert response.status_code == 400
+        assert client.post("/api/dreams/import", params={"format": "xml"}, content="", headers=auth_headers).status_code == 400
@@ -0,0 +1,45 @@
+from sqlalchemy import event
+
+from tests.conftest import engine
+
+
+class TestGoalDreamStats:
+    """Tests for linked-dream aggregates on goal responses."""
+
+    def test_goal_list_includes_linked_dream_aggregates(self, client, auth_headers):
+        """dream_count, avg_dream_mood and last_dream_date come from linked dreams."""
+        goal = client.post("/api/goals/", json={"title": "Fly"}, headers=auth_headers).json()
+        client.post("/api/goals/", json={"title": "Empty"}, headers=auth_headers)
+        for mood, day in ((2, "2026-01-01T08:00:00"), (5, "2026-01-03T08:00:00")):
+            client.post(
+                "/api/dreams/",
+                json={"title": "d", "content": "x", "mood": mood, "dream_date": day, "goal_id": goal["id"]},
+                headers=auth_headers,
+            )
+
+        goals = {g["title"]: g for g in client.get("/api/goals/", headers=auth_headers).json()}
+
+        assert goals["Fly"]["dream_count"] == 2
+        assert goals["Fly"]["avg_dream_mood"] == 3.5
+        assert goals["Fly"]["last_dream_date"].startswith("2026-01-03T08:00:00")
+        assert goals["Empty"]["dream_count"] == 0
+        assert goals["Empty"]["avg_dream_mood"] is None
+
+    def test_goal_list_query_count_is_constant(self, client, auth_headers):
+        """Listing goals does not issue one query per goal."""
+        for i in range(5):
+            client.post("/api/goals/", json={"title": f"G{i}"}, headers=auth_headers)
+
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+        try:
+            client.get("/api/goals/", headers=auth_headers)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", count)
+
+        goal_queries = [s for s in statements if "goals" in s or "dreams" in s]
+        assert len(goal_queries) == 2
@@ -0,0 +1,175 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from database import Base
+from migrations import MIGRATIONS, current_version, upgrade
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+BASELINE_SCHEMA = Path(__file__).parent / "baseline_schema.sql"
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    """A database created by the app as it was before versioned migrations, with some data."""
+    path = tmp_path / "baseline.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA.read_text())
+        conn.execute("INSERT INTO users (email, password_hash) VALUES ('a@b.c', 'x')")
+        conn.execute("INSERT INTO dreams (user_id, title, content, tags) VALUES (1, 'Old', 'x', '[\"sea\"]')")
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+
+def _index_names(engine, table: str) -> set[str]:
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+class TestMigrations:
+    """Tests for the startup schema upgrade."""
+
+    def test_fresh_database_is_at_latest_version(self, engine):
+        """A new database gets every table, index and version record."""
+        with engine.begin() as conn:
+            version = upgrade(conn)
+
+        assert version == MIGRATIONS[-1][0]
+        assert "ix_dreams_user_id_dream_date" in _index_names(engine, "dreams")
+
+    def test_baseline_database_upgrades(self, baseline_engine):
+        """A database from before any migration reaches the latest version with every column and index."""
+        with baseline_engine.begin() as conn:
+            version = upgrade(conn)
+
+        assert version == MIGRATIONS[-1][0]
+        inspector = inspect(baseline_engine)
+        for table in Base.metadata.sorted_tables:
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            assert {c.name for c in table.columns} <= columns, table.name
+            assert {i.name for i in table.indexes} <= _index_names(baseline_engine, table.name), table.name
+        assert "ix_dream_research_events_dream_ref" in _index_names(baseline_engine, "dream_research_events")
+
+    def test_baseline_database_gains_purge_markers(self, baseline_engine):
+        """Account deletion and consent purge markers reach existing rows, unset, with their indexes."""
+        with baseline_engine.begin() as conn:
+            conn.execute(text("INSERT INTO research_consent (user_id, status, consent_version) VALUES (1, 'revoked', '1')"))
+        with baseline_engine.begin() as conn:
+            upgrade(conn)
+            deleted_at = conn.execute(text("SELECT deleted_at FROM users")).scalar()
+            purge_status = conn.execute(text("SELECT purge_status FROM research_consent")).scalar()
+
+        assert deleted_at is None and purge_status is None
+        assert "ix_users_deleted_at" in _index_names(baseline_engine, "users")
+        assert "ix_research_consent_purge_status" in _index_names(baseline_engine, "research_consent")
+
+    def test_duplicate_sleep_nights_are_merged(self, baseline_engine, caplog):
+        """A user's nights with the same sleep_time become one row that keeps every field and note."""
+        night = "'2024-01-01 23:00:00.000000', '2024-01-02 07:00:00.000000'"
+        with baseline_engine.begin() as conn:
+            conn.execute(text(
+                f"INSERT INTO sleep_logs (user_id, sleep_time, wake_time, quality, notes, stress_level) "
+                f"VALUES (1, {night}, 2, 'woke at 3', 4)"
+            ))
+            conn.execute(text(
+                f"INSERT INTO sleep_logs (user_id, sleep_time, wake_time, quality, notes) VALUES (1, {night}, 5, 'synced')"
+            ))
+            conn.execute(text(
+                "INSERT INTO sleep_logs (user_id, sleep_time, wake_time, quality) "
+                "VALUES (1, '2024-01-02 23:00:00.000000', '2024-01-03 07:00:00.000000', 3)"
+            ))
+        with baseline_engine.begin() as conn:
+            upgrade(conn)
+            rows = conn.execute(text(
+                "SELECT quality, notes, stress_level FROM sleep_logs ORDER BY sleep_time"
+            )).all()
+
+        assert rows == [(5, "synced\n\nwoke at 3", 4), (3, None, None)]
+        assert "Merged 1 duplicate sleep logs into 1 nights" in caplog.text
+        indexes = {i["name"]: i for i in inspect(baseline_engine).get_indexes("sleep_logs")}
+        assert indexes["ux_sleep_logs_user_id_sleep_time"]["unique"]
+        assert "ix_sleep_logs_user_id_sleep_time" not in indexes
+
+    def test_existing_database_gains_indexes(self, engine):
+        """Indexes missing from a pre-migration database are added."""
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_dreams_user_id_dream_date"))
+            conn.execute(text("DROP INDEX ux_sleep_logs_user_id_sleep_time"))
+
+        with engine.begin() as conn:
+            upgrade(conn)
+
+        assert "ix_dreams_user_id_dream_date" in _index_names(engine, "dreams")
+        assert "ux_sleep_logs_user_id_sleep_time" in _index_names(engine, "sleep_logs")
+
+    def test_upgrade_is_idempotent(self, engine):
+        """Running the upgrade twice applies each migration once."""
+        with engine.begin() as conn:
+            upgrade(conn)
+        with engine.begin() as conn:
+            upgrade(conn)
+            assert current_version(conn) == MIGRATIONS[-1][0]
+            rows = conn.execute(text("SELECT COUNT(*) FROM schema_version")).scalar()
+
+        assert rows == len(MIGRATIONS)
+
+    def test_existing_rows_are_backfilled_into_search_index(self, engine):
+        """Rows written before the search index existed become searchable."""
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn)
+            conn.execute(text("DROP TABLE dreams_fts"))
+            for suffix in ("ai", "ad", "au"):
+                conn.execute(text(f"DROP TRIGGER dreams_fts_{suffix}"))
+            conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('a@b.c', 'x')"))
+            conn.execute(text(
+                "INSERT INTO dreams (user_id, title, content) VALUES (1, 'Old dream', 'A lighthouse at night')"
+            ))
+
+        with engine.begin() as conn:
+            upgrade(conn)
+            hits = conn.execute(text("SELECT rowid FROM dreams_fts WHERE dreams_fts MATCH 'lighthouse'")).all()
+
+        assert hits == [(1,)]
+
+    def test_existing_dreams_are_backfilled_into_labels(self, engine):
+        """Labels of dreams written before dream_labels existed are indexed."""
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn)
+            conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('a@b.c', 'x')"))
+            conn.execute(text(
+                "INSERT INTO dreams (user_id, title, content, tags, emotions) "
+                "VALUES (1, 'Old', 'x', '[\"sea\", \"sea\"]', '[\"joy\"]')"
+            ))
+
+        with engine.begin() as conn:
+            upgrade(conn)
+            labels = conn.execute(text("SELECT kind, value FROM dream_labels ORDER BY kind")).all()
+
+        assert labels == [("emotion", "joy"), ("tag", "sea")]
+
+    def test_existing_tables_gain_new_columns(self, engine):
+        """Nullable model columns missing from an existing table are added."""
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE dream_research_aggregates (id INTEGER PRIMARY KEY, period_type VARCHAR(20) NOT NULL, "
+                "period_start DATE NOT NULL, period_end DATE NOT NULL, sample_size INTEGER NOT NULL, "
+                "emotion_counts JSON, theme_counts JSON, lucid_rate FLOAT, avg_mood FLOAT, "
+                "avg_sleep_quality FLOAT, created_at DATETIME)"
+            ))
+
+        with engine.begin() as conn:
+            upgrade(conn)
+
+        columns = {c["name"] for c in inspect(engine).get_columns("dream_research_aggregates")}
+        assert "group_stats" in columns
+        assert "ux_dream_research_aggregates_period" in _index_names(engine, "dream_research_aggregates")
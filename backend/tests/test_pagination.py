@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+
+def _pages(client, url, headers, params):
+    """Follow X-Next-Cursor until exhausted, returning the ids of every page."""
+    pages = []
+    cursor = None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = client.get(url, params=query, headers=headers)
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+class TestKeysetPagination:
+    """Tests for cursor pagination on list endpoints."""
+
+    def test_cursor_walks_every_dream_once(self, client, auth_headers):
+        """Pages cover all dreams exactly once, including ties on the sort key."""
+        base = datetime(2026, 1, 1)
+        for i in range(7):
+            client.post(
+                "/api/dreams/",
+                json={"title": f"D{i}", "content": "x", "mood": i % 2 + 1,
+                      "dream_date": (base + timedelta(days=i)).isoformat()},
+                headers=auth_headers,
+            )
+
+        for params in ({}, {"sort_by": "mood", "sort_order": "asc"}, {"sort_by": "mood"}):
+            pages = _pages(client, "/api/dreams/", auth_headers, dict(params, limit=3))
+            ids = [i for page in pages for i in page]
+            offset_ids = [d["id"] for d in client.get(
+                "/api/dreams/", params=dict(params, limit=100), headers=auth_headers
+            ).json()]
+            assert ids == offset_ids
+            assert len(set(ids)) == 7
+
+    def test_new_rows_do_not_shift_next_page(self, client, auth_headers):
+        """Rows inserted mid-scroll do not duplicate entries on the next page."""
+        for i in range(4):
+            client.post("/api/ideas/", json={"content": f"idea {i}"}, headers=auth_headers)
+
+        first = client.get("/api/ideas/", params={"limit": 2}, headers=auth_headers)
+        client.post("/api/ideas/", json={"content": "newest"}, headers=auth_headers)
+        second = client.get(
+            "/api/ideas/",
+            params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]},
+            headers=auth_headers,
+        )
+
+        seen = {i["id"] for i in first.json()}
+        assert seen.isdisjoint(i["id"] for i in second.json())
+        assert len(second.json()) == 2
+
+    def test_cursor_with_null_sort_values(self, client, auth_headers):
+        """Rows whose sort key is NULL are still reached by the cursor."""
+        start = datetime(2026, 1, 1, 23, 0)
+        for i in range(3):
+            client.post(
+                "/api/sleep/",
+                json={"sleep_time": (start + timedelta(days=i)).isoformat(),
+                      "wake_time": (start + timedelta(days=i, hours=8)).isoformat()},
+                headers=auth_headers,
+            )
+
+        for order in ("asc", "desc"):
+            pages = _pages(client, "/api/sleep/", auth_headers,
+                           {"limit": 1, "sort_by": "duration", "sort_order": order})
+            assert len({i for page in pages for i in page}) == 3
+
+    def test_cursor_rejected_for_other_sort(self, client, auth_headers):
+        """A cursor only works with the ordering it was issued for."""
+        for i in range(2):
+            client.post("/api/goals/", json={"title": f"G{i}"}, headers=auth_headers)
+        cursor = client.get("/api/goals/", params={"limit": 1}, headers=auth_headers).headers["X-Next-Cursor"]
+
+        assert client.get("/api/goals/", params={"cursor": cursor, "sort_by": "priority"},
+                          headers=auth_headers).status_code == 400
+        assert client.get("/api/goals/", params={"cursor": "not-a-cursor"},
+                          headers=auth_headers).status_code == 400
+        assert client.get("/api/goals/", params={"cursor": cursor}, headers=auth_headers).status_code == 200
@@ -0,0 +1,621 @@
+import csv
+import io
+from datetime import date, datetime, timedelta, timezone
+
+import pyarrow as pa
+import pytest
+import pyarrow.parquet as pq
+from sqlalchemy import func, select, update
+
+from models.dream import Dream
+from models.dream_research_event import DreamResearchEvent
+from models.goal import Goal
+from models.research_consent import ResearchConsent
+from models.research_backfill import ResearchBackfill
+from models.research_outbox import ResearchOutbox
+from models.user import User
+from routers.research import CURRENT_CONSENT_VERSION
+from services import research_backfill, research_cube, research_extraction
+from services import research_store as research_store_module
+from services.purge import run_purges
+from services.research_backfill import run_backfills
+from services.research_extraction import drain_all, extract_events
+from services.research_export import EXPORT_COLUMNS
+from services.research_rollup import refresh_rollups
+from services.research_store import research_store
+from tests.conftest import TestingSessionLocal
+
+
+async def _drain():
+    async with TestingSessionLocal() as db:
+        return await drain_all(db)
+
+
+async def _refresh():
+    async with TestingSessionLocal() as db:
+        await drain_all(db)
+        return await refresh_rollups(db)
+
+
+async def _purge():
+    async with TestingSessionLocal() as db:
+        await run_purges(db)
+
+
+async def _backfill():
+    async with TestingSessionLocal() as db:
+        return await run_backfills(db)
+
+
+async def _events():
+    async with TestingSessionLocal() as db:
+        return (await db.scalars(select(DreamResearchEvent))).all()
+
+
+async def _load_store():
+    async with TestingSessionLocal() as db:
+        await drain_all(db)
+        return await research_store.refresh(db)
+
+
+async def _sql_cells(dimensions, filters):
+    async with TestingSessionLocal() as db:
+        return await research_cube._finest_cells(db, dimensions, filters)
+
+
+async def _seed_contributors(region, count, hours_ago=2, consent_version=CURRENT_CONSENT_VERSION):
+    """``count`` consenting users in ``region``, one event each, created ``hours_ago``."""
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=hours_ago)
+    async with TestingSessionLocal() as db:
+        for _ in range(count):
+            user = User(email=f"{region}-{hours_ago}-{datetime.now().timestamp()}@example.com", password_hash="x")
+            db.add(user)
+            await db.flush()
+            consent = ResearchConsent(user_id=user.id, status="active", consent_version=consent_version)
+            db.add(consent)
+            await db.flush()
+            db.add(DreamResearchEvent(
+                consent_id=consent.id, dream_ref="secret-ref", dream_type="normal", mood_score=3,
+                age_bracket="25-34", region=region, created_at=created_at,
+            ))
+        await db.commit()
+
+
+async def _age_events(age):
+    """Extract pending events and backdate those created in the last minute by ``age``."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    async with TestingSessionLocal() as db:
+        await drain_all(db)
+        await db.execute(
+            update(DreamResearchEvent)
+            .filter(DreamResearchEvent.created_at > now - timedelta(minutes=1))
+            .values(created_at=now - age)
+        )
+        await db.commit()
+
+
+async def _backfill_count():
+    async with TestingSessionLocal() as db:
+        return await db.scalar(select(func.count(ResearchBackfill.id)))
+
+
+async def _outbox_size():
+    async with TestingSessionLocal() as db:
+        return await db.scalar(select(func.count(ResearchOutbox.id)))
+
+
+async def _seed_events(*batches):
+    """One consenting user with ``count`` events of ``dream_type`` on ``day`` for each batch."""
+    async with TestingSessionLocal() as db:
+        user = User(email=f"seed-{datetime.now().timestamp()}@example.com", password_hash="x")
+        db.add(user)
+        await db.flush()
+        consent = ResearchConsent(user_id=user.id, status="active")
+        db.add(consent)
+        await db.flush()
+        for day, dream_type, count in batches:
+            db.add_all(
+                DreamResearchEvent(
+                    consent_id=consent.id, dream_ref="secret-ref", dream_type=dream_type,
+                    created_at=datetime.combine(day, datetime.min.time()) + timedelta(hours=12),
+                )
+                for _ in range(count)
+            )
+        await db.commit()
+
+
+def _grant(client, headers):
+    response = client.post(
+        "/api/research/consent/grant",
+        json={"consent_version": CURRENT_CONSENT_VERSION, "data_categories": ["dream_types"]},
+        headers=headers,
+    )
+    assert response.status_code == 201
+
+
+def _log_dreams(client, headers, dream_type, count):
+    for i in range(count):
+        client.post(
+            "/api/dreams/",
+            json={"title": f"{dream_type} {i}", "content": "x", "mood": 4, "dream_type": dream_type},
+            headers=headers,
+        )
+
+
+class TestResearchRollups:
+    """Tests for the pre-aggregated research dashboard."""
+
+    def test_aggregate_served_from_rollups_with_k_anonymity(self, client, auth_headers):
+        """Groups under the threshold are suppressed when the rollup is written."""
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 6)
+        _log_dreams(client, auth_headers, "nightmare", 2)
+        _log_dreams(client, auth_headers, "daydream", 4)
+
+        assert client.get("/api/research/aggregate").json()["total_events"] == 0
+
+        assert client.portal.call(_refresh) == 3  # one daily, weekly and monthly row
+
+        body = client.get("/api/research/aggregate", params={"group_by": "dream_type"}).json()
+        assert body["total_events"] == 12
+        assert body["suppressed_groups"] == 2
+        assert body["groups"] == [{"key": "normal", "count": 6, "avg_mood": 4.0, "avg_vividness": 3.0}]
+
+        daily = client.get("/api/research/aggregate", params={"period_type": "daily"}).json()
+        assert daily["period_type"] == "daily"
+        assert len(daily["periods"]) == 1
+        assert daily["periods"][0]["sample_size"] == 12
+        assert daily["periods"][0]["lucid_rate"] == 0.0
+
+    def test_revocation_removes_rollups_on_next_refresh(self, client, auth_headers):
+        """Days of revoked events are recomputed, dropping periods below the threshold."""
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 5)
+        client.portal.call(_refresh)
+        assert client.get("/api/research/aggregate").json()["total_events"] == 5
+
+        client.post("/api/research/consent/revoke", json={}, headers=auth_headers)
+        client.portal.call(_purge)
+        client.portal.call(_refresh)
+
+        body = client.get("/api/research/aggregate").json()
+        assert body["total_events"] == 0
+        assert body["groups"] == []
+
+    def test_complementary_group_is_suppressed(self, client):
+        """A lone small group would be the period total minus the published ones."""
+        day = date(2025, 6, 10)
+        client.portal.call(_seed_events, (day, "normal", 10), (day, "lucid", 6), (day, "nightmare", 3))
+        client.portal.call(_refresh)
+
+        body = client.get("/api/research/aggregate", params={"group_by": "dream_type"}).json()
+        assert body["total_events"] == 19
+        assert body["groups"] == [{"key": "normal", "count": 10, "avg_mood": None, "avg_vividness": None}]
+        assert body["suppressed_groups"] == 2
+
+        daily = client.get("/api/research/aggregate", params={"period_type": "daily"}).json()
+        assert daily["periods"][0]["sample_size"] == 19
+        assert daily["periods"][0]["groups"] == []
+
+    def test_small_day_is_not_recoverable_from_coarser_periods(self, client):
+        """June 1st 2025 is the Sunday of a week that began in May.
+
+        Its 3 events would be the June total minus the next week's, so that
+        week-in-month fragment's week and month are withheld with it.
+        """
+        client.portal.call(
+            _seed_events,
+            (date(2025, 5, 28), "normal", 10),
+            (date(2025, 6, 1), "normal", 3),
+            (date(2025, 6, 2), "normal", 10),
+        )
+        client.portal.call(_refresh)
+
+        def starts(period_type):
+            body = client.get("/api/research/aggregate", params={"period_type": period_type}).json()
+            return {p["period_start"]: p["sample_size"] for p in body["periods"]}
+
+        assert starts("daily") == {"2025-05-28": 10, "2025-06-02": 10}
+        assert starts("weekly") == {"2025-06-02": 10}
+        assert starts("monthly") == {"2025-05-01": 10}
+
+    def test_withheld_days_in_a_fragment_reach_the_threshold(self, client):
+        """A small day is withheld together with the smallest other day of its fragment."""
+        client.portal.call(
+            _seed_events,
+            (date(2025, 6, 10), "normal", 2),
+            (date(2025, 6, 11), "normal", 6),
+            (date(2025, 6, 12), "normal", 20),
+        )
+        client.portal.call(_refresh)
+
+        daily = client.get("/api/research/aggregate", params={"period_type": "daily"}).json()
+        assert [p["period_start"] for p in daily["periods"]] == ["2025-06-12"]
+        weekly = client.get("/api/research/aggregate", params={"period_type": "weekly"}).json()
+        assert weekly["periods"][0]["sample_size"] == 28
+
+    def test_invalid_period_type_rejected(self, client):
+        response = client.get("/api/research/aggregate", params={"period_type": "hourly"})
+        assert response.status_code == 400
+
+
+class TestResearchOutbox:
+    """Tests for outbox-driven research extraction."""
+
+    def test_dream_create_queues_extraction(self, client, auth_headers):
+        """The event is written by the worker, not the request."""
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "lucid", 1)
+
+        assert client.portal.call(_outbox_size) == 1
+        assert client.portal.call(_events) == []
+
+        assert client.portal.call(_drain) == 1
+        events = client.portal.call(_events)
+        assert [e.dream_type for e in events] == ["lucid"]
+        assert client.portal.call(_outbox_size) == 0
+
+    def test_bulk_import_queues_extraction(self, client, auth_headers):
+        """Imported dreams bypass the mapper hooks but are still queued."""
+        _grant(client, auth_headers)
+        dreams = [{"title": f"d{i}", "content": "x", "dream_type": "nightmare"} for i in range(3)]
+        client.post("/api/dreams/import", json=dreams, headers=auth_headers)
+
+        assert client.portal.call(_outbox_size) == 3
+        client.portal.call(_drain)
+        assert [e.dream_type for e in client.portal.call(_events)] == ["nightmare"] * 3
+
+    def test_dream_update_replaces_event(self, client, auth_headers):
+        """Editing a research field re-extracts instead of adding an event."""
+        _grant(client, auth_headers)
+        dream = client.post(
+            "/api/dreams/", json={"title": "d", "content": "x", "emotions": ["joy"]}, headers=auth_headers
+        ).json()
+        client.portal.call(_drain)
+
+        client.put(f"/api/dreams/{dream['id']}", json={"emotions": ["fear"]}, headers=auth_headers)
+        client.put(f"/api/dreams/{dream['id']}", json={"title": "renamed"}, headers=auth_headers)
+        assert client.portal.call(_outbox_size) == 1
+        client.portal.call(_drain)
+
+        assert [e.emotion for e in client.portal.call(_events)] == ["fear"]
+
+    def test_no_event_without_consent(self, client, auth_headers):
+        """Queued dreams of users without active consent are discarded."""
+        _log_dreams(client, auth_headers, "normal", 2)
+
+        assert client.portal.call(_drain) == 2
+        assert client.portal.call(_events) == []
+
+    def test_revocation_during_drain_writes_no_events(self, client, auth_headers, monkeypatch):
+        """A revocation committed after the drain read the consent still keeps its events out."""
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 2)
+
+        async def extract_then_revoke(db, dreams):
+            events = await extract_events(db, dreams)
+            await db.execute(update(ResearchConsent).values(status="revoked"))
+            await db.commit()
+            return events
+
+        monkeypatch.setattr(research_extraction, "extract_events", extract_then_revoke)
+        assert client.portal.call(_drain) == 2
+        assert client.portal.call(_events) == []
+        assert client.portal.call(_outbox_size) == 0
+
+
+class TestResearchPurge:
+    """Tests for background deletion after revocation and account deletion."""
+
+    def test_revocation_purges_in_background(self, client, auth_headers):
+        """Revoking returns immediately with a pending purge that the job completes."""
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 3)
+        client.portal.call(_drain)
+
+        revoked = client.post("/api/research/consent/revoke", json={}, headers=auth_headers).json()
+        assert revoked["status"] == "revoked"
+        assert revoked["purge_status"] == "pending"
+        assert len(client.portal.call(_events)) == 3
+
+        regrant = client.post(
+            "/api/research/consent/grant",
+            json={"consent_version": CURRENT_CONSENT_VERSION, "data_categories": []},
+            headers=auth_headers,
+        )
+        assert regrant.status_code == 409
+        assert client.portal.call(_backfill_count) == 1
+
+        client.portal.call(_purge)
+        assert client.portal.call(_events) == []
+        assert client.portal.call(_backfill_count) == 0
+        status = client.get("/api/research/consent/status", headers=auth_headers).json()
+        assert status["purge_status"] == "complete"
+        _grant(client, auth_headers)
+
+    def test_account_deletion_purges_all_data(self, client, registered_user, auth_headers):
+        """Deleting an account with research consent frees the email and purges its rows."""
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 2)
+        client.post("/api/goals/", json={"title": "G"}, headers=auth_headers)
+        client.portal.call(_drain)
+
+        response = client.delete(
+            "/api/auth/me", params={"password": registered_user["password"]}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert client.post("/api/auth/register", json=registered_user).status_code == 201
+
+        client.portal.call(_purge)
+
+        async def remaining():
+            async with TestingSessionLocal() as db:
+                return {
+                    model.__tablename__: await db.scalar(select(func.count()).select_from(model))
+                    for model in (Dream, Goal, DreamResearchEvent, ResearchConsent, ResearchBackfill, User)
+                }
+
+        assert client.portal.call(remaining) == {
+            "dreams": 0, "goals": 0, "dream_research_events": 0, "research_consent": 0,
+            "research_backfills": 0, "users": 1,
+        }
+
+
+class TestResearchBackfill:
+    """Tests for extracting events from dreams written before consent."""
+
+    def test_grant_backfills_existing_dreams(self, client, auth_headers, monkeypatch):
+        """Existing dreams are extracted in batches and progress is reported."""
+        monkeypatch.setattr(research_backfill.settings, "research_backfill_batch_size", 2)
+        monkeypatch.setattr(research_backfill.settings, "research_backfill_batch_delay_seconds", 0)
+        _log_dreams(client, auth_headers, "normal", 5)
+        client.portal.call(_drain)
+        assert client.portal.call(_events) == []
+
+        _grant(client, auth_headers)
+        assert client.get("/api/research/consent/backfill", headers=auth_headers).json()["status"] == "pending"
+
+        assert client.portal.call(_backfill) == 1
+        progress = client.get("/api/research/consent/backfill", headers=auth_headers).json()
+        assert progress["status"] == "complete"
+        assert progress["processed"] == progress["total"] == 5
+        assert progress["events_written"] == 5
+        assert len(client.portal.call(_events)) == 5
+
+    def test_backfill_resumes_and_does_not_duplicate(self, client, auth_headers, monkeypatch):
+        """A partially run backfill continues where it stopped; reruns replace events."""
+        monkeypatch.setattr(research_backfill.settings, "research_backfill_batch_size", 2)
+        monkeypatch.setattr(research_backfill.settings, "research_backfill_batch_delay_seconds", 0)
+        _log_dreams(client, auth_headers, "normal", 3)
+        _grant(client, auth_headers)
+
+        async def one_batch():
+            async with TestingSessionLocal() as db:
+                backfill = await db.scalar(select(ResearchBackfill))
+                await research_backfill.run_backfill_batch(db, backfill)
+
+        client.portal.call(one_batch)
+        assert len(client.portal.call(_events)) == 2
+        client.portal.call(_backfill)
+        assert len(client.portal.call(_events)) == 3
+
+        async def rerun_everyone():
+            async with TestingSessionLocal() as db:
+                research_backfill.start_backfill(db)
+                await db.commit()
+                await run_backfills(db)
+
+        client.portal.call(rerun_everyone)
+        assert len(client.portal.call(_events)) == 3
+
+
+class TestResearchCube:
+    """Tests for the multi-dimensional research cube."""
+
+    def test_complementary_suppression(self):
+        """A lone small cell cannot be recovered from its parent and siblings."""
+        finest = {("EU", "normal"): [20, 0, 0, 0, 0], ("EU", "lucid"): [2, 0, 0, 0, 0],
+                  ("US", "normal"): [9, 0, 0, 0, 0], ("US", "lucid"): [8, 0, 0, 0, 0]}
+        cube = research_cube._roll_up(finest, 2)
+
+        suppressed = research_cube.suppress(cube, 2)
+
+        assert ("EU", "lucid") in suppressed
+        # EU total (22) minus EU/normal would reveal EU/lucid, so EU/normal goes too,
+        # and the lucid column then needs a second hidden cell as well.
+        assert ("EU", "normal") in suppressed
+        assert ("US", "lucid") in suppressed
+        for (parent, _), children in research_cube._sibling_groups(cube, 2).items():
+            if parent not in suppressed:
+                hidden = sum(cube[c][0] for c in children if c in suppressed)
+                assert hidden == 0 or hidden >= 5
+
+    def test_cube_endpoint_returns_every_grouping_set(self, client, auth_headers):
+        """All levels come back from one request, with small and complementary cells withheld."""
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 6)
+        _log_dreams(client, auth_headers, "nightmare", 2)
+        client.portal.call(_drain)
+
+        body = client.get("/api/research/cube", params={"dimensions": "dream_type,is_lucid"}).json()
+
+        cells = {tuple(c["dimensions"].values()): c["count"] for c in body["cells"]}
+        assert body["total_events"] == 8
+        # The 2 nightmares are withheld; publishing the 6 normal dreams next to
+        # the total of 8 would reveal them, so those cells are withheld too.
+        assert cells == {("*", "*"): 8, ("*", "False"): 8}
+        assert body["suppressed_cells"] == 4
+
+    def test_cube_rejects_bad_dimensions(self, client):
+        assert client.get("/api/research/cube", params={"dimensions": "email"}).status_code == 400
+        assert client.get(
+            "/api/research/cube", params={"dimensions": "region,region"}
+        ).status_code == 400
+        assert client.get(
+            "/api/research/cube", params={"dimensions": "region,age_bracket,month,theme"}
+        ).status_code == 400
+
+
+class TestResearchStore:
+    """Tests for the in-memory columnar research event store."""
+
+    def test_store_cells_match_sql(self, client, auth_headers, monkeypatch):
+        monkeypatch.setattr(research_store_module, "LOAD_BATCH_SIZE", 2)
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 4)
+        _log_dreams(client, auth_headers, "lucid", 3)
+        assert client.portal.call(_load_store) == 7
+
+        for dimensions, filters in [
+            (["dream_type"], {}),
+            (["dream_type", "is_lucid", "region"], {}),
+            (["month"], {"dream_type": ["lucid", "missing"]}),
+            (["dream_type"], {"region": ["unknown"]}),
+        ]:
+            expected = client.portal.call(_sql_cells, dimensions, filters)
+            assert research_store.cells(dimensions, filters) == expected
+
+    def test_refresh_appends_new_events_and_rebuilds_after_purge(self, client, auth_headers):
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 3)
+        assert client.portal.call(_load_store) == 3
+
+        _log_dreams(client, auth_headers, "normal", 2)
+        assert client.portal.call(_load_store) == 5
+        assert research_store.cells(["dream_type"]) == {("normal",): [5, 20, 5, 15, 5]}
+
+        client.post("/api/research/consent/revoke", json={}, headers=auth_headers)
+        client.portal.call(_purge)
+        assert client.portal.call(_load_store) == 0
+        assert research_store.cells(["dream_type"]) == {}
+
+    def test_revoked_events_are_left_out_before_the_purge(self, client, auth_headers):
+        """Store, cube and rollups drop a revoked consent's events before the purge deletes them."""
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 5)
+        client.portal.call(_refresh)
+        assert client.portal.call(_load_store) == 5
+        assert client.get("/api/research/aggregate").json()["total_events"] == 5
+
+        client.post("/api/research/consent/revoke", json={}, headers=auth_headers)
+        assert len(client.portal.call(_events)) == 5
+        assert client.portal.call(_load_store) == 0
+        assert client.portal.call(_sql_cells, ["dream_type"], {}) == {}
+        client.portal.call(_refresh)
+        assert client.get("/api/research/aggregate").json()["total_events"] == 0
+
+    def test_refresh_extends_without_rebuilding_or_touching_the_previous_snapshot(self, client, auth_headers):
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 3)
+        client.portal.call(_load_store)
+        previous, loaded_at = research_store._snapshot, research_store._loaded_at
+
+        _log_dreams(client, auth_headers, "nightmare", 2)
+        assert client.portal.call(_load_store) == 5
+
+        assert research_store._loaded_at == loaded_at
+        assert research_store.cells(["dream_type"]) == {("normal",): [3, 12, 3, 9, 3], ("nightmare",): [2, 8, 2, 6, 2]}
+        assert previous.dictionaries["dream_type"].values == ["normal"]
+        assert len(previous) == 3
+
+    def test_late_event_with_older_timestamp_triggers_a_rebuild(self, client, auth_headers):
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 3)
+        client.portal.call(_load_store)
+
+        client.portal.call(_seed_events, (date(2020, 1, 1), "lucid", 1))
+        assert client.portal.call(_load_store) == 4
+        assert research_store.cells(["dream_type"])[("lucid",)][0] == 1
+
+    def test_cube_filters_served_from_store(self, client, auth_headers):
+        _grant(client, auth_headers)
+        _log_dreams(client, auth_headers, "normal", 6)
+        _log_dreams(client, auth_headers, "nightmare", 5)
+        client.portal.call(_load_store)
+
+        body = client.get(
+            "/api/research/cube",
+            params={"dimensions": "is_lucid", "filter": ["dream_type:nightmare"]},
+        ).json()
+        assert body["filters"] == {"dream_type": ["nightmare"]}
+        assert body["total_events"] == 5
+        assert client.get(
+            "/api/research/cube", params={"dimensions": "region", "filter": ["email:x"]}
+        ).status_code == 400
+
+
+class TestResearchExport:
+    """Tests for the streaming partner export."""
+
+    TOKEN = {"X-Research-Export-Token": "partner-secret"}
+
+    @pytest.fixture(autouse=True)
+    def export_token(self, monkeypatch):
+        from routers.research import settings
+        monkeypatch.setattr(settings, "research_export_token", "partner-secret")
+
+    def test_export_requires_token(self, client, monkeypatch):
+        assert client.get("/api/research/export").status_code == 401
+        assert client.get("/api/research/export", headers={"X-Research-Export-Token": "nope"}).status_code == 401
+
+        from routers.research import settings
+        monkeypatch.setattr(settings, "research_export_token", "")
+        assert client.get("/api/research/export", headers=self.TOKEN).status_code == 403
+
+    def test_csv_export_blanks_rare_quasi_identifiers(self, client):
+        client.portal.call(_seed_contributors, "north", 5)
+        client.portal.call(_seed_contributors, "south", 1)
+
+        response = client.get("/api/research/export", headers=self.TOKEN)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+
+        assert list(rows[0]) == list(EXPORT_COLUMNS)
+        assert "secret-ref" not in response.text
+        assert sorted(r["region"] for r in rows) == ["", "north", "north", "north", "north", "north"]
+        assert [r["age_bracket"] for r in rows if not r["region"]] == [""]
+
+    def test_columnar_export_with_watermark(self, client):
+        client.portal.call(_seed_contributors, "north", 5, 2)
+        client.portal.call(_seed_contributors, "north", 1, 1)
+
+        arrow = client.get("/api/research/export", params={"format": "arrow"}, headers=self.TOKEN)
+        table = pa.ipc.open_stream(arrow.content).read_all()
+        assert table.num_rows == 6
+        assert table.schema.names == list(EXPORT_COLUMNS)
+
+        since = (datetime.now(timezone.utc) - timedelta(minutes=90)).isoformat()
+        parquet = client.get("/api/research/export", params={"format": "parquet", "since": since}, headers=self.TOKEN)
+        assert pq.read_table(io.BytesIO(parquet.content)).num_rows == 1
+
+        watermark = arrow.headers["X-Export-Watermark"]
+        later = client.get("/api/research/export", params={"format": "arrow", "since": watermark}, headers=self.TOKEN)
+        assert pa.ipc.open_stream(later.content).read_all().num_rows == 0
+
+    def test_consents_under_earlier_terms_are_not_exported(self, client):
+        """Consent text 1.0 did not disclose event-level export."""
+        client.portal.call(_seed_contributors, "north", 5)
+        client.portal.call(_seed_contributors, "north", 3, 2, "1.0")
+
+        response = client.get("/api/research/export", headers=self.TOKEN)
+        assert len(list(csv.DictReader(io.StringIO(response.text)))) == 5
+
+    def test_edited_dream_keeps_its_event_key(self, client, auth_headers):
+        _grant(client, auth_headers)
+        dream_id = client.post(
+            "/api/dreams/", json={"title": "Sea", "content": "x", "dream_type": "normal"}, headers=auth_headers
+        ).json()["id"]
+        client.portal.call(_age_events, timedelta(hours=2))
+        first = list(csv.DictReader(io.StringIO(client.get("/api/research/export", headers=self.TOKEN).text)))
+
+        client.put(f"/api/dreams/{dream_id}", json={"dream_type": "nightmare"}, headers=auth_headers)
+        client.portal.call(_age_events, timedelta(hours=1))
+        since = (datetime.now(timezone.utc) - timedelta(minutes=90)).isoformat()
+        response = client.get("/api/research/export", params={"since": since}, headers=self.TOKEN)
+        second = list(csv.DictReader(io.StringIO(response.text)))
+
+        assert [r["dream_type"] for r in first + second] == ["normal", "nightmare"]
+        assert first[0]["event_key"] == second[0]["event_key"]
+        assert len(first[0]["event_key"]) == 64
+        assert first[0]["event_key"] not in {e.dream_ref for e in client.portal.call(_events)}
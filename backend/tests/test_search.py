@@ -0,0 +1,65 @@
+class TestSearch:
+    """Tests for the full-text search index and /api/search."""
+
+    def _create_entries(self, client, headers):
+        client.post("/api/dreams/", json={"title": "Ocean voyage", "content": "Sailing across a stormy ocean"}, headers=headers)
+        client.post("/api/dreams/", json={"title": "Forest", "content": "Walking among tall trees"}, headers=headers)
+        client.post("/api/goals/", json={"title": "Learn sailing", "description": "Take lessons at the marina"}, headers=headers)
+        client.post("/api/ideas/", json={"content": "Write a story about a sailing trip"}, headers=headers)
+
+    def test_list_q_uses_word_matching(self, client, auth_headers):
+        """q matches whole words and prefixes, with stemming."""
+        self._create_entries(client, auth_headers)
+
+        response = client.get("/api/dreams/", params={"q": "sail"}, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert [d["title"] for d in response.json()] == ["Ocean voyage"]
+
+    def test_index_follows_updates_and_deletes(self, client, auth_headers):
+        """Edited and deleted entries are reflected in search results."""
+        self._create_entries(client, auth_headers)
+        dreams = client.get("/api/dreams/", params={"q": "forest"}, headers=auth_headers).json()
+        dream_id = dreams[0]["id"]
+
+        client.put(f"/api/dreams/{dream_id}", json={"title": "Jungle"}, headers=auth_headers)
+        assert client.get("/api/dreams/", params={"q": "forest"}, headers=auth_headers).json() == []
+        assert len(client.get("/api/dreams/", params={"q": "jungle"}, headers=auth_headers).json()) == 1
+
+        client.delete(f"/api/dreams/{dream_id}", headers=auth_headers)
+        assert client.get("/api/dreams/", params={"q": "jungle"}, headers=auth_headers).json() == []
+
+    def test_unified_search_ranks_across_types(self, client, auth_headers):
+        """Hits from every entity type are returned with highlighted snippets."""
+        self._create_entries(client, auth_headers)
+
+        response = client.get("/api/search/", params={"q": "sailing"}, headers=auth_headers)
+
+        assert response.status_code == 200
+        hits = response.json()["hits"]
+        assert {h["entity_type"] for h in hits} == {"dream", "goal", "idea"}
+        assert all("<mark>" in h["snippet"] for h in hits)
+        assert [h["rank"] for h in hits] == sorted(h["rank"] for h in hits)
+
+    def test_search_type_filter_and_validation(self, client, auth_headers):
+        """types narrows the entity types; unknown types are rejected."""
+        self._create_entries(client, auth_headers)
+
+        response = client.get("/api/search/", params={"q": "sailing", "types": "idea"}, headers=auth_headers)
+        assert [h["entity_type"] for h in response.json()["hits"]] == ["idea"]
+
+        response = client.get("/api/search/", params={"q": "sailing", "types": "photos"}, headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_search_is_scoped_to_user(self, client, auth_headers):
+        """Other users' entries never appear in results."""
+        self._create_entries(client, auth_headers)
+        client.post("/api/auth/register", json={"email": "other@example.com", "password": "password123"})
+        token = client.post(
+            "/api/auth/login/json", json={"email": "other@example.com", "password": "password123"}
+        ).json()["access_token"]
+
+        response = client.get(
+            "/api/search/", params={"q": "sailing"}, headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.json()["hits"] == []
@@ -0,0 +1,186 @@
+import time
+from datetime import datetime, timedelta
+
+
+def _nights(count, start=datetime(2024, 1, 1, 23, 0)):
+    return [
+        {
+            "sleep_time": (start + timedelta(days=i)).isoformat(),
+            "wake_time": (start + timedelta(days=i, hours=7, minutes=30)).isoformat(),
+            "quality": 4,
+        }
+        for i in range(count)
+    ]
+
+
+class TestSleepImport:
+    """Tests for bulk wearable sleep ingestion."""
+
+    def test_year_of_nights_in_one_request(self, client, auth_headers):
+        started = time.perf_counter()
+        response = client.post("/api/sleep/import", json=_nights(365), headers=auth_headers)
+        elapsed = time.perf_counter() - started
+
+        assert response.status_code == 200
+        assert response.json() == {"inserted": 365, "updated": 0, "failed": 0, "errors": []}
+        assert elapsed < 5  # generous bound for slow CI; typically well under a second
+
+        logs = client.get("/api/sleep/", params={"limit": 1}, headers=auth_headers).json()
+        assert logs[0]["sleep_duration_minutes"] == 450
+
+    def test_resync_updates_instead_of_duplicating(self, client, auth_headers):
+        client.post("/api/sleep/import", json=_nights(3), headers=auth_headers)
+        client.post(
+            "/api/sleep/",
+            json={"sleep_time": "2024-02-01T23:00:00", "wake_time": "2024-02-02T06:00:00", "notes": "manual"},
+            headers=auth_headers,
+        )
+
+        resync = _nights(4)
+        resync[0]["quality"] = 2
+        resync.append({"sleep_time": "2024-02-01T23:00:00Z", "wake_time": "2024-02-02T06:30:00Z"})
+        body = client.post("/api/sleep/import", json={"sleep_logs": resync}, headers=auth_headers).json()
+        assert (body["inserted"], body["updated"]) == (1, 4)
+
+        logs = client.get("/api/sleep/", params={"sort_order": "asc"}, headers=auth_headers).json()
+        assert len(logs) == 5
+        assert logs[0]["quality"] == 2
+        assert logs[-1]["notes"] == "manual" and logs[-1]["sleep_duration_minutes"] == 450
+
+    def test_single_night_is_stored_in_utc_and_matches_imports(self, client, auth_headers):
+        created = client.post(
+            "/api/sleep/",
+            json={"sleep_time": "2024-02-01T23:00:00+02:00", "wake_time": "2024-02-02T07:00:00+02:00"},
+            headers=auth_headers,
+        )
+        assert created.status_code == 201
+        assert created.json()["sleep_time"].startswith("2024-02-01T21:00:00")
+
+        body = client.post(
+            "/api/sleep/import",
+            json=[{"sleep_time": "2024-02-01T21:00:00Z", "wake_time": "2024-02-02T05:00:00Z", "quality": 5}],
+            headers=auth_headers,
+        ).json()
+        assert (body["inserted"], body["updated"]) == (0, 1)
+
+        listed = client.get(
+            "/api/sleep/", params={"date_from": "2024-02-01T22:30:00+02:00"}, headers=auth_headers
+        ).json()
+        assert len(listed) == 1  # 20:30 UTC, before the 21:00 UTC night
+
+        duplicate = client.post(
+            "/api/sleep/",
+            json={"sleep_time": "2024-02-01T21:00:00", "wake_time": "2024-02-02T05:00:00"},
+            headers=auth_headers,
+        )
+        assert duplicate.status_code == 409
+
+    def test_csv_rows_with_errors_are_reported(self, client, auth_headers):
+        csv_body = (
+            "sleep_time,wake_time,quality,sleep_duration_minutes\n"
+            "2024-03-01T22:00:00,2024-03-02T06:00:00,5,\n"
+            "2024-03-02T22:00:00,2024-03-02T21:00:00,3,\n"
+            "2024-03-03T22:00:00,2024-03-04T06:00:00,9,\n"
+            "2024-03-04T22:00:00,2024-03-05T06:00:00,3,400\n"
+        )
+        body = client.post(
+            "/api/sleep/import", content=csv_body, headers={**auth_headers, "Content-Type": "text/csv"}
+        ).json()
+
+        assert body["inserted"] == 2
+        assert [e["row"] for e in body["errors"]] == [2, 3]
+        durations = sorted(
+            log["sleep_duration_minutes"] for log in client.get("/api/sleep/", headers=auth_headers).json()
+        )
+        assert durations == [400, 480]
+
+
+class TestSleepStats:
+    """Tests for SQL-side sleep statistics and the bounded trend."""
+
+    def test_percentiles_and_daily_trend(self, client, auth_headers):
+        nights = _nights(4)
+        for night, quality, minutes in zip(nights, (1, 2, 3, 4), (360, 420, 480, 540)):
+            night["quality"] = quality
+            night["sleep_duration_minutes"] = minutes
+        client.post("/api/sleep/import", json=nights, headers=auth_headers)
+
+        stats = client.get("/api/sleep/stats", headers=auth_headers).json()
+        assert stats["total_logs"] == 4
+        assert stats["avg_quality"] == 2.5 and stats["avg_duration"] == 450.0
+        assert stats["quality_percentiles"]["p50"] == 2.5
+        assert stats["duration_percentiles"] == {"p10": 378.0, "p25": 405.0, "p50": 450.0, "p75": 495.0, "p90": 522.0}
+        assert stats["trend_bucket"] == "day"
+        assert [p["date"] for p in stats["quality_trend"]] == ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+
+    def test_multi_year_trend_is_bounded(self, client, auth_headers):
+        nights = _nights(3 * 365)
+        for i, night in enumerate(nights):
+            night["quality"] = 1 + i % 5
+        client.post("/api/sleep/import", json=nights, headers=auth_headers)
+
+        auto = client.get("/api/sleep/stats", params={"max_points": 60}, headers=auth_headers).json()
+        assert auto["trend_bucket"] == "month"
+        assert len(auto["quality_trend"]) <= 60
+        assert sum(p["count"] for p in auto["quality_trend"]) == 3 * 365
+
+        weekly = client.get("/api/sleep/stats", params={"bucket": "week"}, headers=auth_headers).json()
+        assert weekly["quality_trend"][0]["date"] == "2024-01-01"  # a Monday
+        assert len(weekly["quality_trend"]) <= 120
+
+        raw = client.get("/api/sleep/stats", params={"bucket": "none", "max_points": 50}, headers=auth_headers).json()
+        assert len(raw["quality_trend"]) == 50
+        assert raw["quality_trend"][0]["date"].startswith("2024-01-01")
+
+
+class TestSleepCorrelations:
+    """Tests for the server-side sleep/dream correlation statistics."""
+
+    def _paired_nights(self, client, headers, pairs):
+        """One dream per (mood, vividness, quality, duration) and a sleep log linked to it."""
+        nights = _nights(len(pairs))
+        for night, (mood, vividness, quality, minutes) in zip(nights, pairs):
+            dream = client.post(
+                "/api/dreams/",
+                json={"title": "d", "content": "x", "mood": mood, "vividness": vividness},
+                headers=headers,
+            ).json()
+            night.update(dream_id=dream["id"], quality=quality, sleep_duration_minutes=minutes)
+        client.post("/api/sleep/import", json=nights, headers=headers)
+
+    def test_coefficients_and_bins(self, client, auth_headers):
+        pairs = [(1, 1, 1, 300), (2, 2, 2, 330), (3, 2, 3, 420), (4, 4, 4, 450), (5, 5, 5, 500), (5, 4, 5, 510)]
+        self._paired_nights(client, auth_headers, pairs)
+        client.post("/api/sleep/import", json=_nights(1, datetime(2024, 6, 1, 23)), headers=auth_headers)
+
+        body = client.get("/api/sleep/correlations", headers=auth_headers).json()
+        mood = body["mood_vs_quality_stats"]
+        assert mood["n"] == 6
+        assert mood["pearson"] == 1.0 and mood["spearman"] == 1.0
+        assert [b["bin"] for b in mood["bins"]] == [1, 2, 3, 4, 5]
+        assert mood["bins"][-1] == {"bin": 5, "count": 2, "mean": 5.0, "ci95": [5.0, 5.0]}
+
+        duration = body["duration_vs_vividness_stats"]
+        assert 0.8 < duration["pearson"] < 1
+        low, high = duration["pearson_ci95"]
+        assert low < duration["pearson"] < high
+        assert [(b["bin"], b["count"]) for b in duration["bins"]] == [(5, 2), (7, 2), (8, 2)]
+        assert len(body["mood_vs_quality"]) == 6
+
+    def test_points_are_optional_and_sampled(self, client, auth_headers):
+        self._paired_nights(client, auth_headers, [(1 + i % 5, 3, 1 + i % 5, 400 + i) for i in range(12)])
+
+        sampled = client.get("/api/sleep/correlations", params={"max_points": 4}, headers=auth_headers).json()
+        points = sampled["mood_vs_quality"]
+        assert len(points) == 4
+        assert points[0]["date"].startswith("2024-01-01") and points[-1]["date"].startswith("2024-01-12")
+        assert sampled["duration_vs_vividness_stats"]["pearson"] is None  # constant vividness
+
+        bare = client.get("/api/sleep/correlations", params={"include_points": False}, headers=auth_headers).json()
+        assert bare["mood_vs_quality"] == [] and bare["mood_vs_quality_stats"]["n"] == 12
+
+    def test_no_pairs(self, client, auth_headers):
+        body = client.get("/api/sleep/correlations", headers=auth_headers).json()
+        assert body["mood_vs_quality_stats"] == {
+            "n": 0, "pearson": None, "pearson_ci95": None, "spearman": None, "bins": []
+        }
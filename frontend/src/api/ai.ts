@@ -1,5 +1,5 @@
 import { api } from './client';
-import type { PatternAnalysis, DreamIdeasResponse, DreamExploreResponse, GoalAlignmentResponse } from './types';
+import type { AIJob, AIJobKind, PatternAnalysis, DreamIdeasResponse, DreamExploreResponse, GoalAlignmentResponse } from './types';
 
 export interface InsightsResponse {
   dream_insights: string | null;
@@ -45,4 +45,12 @@ export const aiApi = {
   async goalAlignment(goalId: number): Promise<GoalAlignmentResponse> {
     return api.post<GoalAlignmentResponse>('/ai/goal-alignment', { goal_id: goalId });
   },
+
+  async submitJob(kind: AIJobKind, options: { dreamId?: number; days?: number } = {}): Promise<AIJob> {
+    return api.post<AIJob>('/ai/jobs', { kind, dream_id: options.dreamId, days: options.days });
+  },
+
+  async getJob(jobId: number): Promise<AIJob> {
+    return api.get<AIJob>(`/ai/jobs/${jobId}`);
+  },
 };
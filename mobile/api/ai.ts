@@ -1,5 +1,7 @@
 import { api } from './client';
 import type {
+  AIJob,
+  AIJobKind,
   InsightsResponse,
   AutoTagResponse,
   PatternAnalysis,
@@ -36,4 +38,12 @@ export const aiApi = {
   async goalAlignment(goalId: number): Promise<GoalAlignmentResponse> {
     return api.post<GoalAlignmentResponse>('/ai/goal-alignment', { goal_id: goalId });
   },
+
+  async submitJob(kind: AIJobKind, options: { dreamId?: number; days?: number } = {}): Promise<AIJob> {
+    return api.post<AIJob>('/ai/jobs', { kind, dream_id: options.dreamId, days: options.days });
+  },
+
+  async getJob(jobId: number): Promise<AIJob> {
+    return api.get<AIJob>(`/ai/jobs/${jobId}`);
+  },
 };
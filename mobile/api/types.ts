@@ -167,10 +167,23 @@ export interface SleepStats {
   avg_quality: number;
   avg_duration: number | null;
   total_logs: number;
-  quality_trend: { date: string; quality: number }[];
+  quality_trend: { date: string; quality: number; count?: number }[];
+  trend_bucket?: 'none' | 'day' | 'week' | 'month';
+  quality_percentiles?: Record<string, number>;
+  duration_percentiles?: Record<string, number>;
+}
+
+export interface CorrelationStats {
+  n: number;
+  pearson: number | null;
+  pearson_ci95: [number, number] | null;
+  spearman: number | null;
+  bins: { bin: number; count: number; mean: number; ci95: [number, number] | null }[];
 }
 
 export interface SleepCorrelation {
+  mood_vs_quality_stats: CorrelationStats;
+  duration_vs_vividness_stats: CorrelationStats;
   mood_vs_quality: { date: string; mood: number; quality: number }[];
   duration_vs_vividness: { date: string; duration_minutes: number; vividness: number }[];
 }
@@ -219,6 +232,20 @@ export interface PatternAnalysis {
   summary: string;
 }
 
+export type AIJobKind = 'interpret' | 'patterns';
+
+export interface AIJob {
+  id: number;
+  kind: AIJobKind;
+  status: 'pending' | 'running' | 'complete' | 'failed';
+  params: { dream_id?: number; days?: number };
+  result: ({ dream_id: number; interpretation: string } | PatternAnalysis) | null;
+  error: string | null;
+  created_at: string | null;
+  started_at: string | null;
+  completed_at: string | null;
+}
+
 export interface DreamIdea {
   content: string;
   category: string;